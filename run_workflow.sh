@@ -7,6 +7,22 @@ PROJECT_ROOT=$(pwd)
 # [IMPORTANT] Add current directory to PYTHONPATH for importing src.settings
 export PYTHONPATH=$PROJECT_ROOT
 
+# Indexer backend: "mapreduce" (default, HBaseInvertedIndex.java on YARN) or "python" (src/mapreduce/inverted_index.py)
+INDEXER=${INDEXER:-mapreduce}
+
+# Number of extraction worker processes (1 = serial)
+EXTRACT_WORKERS=${EXTRACT_WORKERS:-$(nproc 2>/dev/null || echo 1)}
+
+# Load mode: "put" (default, Thrift puts + index job) or "bulk" (sorted pre-split files -> HFile bulk load, full rebuilds)
+LOAD_MODE=${LOAD_MODE:-put}
+
+# Number of HBase writer threads for the import step (one Thrift connection each)
+IMPORT_THREADS=${IMPORT_THREADS:-4}
+
+# Incremental indexing: 1 = the importer writes raw-TF postings as it imports (IDF applied at query time),
+# no index rebuild needed; new documents are searchable right after each committed batch
+INCREMENTAL_INDEX=${INCREMENTAL_INDEX:-0}
+
 # Color codes for terminal output
 GREEN='\033[0;32m'
 YELLOW='\033[1;33m'
@@ -76,7 +92,10 @@ echo "------------------------------------------------"
 echo -e "${BLUE}[Step 3/6] Running Data Extractor...${NC}"
 
 # Use Python from Conda environment
-python src/etl/data_extractor.py --mode 0
+# Build the jieba dictionary / stopword caches under config/ once, so extraction workers start without re-parsing them
+python src/etl/analyzer.py
+# --resume continues from data/processed/checkpoints/ if a previous run was interrupted
+python src/etl/data_extractor.py --mode 0 --workers $EXTRACT_WORKERS --resume
 
 if [ $? -ne 0 ]; then
     echo -e "${RED}Data extraction failed, workflow terminated.${NC}"
@@ -85,10 +104,58 @@ fi
 
 echo "------------------------------------------------"
 
+# ================= 4'. Bulk Load (LOAD_MODE=bulk) =================
+# Writes sorted, pre-split partition files for both tables, converts them to HFiles and bulk-loads them.
+if [ "$LOAD_MODE" = "bulk" ]; then
+    echo -e "${BLUE}[Step 4/6] Writing bulk-load files...${NC}"
+
+    python src/mapreduce/bulk_load.py --verify
+    if [ $? -ne 0 ]; then
+        echo -e "${RED}Bulk-load file generation failed, workflow terminated.${NC}"
+        exit 1
+    fi
+
+    echo -e "${BLUE}[Step 5/6] Compiling HFile bulk loader...${NC}"
+    pushd src/mapreduce > /dev/null
+    rm -f *.class
+    javac HFileBulkLoad.java
+    if [ $? -ne 0 ]; then
+        echo -e "${RED}Java compilation failed! Please check the code.${NC}"
+        popd > /dev/null
+        exit 1
+    fi
+    jar cf BulkLoad.jar HFileBulkLoad*.class
+    mkdir -p $PROJECT_ROOT/bin
+    mv BulkLoad.jar $PROJECT_ROOT/bin/
+    rm *.class
+    popd > /dev/null
+
+    echo -e "${BLUE}[Step 6/6] Bulk loading HFiles into HBase...${NC}"
+    for TABLE in files index stats; do
+        hadoop jar bin/BulkLoad.jar HFileBulkLoad data/processed/bulk/$TABLE $TABLE --recreate
+        if [ $? -ne 0 ]; then
+            echo -e "${RED}Bulk load of table '$TABLE' failed, workflow terminated.${NC}"
+            exit 1
+        fi
+    done
+
+    mkdir -p $PROJECT_ROOT/data/processed
+    date +%s > $PROJECT_ROOT/data/processed/index.version
+
+    echo -e "${GREEN}==============================================${NC}"
+    echo -e "${GREEN}   Workflow Completed Successfully! 🚀   ${NC}"
+    echo -e "${GREEN}==============================================${NC}"
+    exit 0
+fi
+
 # ================= 4. Import Data to HBase =================
 echo -e "${BLUE}[Step 4/6] Importing Data to HBase...${NC}"
 
-python src/etl/hbase_import.py
+if [ "$INCREMENTAL_INDEX" = "1" ]; then
+    python src/etl/hbase_import.py --resume --threads $IMPORT_THREADS --index
+else
+    python src/etl/hbase_import.py --resume --threads $IMPORT_THREADS
+fi
 
 if [ $? -ne 0 ]; then
     echo -e "${RED}HBase import failed, workflow terminated.${NC}"
@@ -97,6 +164,44 @@ fi
 
 echo "------------------------------------------------"
 
+# ================= 5''. Incremental Index (INCREMENTAL_INDEX=1) =================
+# The importer already updated the 'index' table for the imported documents.
+# Only reached when the import exited 0 (an aborted import or an IndexFormatError stops the workflow above),
+# so the version stamp below never advertises a half-written index.
+if [ "$INCREMENTAL_INDEX" = "1" ]; then
+    mkdir -p $PROJECT_ROOT/data/processed
+    date +%s > $PROJECT_ROOT/data/processed/index.version
+
+    echo -e "${BLUE}[Step 5/6] Skipped (index updated incrementally during import).${NC}"
+    echo -e "${BLUE}[Step 6/6] Skipped (no Hadoop job needed).${NC}"
+    echo -e "${GREEN}==============================================${NC}"
+    echo -e "${GREEN}   Workflow Completed Successfully! 🚀   ${NC}"
+    echo -e "${GREEN}==============================================${NC}"
+    exit 0
+fi
+
+# ================= 5'. Python Indexer (INDEXER=python) =================
+# Skips JVM compilation and YARN job startup; writes the same 'index' table directly.
+if [ "$INDEXER" = "python" ]; then
+    echo -e "${BLUE}[Step 5/6] Building Inverted Index with Python indexer...${NC}"
+
+    python src/mapreduce/inverted_index.py --output hbase
+
+    if [ $? -ne 0 ]; then
+        echo -e "${RED}Python indexer failed, workflow terminated.${NC}"
+        exit 1
+    fi
+
+    mkdir -p $PROJECT_ROOT/data/processed
+    date +%s > $PROJECT_ROOT/data/processed/index.version
+
+    echo -e "${BLUE}[Step 6/6] Skipped (no Hadoop job needed).${NC}"
+    echo -e "${GREEN}==============================================${NC}"
+    echo -e "${GREEN}   Workflow Completed Successfully! 🚀   ${NC}"
+    echo -e "${GREEN}==============================================${NC}"
+    exit 0
+fi
+
 # ================= 5. Compile Java MapReduce Job =================
 echo -e "${BLUE}[Step 5/6] Compiling MapReduce Job...${NC}"
 
@@ -138,6 +243,10 @@ echo -e "${BLUE}[Step 6/6] Submitting Hadoop Job...${NC}"
 hadoop jar bin/Indexer.jar HBaseInvertedIndex
 
 if [ $? -eq 0 ]; then
+    # 更新索引版本戳，正在运行的 Web 服务据此清空查询缓存
+    mkdir -p $PROJECT_ROOT/data/processed
+    date +%s > $PROJECT_ROOT/data/processed/index.version
+
     echo -e "${GREEN}==============================================${NC}"
     echo -e "${GREEN}   Workflow Completed Successfully! 🚀   ${NC}"
     echo -e "${GREEN}==============================================${NC}"
@@ -0,0 +1,255 @@
+import argparse
+import logging
+import os
+import pickle
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+import jieba
+
+from src.settings import TOKENIZER_MODE, JIEBA_CACHE_PATH, STOPWORDS_PATH
+
+logger = logging.getLogger(__name__)
+
+# jieba 词典在第一次分词时才加载: 词典解析结果序列化到 config/ 下 (不放系统临时目录，重启 / 清理后仍可复用)
+# jieba.posseg 的词性模型也很大，只有 pos 模式真正分词时才导入
+jieba.dt.cache_file = str(JIEBA_CACHE_PATH)
+
+# =========================================================================
+# 文本分析: 归一化 -> 分词 -> 停用词 / 词性过滤
+# 建索引 (DocumentPipeline) 与查询 (SearchEngine) 共用同一个 Analyzer，两端切出的词完全一致
+# =========================================================================
+
+def remove_noise(text):
+    """去掉下划线填空线、省略号等噪声字符并合并空白 (原 FileContentExtractor._remove_noise_chars)"""
+    if not text: return ""
+    text = re.sub(r'_{2,}', ' ', text)
+    text = re.sub(r'\.{3,}', ' ', text)
+    text = text.replace('（', '(').replace('）', ')')
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+def normalize(text):
+    """NFKC (全角 -> 半角、兼容字符合一) + 大小写折叠 + 去噪"""
+    if not text: return ""
+    return remove_noise(unicodedata.normalize('NFKC', text).casefold())
+
+
+def stop_words_cache_path(stop_words_path):
+    """停用词表的序列化缓存与原文件放在一起: config/stopwords_full.txt -> config/stopwords_full.pickle"""
+    return Path(stop_words_path).with_suffix('.pickle')
+
+
+@lru_cache(maxsize=None)
+def load_stop_words(stop_words_path):
+    """
+    读取停用词文件，返回 frozenset (含 NFKC + 大小写折叠后的写法)，同一进程内多个分词器共用
+    解析结果连同源文件的 (mtime, size) 序列化到 stop_words_cache_path()，源文件未变化时直接反序列化
+    """
+    stat = os.stat(stop_words_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cache_path = stop_words_cache_path(stop_words_path)
+    try:
+        with open(cache_path, 'rb') as f:
+            cached_signature, words = pickle.load(f)
+        if cached_signature == signature:
+            return words
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+        pass
+
+    with open(stop_words_path, 'r', encoding='utf-8') as f:
+        words = set(line.strip() for line in f)
+    # 查询与文档都先经过 normalize，停用词也补上归一化后的写法
+    words = frozenset(words | {unicodedata.normalize('NFKC', w).casefold() for w in words})
+    tmp_path = cache_path.with_name(cache_path.name + f'.{os.getpid()}.tmp')
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((signature, words), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"[WARN] 无法写入停用词缓存 {cache_path}: {e}")
+    return words
+
+
+def warm_up(mode=TOKENIZER_MODE):
+    """预先加载 jieba 词典 (pos 模式同时导入词性模型)，返回耗时秒数；不调用时在第一次分词时加载"""
+    start = time.perf_counter()
+    jieba.setLogLevel(logging.WARNING)
+    jieba.initialize()
+    if mode == TextTokenizer.MODE_POS:
+        import jieba.posseg  # noqa: F401
+    return time.perf_counter() - start
+
+
+class TextTokenizer:
+    """
+    分词 + 过滤 (建索引与查询共用，两端必须使用相同的 mode)
+    mode:
+      pos  (默认) jieba 词性标注，丢弃数词、量词、标点、虚词等 (REJECTED_POS)
+      fast 不做词性标注: jieba.cut + 停用词，只按形态丢弃纯数字/标点，速度约为 pos 的数倍，召回略有差异
+    长文本按句读/空白处切成约 chunk_chars 字的块逐块分词 (jieba 本就在这些位置断开，结果与整段分词一致)；
+    jobs > 1 时超长文档的各块分发到分词进程池并行处理
+    """
+    MODE_POS = 'pos'
+    MODE_FAST = 'fast'
+    # 词性首字母: 数词 m、量词 q、非语素字 x、标点 w、介词 p、连词 c、助词 u、代词 r、时间词 t
+    REJECTED_POS = frozenset('mqxwpcurt')
+    CHUNK_BREAK = re.compile(r'[\s。！？；]')
+    NON_WORD = re.compile(r'^[\d\W_]+$')  # fast 模式下近似代替词性过滤: 纯数字 / 标点
+    PARALLEL_MIN_CHARS = 200000  # 短于此长度的文本直接在当前进程分词，进程间传输不划算
+
+    def __init__(self, stop_words_path=None, mode=TOKENIZER_MODE, jobs=1, chunk_chars=20000):
+        if mode not in (self.MODE_POS, self.MODE_FAST):
+            raise ValueError(f"未知的分词模式: {mode}")
+        self.stop_words_path = stop_words_path
+        self.mode = mode
+        self.jobs = jobs
+        self.chunk_chars = chunk_chars
+        self._pool = None
+        stop_words = self._load_default_stopwords()
+        if stop_words_path and os.path.exists(stop_words_path):
+            try:
+                stop_words |= load_stop_words(str(stop_words_path))
+            except Exception as e:
+                logger.error(f"[FAIL] 加载停用词文件失败: {e}")
+        self.stop_words = frozenset(stop_words)
+
+    def _load_default_stopwords(self):
+        words = {
+            "的", "了", "和", "是", "就", "都", "而", "及", "与", "着", "或", 
+            "一个", "没有", "我们", "你们", "他们", "它", "它们", 
+            "在", "从", "对", "对于", "把", "被", "让", "向", "往", 
+            "虽然", "但是", "因为", "所以", "如果", "那么", "以及", 
+            "什么", "怎么", "哪里", "哪个", "这里", "那里",
+            "建议", "意见", "办法", "情况", 
+            "\n", "\t", " ", "\u3000", "\xa0"
+        }
+        return words
+
+    def chunks(self, text):
+        """按句读 / 空白把文本切成约 chunk_chars 字的块 (块边界只落在 jieba 本就会断开的位置)"""
+        text = re.sub(r'\s+', ' ', text)
+        chunks, start = [], 0
+        while start < len(text):
+            match = self.CHUNK_BREAK.search(text, start + self.chunk_chars)
+            if match is None:
+                chunks.append(text[start:])
+                break
+            chunks.append(text[start:match.end()])
+            start = match.end()
+        return chunks
+
+    def tokenize_chunk(self, chunk):
+        stop_words = self.stop_words
+        valid_tokens = []
+        if self.mode == self.MODE_FAST:
+            non_word = self.NON_WORD
+            for word in jieba.cut(chunk):
+                word = word.strip()
+                if len(word) < 2 or word in stop_words or non_word.match(word):
+                    continue
+                valid_tokens.append(word)
+            return valid_tokens
+
+        import jieba.posseg as pseg  # 首次调用时才导入词性模型，之后只是一次字典查找
+        rejected = self.REJECTED_POS
+        for word, flag in pseg.cut(chunk):
+            word = word.strip()
+            if len(word) < 2 or word in stop_words or flag[:1] in rejected:
+                continue
+            valid_tokens.append(word)
+        return valid_tokens
+
+    def tokenize(self, text):
+        if not text:
+            return []
+        chunks = self.chunks(text)
+        if self.jobs > 1 and len(chunks) > 1 and len(text) >= self.PARALLEL_MIN_CHARS:
+            results = self._get_pool().map(_tokenize_in_worker, chunks)
+        else:
+            results = map(self.tokenize_chunk, chunks)
+        return [token for tokens in results for token in tokens]
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_tokenizer_worker,
+                                             initargs=(self.stop_words_path, self.mode))
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+# 分词进程池 (TextTokenizer jobs > 1): 每个子进程持有一个单进程的分词器
+_worker_tokenizer = None
+
+
+def _init_tokenizer_worker(stop_words_path, mode):
+    global _worker_tokenizer
+    warm_up(mode)
+    _worker_tokenizer = TextTokenizer(stop_words_path, mode=mode)
+
+
+def _tokenize_in_worker(chunk):
+    return _worker_tokenizer.tokenize_chunk(chunk)
+
+
+class Analyzer:
+    """
+    归一化后分词: analyze() 用于文档，analyze_query() 用于查询串
+    查询串的分析结果按字符串做 LRU 缓存，重复查询不再经过 jieba
+    """
+    def __init__(self, stop_words_path=None, mode=TOKENIZER_MODE, jobs=1, query_cache_size=4096):
+        self.tokenizer = TextTokenizer(stop_words_path=stop_words_path, mode=mode, jobs=jobs)
+        self._analyze_cached = lru_cache(maxsize=query_cache_size)(self._analyze_tuple)
+        self.warmed = False
+
+    @property
+    def mode(self):
+        return self.tokenizer.mode
+
+    def warm_up(self):
+        """加载分词所需的词典 / 模型 (可在后台线程中调用)，完成后 warmed 为 True"""
+        elapsed = warm_up(self.mode)
+        self.warmed = True
+        return elapsed
+
+    def analyze(self, text):
+        return self.tokenizer.tokenize(normalize(text))
+
+    def _analyze_tuple(self, text):
+        return tuple(self.analyze(text))
+
+    def analyze_query(self, query):
+        """返回新列表，调用方可以随意修改"""
+        return list(self._analyze_cached(query))
+
+    def cache_info(self):
+        return self._analyze_cached.cache_info()
+
+    def close(self):
+        self.tokenizer.close()
+
+
+# =========================================================================
+# 预先生成 config/ 下的 jieba 词典缓存与停用词缓存 (首次分词 / 加载时也会自动生成)
+# =========================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build Analyzer Caches")
+    parser.add_argument('--stop-words', default=str(STOPWORDS_PATH), help="停用词文件 (Default: config/stopwords_full.txt)")
+    parser.add_argument('--tokenizer', choices=[TextTokenizer.MODE_POS, TextTokenizer.MODE_FAST], default=TOKENIZER_MODE,
+                        help="分词模式 (Default: settings.TOKENIZER_MODE)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    words = load_stop_words(args.stop_words)
+    print(f"[INFO] 停用词 {len(words)} 个 -> {stop_words_cache_path(args.stop_words)} ({time.perf_counter() - start:.3f}s)")
+    print(f"[INFO] jieba 词典 -> {JIEBA_CACHE_PATH} ({warm_up(args.tokenizer):.3f}s)")
@@ -0,0 +1,140 @@
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+# 直接运行 (python src/etl/benchmark.py) 时，把项目根目录加入搜索路径以便导入 src.*
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import jieba
+import jieba.posseg as pseg
+
+from src.settings import RAW_DATA_PATH, STOPWORDS_PATH
+from src.etl.analyzer import TextTokenizer
+from src.etl.data_extractor import FileContentExtractor, VALID_EXTS
+
+# =========================================================================
+# 工具函数
+# =========================================================================
+
+def print_table(header, rows):
+    widths = [max(len(str(x)) for x in col) for col in zip(header, *rows)]
+    line = "  ".join(f"{{:>{w}}}" for w in widths)
+    print(line.format(*header))
+    print("-" * (sum(widths) + 2 * (len(widths) - 1)))
+    for r in rows:
+        print(line.format(*r))
+
+
+def load_texts(sample_dir):
+    """用 FileContentExtractor 解析样例目录下的全部文件，返回 [(文件名, 标题, 正文)]"""
+    extractor = FileContentExtractor()
+    texts = []
+    for root, _, files in os.walk(sample_dir):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            if os.path.splitext(name)[1].lower() not in VALID_EXTS:
+                continue
+            try:
+                content, title = extractor.extract(path)
+            except Exception as e:
+                print(f"[WARN] 跳过 {name}: {e}")
+                continue
+            texts.append((name, title, content))
+    return texts
+
+
+def legacy_tokenize(tokenizer, text):
+    """改动前的 TextTokenizer.tokenize: 整篇 pseg.cut，逐个词性前缀 startswith，用作基准与正确性对照"""
+    if not text:
+        return []
+    text = re.sub(r'\s+', ' ', text)
+    valid_tokens = []
+    for word, flag in pseg.cut(text):
+        word = word.strip()
+        if len(word) < 2: continue
+        if word in tokenizer.stop_words: continue
+        if flag.startswith('m'): continue
+        if flag.startswith('q'): continue
+        if flag.startswith('x'): continue
+        if flag.startswith('w'): continue
+        if flag.startswith('p'): continue
+        if flag.startswith('c'): continue
+        if flag.startswith('u'): continue
+        if flag.startswith('r'): continue
+        if flag.startswith('t'): continue
+        valid_tokens.append(word)
+    return valid_tokens
+
+
+def overlap(tokens, reference):
+    """按词频多重集合计算 (precision, recall)"""
+    common = sum((Counter(tokens) & Counter(reference)).values())
+    return (common / len(tokens) if tokens else 1.0), (common / len(reference) if reference else 1.0)
+
+# =========================================================================
+# 基准: 各分词模式的吞吐与质量 (以改动前的 pos 分词结果为参照)
+# =========================================================================
+
+def bench_tokenizer(sample_dir, jobs, repeat):
+    jieba.setLogLevel(logging.WARNING)
+    jieba.initialize()
+    texts = load_texts(sample_dir)
+    if not texts:
+        print(f"[FAIL] {sample_dir} 中没有可解析的样例文件")
+        return
+    total_chars = sum(len(title) + len(content) for _, title, content in texts)
+    print(f"[BENCH] 分词吞吐 ({len(texts)} 个样例文件, {total_chars} 字, repeat={repeat})")
+
+    pos = TextTokenizer(STOPWORDS_PATH)
+    variants = [
+        ('legacy pos', lambda text: legacy_tokenize(pos, text)),
+        ('pos', pos.tokenize),
+        ('fast', TextTokenizer(STOPWORDS_PATH, mode=TextTokenizer.MODE_FAST).tokenize),
+    ]
+    if jobs > 1:
+        # 样例文件较短，把分块阈值调低，让并行分词在样例上也能生效
+        parallel = TextTokenizer(STOPWORDS_PATH, jobs=jobs, chunk_chars=2000)
+        parallel.PARALLEL_MIN_CHARS = 0
+        variants.append((f'pos x{jobs} procs', parallel.tokenize))
+
+    reference = [legacy_tokenize(pos, title) + legacy_tokenize(pos, content) for _, title, content in texts]
+    table = []
+    for name, tokenize in variants:
+        outputs = [tokenize(title) + tokenize(content) for _, title, content in texts]  # 预热 (进程池启动等)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for _, title, content in texts:
+                tokenize(title)
+                tokenize(content)
+        elapsed = (time.perf_counter() - start) / repeat
+
+        tokens = [t for out in outputs for t in out]
+        precision, recall = overlap(tokens, [t for ref in reference for t in ref])
+        identical = sum(out == ref for out, ref in zip(outputs, reference))
+        table.append((name, f"{elapsed * 1000:.1f}", f"{total_chars / elapsed / 1000:.1f}", len(tokens),
+                      f"{precision:.3f}", f"{recall:.3f}", f"{identical}/{len(texts)}"))
+    if jobs > 1:
+        parallel.close()
+    print_table(("mode", "time (ms)", "K chars/s", "tokens", "precision", "recall", "identical"), table)
+
+# =========================================================================
+# 主程序
+# =========================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extraction Benchmarks")
+    parser.add_argument('suite', choices=['tokenizer'], help="要运行的基准")
+    parser.add_argument('--sample-dir', default=str(RAW_DATA_PATH / 'test'), help="样例文件目录 (Default: data/raw/test)")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help="[tokenizer] 并行分词进程数 (Default: CPU 核数)")
+    parser.add_argument('--repeat', type=int, default=3, help="每组重复次数 (Default: 3)")
+    args = parser.parse_args()
+
+    if args.suite == 'tokenizer':
+        bench_tokenizer(args.sample_dir, args.jobs, args.repeat)
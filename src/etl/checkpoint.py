@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import shutil
+
+from src.etl.jsonl_io import JsonlWriter, iter_records_from
+
+# =========================================================================
+# 断点续传检查点 (提取 / 导入共用)
+# 检查点是一个小 JSON 文件，先写临时文件再 os.replace，保证任何时刻都是完整的
+# =========================================================================
+
+
+class Checkpoint:
+    def __init__(self, path):
+        self.path = str(path)
+
+    def load(self):
+        """返回上次保存的状态 dict；不存在或已损坏时返回 None"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def save(self, state):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """整个阶段成功完成后删除检查点，下次运行从头开始"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class DoneLog:
+    """
+    追加写的完成记录 (JSON Lines，每个已处理的条目一行)，配合 Checkpoint 使用:
+    检查点里只保存日志当前的字节长度，保存检查点不再重写整个已完成列表；
+    恢复时只读取该长度以内的记录，并把日志截断到这里继续追加 (之后的记录对应的输出已被截断，需要重做)
+    """
+    def __init__(self, path):
+        self.path = str(path)
+        self._writer = None
+
+    def load(self, offset):
+        """返回检查点时刻之前写入的记录列表；日志缺失或短于 offset (与检查点不一致) 时返回 None"""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < offset:
+            return None
+        records = []
+        for position, record in iter_records_from(self.path):
+            if position > offset:
+                break
+            records.append(record)
+        return records
+
+    def open(self, resume_offset=None):
+        """resume_offset=None 时清空旧日志，否则截断到该偏移后继续追加"""
+        self._writer = JsonlWriter(self.path, resume_offset=resume_offset)
+
+    def append(self, record):
+        self._writer.write(record)
+
+    @property
+    def offset(self):
+        return self._writer.offset
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def clear(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class InputFingerprint:
+    """
+    续传前确认输入文件仍是保存检查点时的那一份: 检查点中记录文件大小、mtime 与断点之前全部字节的 SHA-1
+    断点只会前进，SHA-1 随之增量计算 (整个运行只多读一遍已处理的输入)；恢复时重新计算一次断点之前的摘要
+    """
+    def __init__(self, path):
+        self.path = str(path)
+        self._sha1 = hashlib.sha1()
+        self._hashed = 0
+
+    def _advance(self, offset):
+        """把摘要推进到 offset，返回前 offset 字节的 SHA-1；文件短于 offset 时返回 None"""
+        if offset < self._hashed:
+            raise ValueError(f"断点不能后退: {offset} < {self._hashed}")
+        with open(self.path, 'rb') as f:
+            f.seek(self._hashed)
+            remaining = offset - self._hashed
+            while remaining:
+                chunk = f.read(min(remaining, 1 << 20))
+                if not chunk:
+                    return None
+                self._sha1.update(chunk)
+                self._hashed += len(chunk)
+                remaining -= len(chunk)
+        return self._sha1.hexdigest()
+
+    def state(self, offset):
+        """保存检查点时写入的字段 (offset 为输入中已确认处理到的字节偏移)"""
+        stat = os.stat(self.path)
+        return {'input': self.path, 'input_size': stat.st_size, 'input_mtime_ns': stat.st_mtime_ns,
+                'input_offset': offset, 'input_prefix_sha1': self._advance(offset)}
+
+    def changed(self, state):
+        """文件大小或 mtime 与检查点不同 (文件被重写过，但断点之前的内容仍可能相同)"""
+        stat = os.stat(self.path)
+        return (state.get('input_size'), state.get('input_mtime_ns')) != (stat.st_size, stat.st_mtime_ns)
+
+    def matches(self, state):
+        """
+        检查点是否属于当前输入: 路径相同，且断点之前的字节完全相同 (断点因此必然落在行边界上)
+        匹配成功后摘要已推进到断点处，之后的 state() 可继续增量计算
+        """
+        if not state or state.get('input') != self.path or 'input_prefix_sha1' not in state:
+            return False
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < state['input_offset']:
+            return False
+        return self._advance(state['input_offset']) == state['input_prefix_sha1']
+
+
+class BatchJournal:
+    """
+    进行中批次的小状态文件 (每批一个 JSON，沿用 Checkpoint 的原子写)，批次确认进检查点后删除
+    用于记录检查点之外、HBase 中已经发生的副作用，续传重做该批次时据此避免重复或遗漏
+    """
+    def __init__(self, directory):
+        self.directory = str(directory)
+
+    def _entry(self, key):
+        return Checkpoint(os.path.join(self.directory, f"{key}.json"))
+
+    def load(self, key):
+        return self._entry(key).load()
+
+    def save(self, key, state):
+        self._entry(key).save(state)
+
+    def discard(self, key):
+        self._entry(key).clear()
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
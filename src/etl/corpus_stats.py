@@ -0,0 +1,129 @@
+import struct
+from collections import Counter
+
+# =========================================================================
+# 语料统计 (stats 表)，导入时增量维护，索引构建与检索端 O(1) 读取
+#   行键 \x00corpus: s:doc_count / s:title_tokens / s:content_tokens (文档数与两个字段的总词数)
+#   行键 = 词:       s:df (包含该词的文档数，标题或正文出现均计入，与 IndexReducer 的 df 一致)
+# 数值均为 8 字节大端 long，与 HBase 计数器 / Java Bytes.toLong 兼容
+# =========================================================================
+
+STATS_TABLE = 'stats'
+STATS_FAMILY = 's'
+CORPUS_ROW = b'\x00corpus'
+DOC_COUNT = b's:doc_count'
+TITLE_TOKENS = b's:title_tokens'
+CONTENT_TOKENS = b's:content_tokens'
+DF_COLUMN = b's:df'
+
+LONG = struct.Struct('>q')
+
+
+def encode_long(value):
+    return LONG.pack(value)
+
+
+def decode_long(data):
+    return LONG.unpack(data)[0] if data else 0
+
+
+class StatsDelta:
+    """一批文档带来的统计变化；重新导入已存在的文档时先 remove 旧版本再 add 新版本"""
+    def __init__(self):
+        self.doc_count = 0
+        self.title_tokens = 0
+        self.content_tokens = 0
+        self.df = Counter()
+
+    def _apply(self, seg_title_str, seg_content_str, sign):
+        title_tokens, content_tokens = seg_title_str.split(), seg_content_str.split()
+        self.doc_count += sign
+        self.title_tokens += sign * len(title_tokens)
+        self.content_tokens += sign * len(content_tokens)
+        for term in set(title_tokens) | set(content_tokens):
+            self.df[term] += sign
+
+    def add_doc(self, seg_title_str, seg_content_str):
+        self._apply(seg_title_str, seg_content_str, 1)
+
+    def remove_doc(self, seg_title_str, seg_content_str):
+        self._apply(seg_title_str, seg_content_str, -1)
+
+
+def fetch_existing(files_table, row_keys):
+    """批量读取已存在文档的分词字段: {row_key(str): (seg_title_str, seg_content_str)}"""
+    if not row_keys:
+        return {}
+    rows = files_table.rows([k.encode('utf-8') for k in row_keys], columns=[b'info:seg_title', b'info:seg_content'])
+    return {
+        key.decode('utf-8'): (data.get(b'info:seg_title', b'').decode('utf-8'),
+                              data.get(b'info:seg_content', b'').decode('utf-8'))
+        for key, data in rows
+    }
+
+
+def apply_delta(stats_table, delta):
+    """
+    读-改-写: 一次批量读取涉及的行，一次批量写回 (调用方需保证同一时刻只有一个写者)
+    df 降为 0 的词直接删除该行
+    """
+    terms = [t for t, d in delta.df.items() if d]
+    keys = [CORPUS_ROW] + [t.encode('utf-8') for t in terms]
+    current = dict(stats_table.rows(keys))
+
+    corpus = current.get(CORPUS_ROW, {})
+    with stats_table.batch() as batch:
+        batch.put(CORPUS_ROW, {
+            DOC_COUNT: encode_long(decode_long(corpus.get(DOC_COUNT)) + delta.doc_count),
+            TITLE_TOKENS: encode_long(decode_long(corpus.get(TITLE_TOKENS)) + delta.title_tokens),
+            CONTENT_TOKENS: encode_long(decode_long(corpus.get(CONTENT_TOKENS)) + delta.content_tokens),
+        })
+        for term, key in zip(terms, keys[1:]):
+            df = decode_long(current.get(key, {}).get(DF_COLUMN)) + delta.df[term]
+            if df > 0:
+                batch.put(key, {DF_COLUMN: encode_long(df)})
+            else:
+                batch.delete(key)
+
+
+def stats_rows(delta):
+    """完整统计 -> stats 表的全部行 (全量重建 / 批量加载用)"""
+    yield CORPUS_ROW, {
+        DOC_COUNT: encode_long(delta.doc_count),
+        TITLE_TOKENS: encode_long(delta.title_tokens),
+        CONTENT_TOKENS: encode_long(delta.content_tokens),
+    }
+    for term, df in delta.df.items():
+        if df > 0:
+            yield term.encode('utf-8'), {DF_COLUMN: encode_long(df)}
+
+
+def corpus_summary(doc_count, title_tokens, content_tokens):
+    """检索端使用的语料统计 (平均长度用于长度归一化)"""
+    return {
+        'doc_count': doc_count,
+        'avg_title_tokens': title_tokens / doc_count if doc_count else 0.0,
+        'avg_content_tokens': content_tokens / doc_count if doc_count else 0.0,
+    }
+
+
+def read_corpus_stats(stats_table):
+    row = stats_table.row(CORPUS_ROW)
+    return corpus_summary(decode_long(row.get(DOC_COUNT)), decode_long(row.get(TITLE_TOKENS)),
+                          decode_long(row.get(CONTENT_TOKENS)))
+
+
+def read_df(stats_table, terms):
+    """{term: df}，未出现的词为 0"""
+    if not terms:
+        return {}
+    rows = dict(stats_table.rows([t.encode('utf-8') for t in terms], columns=[DF_COLUMN]))
+    return {t: decode_long(rows.get(t.encode('utf-8'), {}).get(DF_COLUMN)) for t in terms}
+
+
+def read_term_stats(stats_table, terms):
+    """查询时计算 IDF 所需的 (N, {term: df})，一次批量读取"""
+    keys = [t.encode('utf-8') for t in terms]
+    rows = dict(stats_table.rows([CORPUS_ROW] + keys))
+    doc_count = decode_long(rows.get(CORPUS_ROW, {}).get(DOC_COUNT))
+    return doc_count, {t: decode_long(rows.get(k, {}).get(DF_COLUMN)) for t, k in zip(terms, keys)}
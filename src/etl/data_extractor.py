@@ -2,27 +2,35 @@ import os
 import re
 import subprocess
 import json
-import fitz  
-import pandas as pd
-import openpyxl
+import hashlib
+import sqlite3
 import jieba
 import logging
 import time
 import argparse  
 from datetime import datetime
 from collections import Counter
-from docx import Document
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-import jieba.posseg as pseg
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from tqdm import tqdm
 
 
 # 导入配置 (注意：你需要确保 src 在 pythonpath 中，后面会讲怎么运行)
-from src.settings import RAW_DATA_PATH, PROCESSED_DATA_PATH, FAIL_DATA_PATH,LOG_DIR, STOPWORDS_PATH
+from src.settings import RAW_DATA_PATH, FAIL_DATA_PATH,LOG_DIR, STOPWORDS_PATH, EXTRACT_CACHE_PATH, EXTRACT_DATA_PATH, CHECKPOINT_DIR, TOKENIZER_MODE
+from src.etl.jsonl_io import JsonlWriter
+from src.etl.analyzer import Analyzer, TextTokenizer, remove_noise, warm_up
+from src.etl.checkpoint import Checkpoint, DoneLog
 INPUT_DATA = RAW_DATA_PATH / 'data.json'  
-OUTPUT_JSON = PROCESSED_DATA_PATH / 'extract_data.json'
+OUTPUT_JSONL = EXTRACT_DATA_PATH
+CHECKPOINT_FILE = CHECKPOINT_DIR / 'extract.json'
+DONE_LOG_FILE = CHECKPOINT_DIR / 'extract.done.jsonl'  # 已处理文件的追加日志 (检查点只记录其长度)
+CHECKPOINT_EVERY = 20  # 每处理多少个文件保存一次检查点
+IN_FLIGHT_PER_WORKER = 2  # 进程池模式下每个子进程最多排队的文件数 (子进程崩溃时只需重跑这些文件)
 FAIL_JSON = FAIL_DATA_PATH / 'fail.json'
 
+# 提取/分词逻辑有改动时递增，使旧的提取缓存全部失效
+EXTRACTOR_VERSION = 2  # 2: 分词前做 NFKC + 大小写折叠 (analyzer.normalize)
+
 
 # =========================================================================
 # 组件 0: 日志系统配置
@@ -72,59 +80,21 @@ def log_msg(level, tag, msg):
 
 
 # =========================================================================
-# 组件 1: 文本分词器 (NLP 处理层)
+# 组件 1: 文本分析 (NLP 处理层)
 # =========================================================================
 
-class TextTokenizer:
-    def __init__(self, stop_words_path=None):
-        self.stop_words = self._load_default_stopwords()
-        if stop_words_path and os.path.exists(stop_words_path):
-            try:
-                with open(stop_words_path, 'r', encoding='utf-8') as f:
-                    external_words = set(line.strip() for line in f)
-                    self.stop_words.update(external_words)
-            except Exception as e:
-                log_msg('error', '[FAIL]', f"加载停用词文件失败: {e}")
-
-    def _load_default_stopwords(self):
-        words = {
-            "的", "了", "和", "是", "就", "都", "而", "及", "与", "着", "或", 
-            "一个", "没有", "我们", "你们", "他们", "它", "它们", 
-            "在", "从", "对", "对于", "把", "被", "让", "向", "往", 
-            "虽然", "但是", "因为", "所以", "如果", "那么", "以及", 
-            "什么", "怎么", "哪里", "哪个", "这里", "那里",
-            "建议", "意见", "办法", "情况", 
-            "\n", "\t", " ", "\u3000", "\xa0"
-        }
-        return words
-
-    def tokenize(self, text):
-        if not text:
-            return []
-        text = re.sub(r'\s+', ' ', text)
-        words = pseg.cut(text)
-        valid_tokens = []
-        for word, flag in words:
-            word = word.strip()
-            if len(word) < 2: continue
-            if word in self.stop_words: continue
-            if flag.startswith('m'): continue
-            if flag.startswith('q'): continue
-            if flag.startswith('x'): continue
-            if flag.startswith('w'): continue
-            if flag.startswith('p'): continue
-            if flag.startswith('c'): continue
-            if flag.startswith('u'): continue
-            if flag.startswith('r'): continue
-            if flag.startswith('t'): continue
-            valid_tokens.append(word)
-        return valid_tokens
+# TextTokenizer 与查询端共用的归一化逻辑位于 src/etl/analyzer.py
+
 
 # =========================================================================
 # 组件 2: 文档提取器 (IO 与 解析层)
 # =========================================================================
 
 class FileContentExtractor:
+    """
+    解析库 (fitz / python-docx / pandas + openpyxl) 导入较慢，只在第一次遇到对应格式的文件时才导入，
+    只含 txt 的目录或只用到部分格式时不必为其余格式付出启动时间
+    """
     def _clean_filename_as_title(self, filename):
         name = os.path.splitext(filename)[0]
         name = re.sub(r'[-_.]', ' ', name)
@@ -204,12 +174,7 @@ class FileContentExtractor:
 
     @staticmethod
     def _remove_noise_chars(text):
-        if not text: return ""
-        text = re.sub(r'_{2,}', ' ', text)
-        text = re.sub(r'\.{3,}', ' ', text)
-        text = text.replace('（', '(').replace('）', ')')
-        text = re.sub(r'\s+', ' ', text).strip()
-        return text
+        return remove_noise(text)
 
     @staticmethod
     def _smart_merge_segments(text_segments):
@@ -259,6 +224,7 @@ class FileContentExtractor:
         return segments, title
 
     def _process_pdf(self, filepath):
+        import fitz
         segments = []
         try:
             doc = fitz.open(filepath)
@@ -300,6 +266,7 @@ class FileContentExtractor:
         except: return ""
 
     def _process_docx(self, filepath):
+        from docx import Document
         segments = []
         try:
             doc = Document(filepath)
@@ -317,6 +284,7 @@ class FileContentExtractor:
         return segments, title
 
     def _get_docx_title_optimized(self, doc):
+        from docx.enum.text import WD_ALIGN_PARAGRAPH
         parts, scan_limit, prev_is_title = [], 8, False
         for i, para in enumerate(doc.paragraphs):
             if i >= scan_limit: break
@@ -339,6 +307,7 @@ class FileContentExtractor:
         return " ".join(parts) if parts else ""
 
     def _process_excel(self, filepath):
+        import pandas as pd  # .xlsx 由 pandas 调用 openpyxl 读取
         segments, title = [], ""
         xls = pd.ExcelFile(filepath) 
         for i, sheet in enumerate(xls.sheet_names):
@@ -370,9 +339,9 @@ class FileContentExtractor:
 # =========================================================================
 
 class DocumentPipeline:
-    def __init__(self, stop_words_path=None):
+    def __init__(self, stop_words_path=None, tokenizer_mode=TOKENIZER_MODE, tokenize_jobs=1):
         self.extractor = FileContentExtractor() 
-        self.tokenizer = TextTokenizer(stop_words_path=stop_words_path)
+        self.analyzer = Analyzer(stop_words_path=stop_words_path, mode=tokenizer_mode, jobs=tokenize_jobs)
 
     def run(self, filepath):
         """
@@ -383,8 +352,8 @@ class DocumentPipeline:
         if not content.strip():
             return None 
 
-        seg_title = self.tokenizer.tokenize(title)
-        seg_content = self.tokenizer.tokenize(content)
+        seg_title = self.analyzer.analyze(title)
+        seg_content = self.analyzer.analyze(content)
 
         return {
             "title": title,
@@ -393,6 +362,254 @@ class DocumentPipeline:
             "seg_content": seg_content,
         }
 
+# =========================================================================
+# 组件 4: 单文件处理 (串行与进程池共用)
+# =========================================================================
+
+VALID_EXTS = {'.pdf', '.docx', '.doc', '.xlsx', '.xls', '.txt'}
+
+
+def classify_failure(error_msg):
+    """简单分类错误类型"""
+    if "FileNotFound" in error_msg or "不存在" in error_msg:
+        return "FileNotFound"
+    elif "ValueError" in error_msg:
+        return "FormatError"
+    return "RuntimeError"
+
+
+def item_key(item):
+    """去重 / 缓存 / 检查点共用的文件标识"""
+    return item.get('url') or item.get('path')
+
+
+def item_filepath(item):
+    return RAW_DATA_PATH / item.get('path').lstrip('/')
+
+
+def process_item(pipeline, item):
+    """
+    单个文件的处理闭环: 解析 + 分词 + 失败分类
+    返回 (result, failed_item, level, tag, msg, elapsed)，result 与 failed_item 有且只有一个不为 None
+    日志由主进程统一打印 (子进程内 tqdm/logger 不可用)
+    """
+    filepath = item_filepath(item)
+    url = item.get('url')
+    filename = os.path.basename(filepath)
+    start = time.perf_counter()
+
+    try:
+        ext = os.path.splitext(filepath)[1].lower()
+        if ext not in VALID_EXTS:
+            raise ValueError(f"Skipped extension: {ext}")
+
+        result = pipeline.run(filepath)
+
+        if result:
+            result['url'] = url
+            t_sample = ''.join(result['title'][:10]) if result.get('title') else "No Title"
+            c_sample = ' '.join(result['seg_content'][:20]) if result.get('seg_content') else ""
+            return (result, None, 'info', '[Success]', f"{filename} | Title: {t_sample}... | Seg: {c_sample}...",
+                    time.perf_counter() - start)
+
+        item['error_reason'] = "Extraction returned empty content"
+        item['failure_type'] = "EmptyContent"
+        return None, item, 'info', '[FAIL]', f"Skipped (Empty): {filename}", time.perf_counter() - start
+
+    except Exception as e:
+        error_msg = str(e)
+        item['error_reason'] = error_msg
+        item['failure_type'] = classify_failure(error_msg)
+        return None, item, 'error', '[FAIL]', f"Error processing {filename}: {error_msg}", time.perf_counter() - start
+
+
+# 进程池模式: 每个子进程只初始化一次 DocumentPipeline (停用词表 + jieba 词典)
+_worker_pipeline = None
+
+
+def _init_worker(stop_words_path, tokenizer_mode):
+    global _worker_pipeline
+    warm_up(tokenizer_mode)  # 词典在子进程启动时加载一次 (读 config/ 下的缓存)，并静默 jieba 的加载日志，避免打乱进度条
+    _worker_pipeline = DocumentPipeline(stop_words_path, tokenizer_mode)
+
+
+def _process_in_worker(item):
+    return process_item(_worker_pipeline, item)
+
+
+def _worker_failure(item, error):
+    """子进程异常 (如解析库崩溃) 时 future 本身抛错，按运行时错误记录"""
+    error_msg = f"Worker failed: {error!r}"
+    item['error_reason'] = error_msg
+    item['failure_type'] = classify_failure(error_msg)
+    filename = os.path.basename(item.get('path', ''))
+    return None, item, 'error', '[FAIL]', f"Error processing {filename}: {error_msg}", 0.0
+
+
+def _new_pool(workers, stop_words_path, tokenizer_mode):
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                               initargs=(stop_words_path, tokenizer_mode))
+
+
+def _process_isolated(item, stop_words_path, tokenizer_mode):
+    """在单独的单进程池中重跑一个文件: 只有真正让子进程崩溃的文件才会在这里再次崩溃"""
+    with _new_pool(1, stop_words_path, tokenizer_mode) as executor:
+        try:
+            return executor.submit(_process_in_worker, item).result()
+        except Exception as e:
+            return _worker_failure(item, e)
+
+
+def iter_processed(data_list, workers, stop_words_path, tokenizer_mode=TOKENIZER_MODE, tokenize_jobs=1):
+    """
+    依次产出 (item, process_item 的返回值)
+    workers <= 1 时在当前进程串行处理 (按输入顺序)，超长文档可用 tokenize_jobs 个进程并行分词；
+    否则分发到进程池，按完成顺序返回 (文档间已并行，不再嵌套分词进程池)
+
+    进程池模式下最多 IN_FLIGHT_PER_WORKER * workers 个文件同时在途。某个子进程在原生代码中崩溃时
+    整个池失效 (在途的 future 全部抛 BrokenProcessPool)，无法得知是哪个文件导致的:
+    在途文件逐个放到单独的进程中重跑，只把再次崩溃的文件记为失败，然后重建进程池继续处理其余文件
+    """
+    if workers <= 1:
+        pipeline = DocumentPipeline(stop_words_path, tokenizer_mode, tokenize_jobs)
+        try:
+            for item in data_list:
+                yield item, process_item(pipeline, item)
+        finally:
+            pipeline.analyzer.close()
+        return
+
+    remaining = iter(data_list)
+    executor = _new_pool(workers, stop_words_path, tokenizer_mode)
+    in_flight = {}
+    try:
+        while True:
+            while len(in_flight) < IN_FLIGHT_PER_WORKER * workers:
+                item = next(remaining, None)
+                if item is None:
+                    break
+                in_flight[executor.submit(_process_in_worker, item)] = item
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            suspects = []
+            for future in done:
+                item = in_flight.pop(future)
+                try:
+                    yield item, future.result()
+                except BrokenProcessPool:
+                    suspects.append(item)
+                except Exception as e:
+                    yield item, _worker_failure(item, e)
+            if not suspects:
+                continue
+
+            # 进程池已失效: 其余在途的 future 也会很快以 BrokenProcessPool 结束 (已完成的照常产出)
+            wait(in_flight)
+            for future, item in in_flight.items():
+                if future.exception() is None:
+                    yield item, future.result()
+                else:
+                    suspects.append(item)
+            in_flight.clear()
+            executor.shutdown(wait=False, cancel_futures=True)
+            log_msg('error', '[FAIL]', f"Worker pool crashed; re-running {len(suspects)} in-flight files one by one")
+            for item in suspects:
+                yield item, _process_isolated(item, stop_words_path, tokenizer_mode)
+            executor = _new_pool(workers, stop_words_path, tokenizer_mode)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+# =========================================================================
+# 组件 5: 提取缓存 (增量提取，跳过未变化的文件)
+# =========================================================================
+
+def file_digest(filepath, chunk_size=1 << 20):
+    """文件内容的 SHA-1；文件不存在时返回 None (交给 pipeline 报告 FileNotFound)"""
+    try:
+        h = hashlib.sha1()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                h.update(chunk)
+        return h.hexdigest()
+    except OSError:
+        return None
+
+
+def cache_version(stop_words_path=None, tokenizer_mode=TOKENIZER_MODE):
+    """提取器版本 + 分词模式 + 停用词表摘要: 任一变化都会使缓存失效"""
+    stopwords = file_digest(stop_words_path) if stop_words_path else None
+    return f"{EXTRACTOR_VERSION}:{tokenizer_mode}:{stopwords or '-'}"
+
+
+class ExtractionCache:
+    """
+    以 SQLite 持久化的提取缓存: 文件内容哈希 -> title/content/seg_title/seg_content
+    只在主进程中读写；版本不一致的旧条目在打开时清除
+    """
+    COMMIT_EVERY = 100
+
+    def __init__(self, db_path, version):
+        self.version = version
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(str(db_path))
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS extract_cache ("
+            "digest TEXT PRIMARY KEY, version TEXT, title TEXT, content TEXT, "
+            "seg_title TEXT, seg_content TEXT, elapsed REAL)"
+        )
+        self.conn.execute("DELETE FROM extract_cache WHERE version != ?", (version,))
+        self.conn.commit()
+        self._pending = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def get(self, digest):
+        """命中时返回 (result, 当初解析耗时)，否则返回 None"""
+        row = None
+        if digest:
+            row = self.conn.execute(
+                "SELECT title, content, seg_title, seg_content, elapsed FROM extract_cache "
+                "WHERE digest = ? AND version = ?", (digest, self.version)
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.saved_seconds += row[4]
+        result = {
+            "title": row[0],
+            "content": row[1],
+            "seg_title": json.loads(row[2]),
+            "seg_content": json.loads(row[3]),
+        }
+        return result, row[4]
+
+    def put(self, digest, result, elapsed):
+        if not digest:
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO extract_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (digest, self.version, result['title'], result['content'],
+             json.dumps(result['seg_title'], ensure_ascii=False),
+             json.dumps(result['seg_content'], ensure_ascii=False), elapsed)
+        )
+        self._pending += 1
+        if self._pending >= self.COMMIT_EVERY:
+            self.conn.commit()
+            self._pending = 0
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
 # =========================================================================
 # 测试代码
 # =========================================================================
@@ -405,6 +622,34 @@ if __name__ == "__main__":
         default=10, 
         help="Number of files to process. Set 0 to process all files. (Default: 0)"
     )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help="Number of worker processes. 1 = serial in the main process. (Default: 1)"
+    )
+    parser.add_argument(
+        '--tokenizer',
+        choices=[TextTokenizer.MODE_POS, TextTokenizer.MODE_FAST],
+        default=TOKENIZER_MODE,
+        help="Tokenizer mode; must match TOKENIZER_MODE used at query time. (Default: settings.TOKENIZER_MODE)"
+    )
+    parser.add_argument(
+        '--tokenize-jobs',
+        type=int,
+        default=1,
+        help="Tokenizer processes for very long documents (only with --workers 1). (Default: 1)"
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help="Ignore the extraction cache and re-parse every file."
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help="Continue from the last checkpoint instead of starting over."
+    )
     args = parser.parse_args()
 
     # 配置
@@ -422,8 +667,6 @@ if __name__ == "__main__":
     log_msg('info', '[INFO]', f"Mode set to: {mode} (Processing {'ALL files' if mode == 0 else f'first {mode} files'})")
 
     if isinstance(mode, int):
-        VALID_EXTS = {'.pdf', '.docx', '.doc', '.xlsx', '.xls', '.txt'}
-
         log_msg('info', '[INFO]', "Loading and deduplicating data...")
         try:
             with open(INPUT_DATA, 'r', encoding='utf-8') as f:
@@ -441,7 +684,7 @@ if __name__ == "__main__":
         total_raw = len(data_list)
         
         for item in data_list:
-            key = item.get('url') or item.get('path')
+            key = item_key(item)
             if key and key not in seen_keys:
                 seen_keys.add(key)
                 unique_data_list.append(item)
@@ -449,69 +692,109 @@ if __name__ == "__main__":
         data_list = unique_data_list
         log_msg('info', '[INFO]', f"Deduplication complete. Raw: {total_raw} -> Unique: {len(data_list)}")
 
-        log_msg('info', '[INFO]', "Initializing DocumentPipeline...")
-        pipeline = DocumentPipeline(STOPWORDS_PATH)
-
-        log_msg('info', '[INFO]', "Starting file processing...")
-        final_results = []
-        failed_results = [] 
+        total_unique = len(data_list)
+
+        # 断点续传: 跳过检查点中已处理 (成功或失败) 的文件；输出与完成日志都截断到检查点记录的偏移后继续追加
+        checkpoint = Checkpoint(CHECKPOINT_FILE)
+        done_log = DoneLog(DONE_LOG_FILE)
+        state = checkpoint.load() if args.resume else None
+        done_records = done_log.load(state['done_offset']) if state and 'done_offset' in state else None
+        if state and (state.get('output') != str(OUTPUT_JSONL) or not os.path.exists(OUTPUT_JSONL)
+                      or os.path.getsize(OUTPUT_JSONL) < state['output_offset'] or done_records is None):
+            log_msg('info', '[WARN]', "Checkpoint does not match the current output file. Starting from scratch.")
+            state = None
+        if args.resume and state is None:
+            log_msg('info', '[INFO]', "No usable checkpoint found. Starting from scratch.")
+
+        # 成功结果逐条写入 JSON Lines，不在内存中累积 (中途崩溃时已完成的文档仍保留在文件中)
+        if state:
+            done_keys = {record['key'] for record in done_records}
+            failed_results = [record['failed'] for record in done_records if 'failed' in record]
+            success_before = state['success']
+            data_list = [item for item in data_list if item_key(item) not in done_keys]
+            writer = JsonlWriter(OUTPUT_JSONL, resume_offset=state['output_offset'])
+            done_log.open(resume_offset=state['done_offset'])
+            log_msg('info', '[INFO]', f"Resuming from checkpoint: {len(done_keys)} files done, {len(data_list)} remaining")
+        else:
+            failed_results = []
+            success_before = 0
+            writer = JsonlWriter(OUTPUT_JSONL)
+            done_log.open()
         count = 0
-
-        for item in tqdm(data_list, desc="Processing", unit="file"):
-            relative_path = item.get('path').lstrip('/') 
-            filepath = RAW_DATA_PATH / relative_path
-            url = item.get('url')
-            filename = os.path.basename(filepath)
-            
-            # 单个文件的处理闭环
-            try:
-                ext = os.path.splitext(filepath)[1].lower()
-                if ext not in VALID_EXTS:
-                    raise ValueError(f"Skipped extension: {ext}")
-
-                result = pipeline.run(filepath)
-                
-                if result:
-                    result['url'] = url
-                    final_results.append(result)
-                    
-                    t_sample = ''.join(result['title'][:10]) if result.get('title') else "No Title"
-                    c_sample = ' '.join(result['seg_content'][:20]) if result.get('seg_content') else ""
-                    log_msg('info', '[Success]', f"{filename} | Title: {t_sample}... | Seg: {c_sample}...")
-                else:
-                    reason = "Extraction returned empty content"
-                    item['error_reason'] = reason
-                    item['failure_type'] = "EmptyContent"
-                    failed_results.append(item)
-                    log_msg('info', '[FAIL]', f"Skipped (Empty): {filename}")
-                    
-            except Exception as e:
-                error_msg = str(e)
-                item['error_reason'] = error_msg
-                
-                # 简单分类错误类型
-                if "FileNotFound" in error_msg or "不存在" in error_msg:
-                    item['failure_type'] = "FileNotFound"
-                elif "ValueError" in error_msg:
-                    item['failure_type'] = "FormatError"
+        since_checkpoint = 0
+
+        def mark_done(item, failed_item=None):
+            """
+            在完成日志中追加一行 (失败的文件连同失败原因)；每 CHECKPOINT_EVERY 个文件保存一次检查点，
+            检查点只含输出与日志的当前偏移 (输出已 flush，两者始终一致)，大小与已处理的文件数无关
+            """
+            global since_checkpoint  # mark_done 定义在模块顶层的 __main__ 块中
+            record = {'key': item_key(item)}
+            if failed_item is not None:
+                record['failed'] = failed_item
+            done_log.append(record)
+            since_checkpoint += 1
+            if since_checkpoint >= CHECKPOINT_EVERY:
+                since_checkpoint = 0
+                checkpoint.save({
+                    'output': str(OUTPUT_JSONL),
+                    'output_offset': writer.offset,
+                    'success': success_before + writer.count,
+                    'done_offset': done_log.offset,
+                })
+
+        # 增量提取: 内容哈希命中缓存的文件直接复用上次的解析与分词结果
+        cache = None if args.no_cache else ExtractionCache(EXTRACT_CACHE_PATH, cache_version(STOPWORDS_PATH, args.tokenizer))
+        digests = {}
+        pending = []
+        if cache:
+            for item in tqdm(data_list, desc="Hashing", unit="file"):
+                digest = file_digest(item_filepath(item))
+                hit = cache.get(digest)
+                if hit:
+                    result, _ = hit
+                    result['url'] = item.get('url')
+                    writer.write(result)
+                    mark_done(item)
                 else:
-                    item['failure_type'] = "RuntimeError"
+                    digests[item_key(item)] = digest
+                    pending.append(item)
+            log_msg('info', '[INFO]', f"Extraction cache: {cache.hits}/{len(data_list)} unchanged files reused "
+                                      f"({cache.hit_rate:.1%} hit rate), {len(pending)} to process")
+        else:
+            pending = data_list
 
-                failed_results.append(item)
-                log_msg('error', '[FAIL]', f"Error processing {filename}: {error_msg}")
-            
+        log_msg('info', '[INFO]', f"Initializing DocumentPipeline ({args.workers} worker{'s' if args.workers > 1 else ''})...")
+
+        log_msg('info', '[INFO]', "Starting file processing...")
+        processed = iter_processed(pending, args.workers, STOPWORDS_PATH, args.tokenizer, args.tokenize_jobs)
+        for item, (result, failed_item, level, tag, msg, elapsed) in tqdm(processed, total=len(pending), desc="Processing", unit="file"):
+            if result:
+                writer.write(result)
+                if cache:
+                    cache.put(digests.get(item_key(item)), result, elapsed)
+            else:
+                failed_results.append(failed_item)
+            mark_done(item, failed_item)
+            log_msg(level, tag, msg)
             count += 1
 
-        # 写入成功结果
+        if cache:
+            cache.close()
+            log_msg('info', '[INFO]', f"Extraction cache hit rate: {cache.hit_rate:.1%}, "
+                                      f"time saved: ~{cache.saved_seconds:.1f}s of parsing/tokenization")
+
+        # 成功结果已逐条写入，这里只需落盘；整个阶段完成后检查点不再需要
         try:
-            with open(OUTPUT_JSON, 'w', encoding='utf-8') as f:
-                json.dump(final_results, f, ensure_ascii=False, indent=4)
+            writer.close()
+            checkpoint.clear()
+            done_log.clear()
             log_msg('info', '[INFO]', "--------------------------------------------------")
             log_msg('info', '[Success]', "Data extraction complete.")
-            log_msg('info', '[INFO]', f"Total processed: {len(data_list)}")
-            log_msg('info', '[INFO]', f"Successful: {len(final_results)} (Saved to: {os.path.abspath(OUTPUT_JSON)})")
+            log_msg('info', '[INFO]', f"Total processed: {total_unique}")
+            log_msg('info', '[INFO]', f"Successful: {success_before + writer.count} (Saved to: {os.path.abspath(OUTPUT_JSONL)})")
         except Exception as e:
-            log_msg('error', '[FAIL]', f"Failed to write output JSON: {e}")
+            log_msg('error', '[FAIL]', f"Failed to write output JSONL: {e}")
 
         # 写入失败结果 (带原因和统计)
         if failed_results:
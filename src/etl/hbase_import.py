@@ -1,14 +1,25 @@
+import argparse
 import json
 import hashlib
 import happybase
 import os
 import logging
+import queue
+import sys
+import threading
+import time
 from datetime import datetime
 from collections import Counter
 from tqdm import tqdm
-from src.settings import PROCESSED_DATA_PATH, FAIL_DATA_PATH, LOG_DIR
-JSON_FILE = PROCESSED_DATA_PATH / 'extract_data.json'
+from src.settings import FAIL_DATA_PATH, LOG_DIR, SNIPPET_LENGTH, EXTRACT_DATA_PATH, CHECKPOINT_DIR, INDEX_VERSION_PATH
+from src.etl.jsonl_io import iter_records_from, _is_json_array
+from src.etl.checkpoint import Checkpoint, InputFingerprint, BatchJournal
+from src.etl.corpus_stats import STATS_TABLE, STATS_FAMILY, StatsDelta, fetch_existing, apply_delta, stats_rows
+from src.mapreduce import posting_codec
+from src.mapreduce.scoring import term_frequencies, term_positions
+JSON_FILE = EXTRACT_DATA_PATH
 FAIL_FILE = FAIL_DATA_PATH / 'fail.json'
+CHECKPOINT_FILE = CHECKPOINT_DIR / 'import.json'
 # =========================================================================
 # 组件 0: 日志系统配置 (保持一致)
 # =========================================================================
@@ -44,6 +55,20 @@ def log_msg(level, tag, msg):
     # 终端显示 (使用 tqdm.write 防止打断进度条)
     tqdm.write(full_msg)
 
+FAILURE_FIELDS = ('url', 'title', 'row_key', 'input_offset', 'failure_type', 'error_msg')
+
+
+def failure_record(item):
+    """失败记录 (检查点与 import_fail.json) 只保留定位信息与失败原因，不含正文和分词字段"""
+    return {k: item[k] for k in FAILURE_FIELDS if k in item}
+
+
+def stamp_index_version():
+    """更新索引版本戳 (与 run_workflow.sh 的 date +%s > index.version 相同)，Web 端据此清空缓存"""
+    os.makedirs(os.path.dirname(INDEX_VERSION_PATH), exist_ok=True)
+    with open(INDEX_VERSION_PATH, 'w') as f:
+        f.write(f"{int(time.time())}\n")
+
 # =========================================================================
 # 组件 1: HBase 导入器
 # =========================================================================
@@ -52,6 +77,9 @@ class HBaseFileImporter:
     """
     负责将文件信息导入HBase的工具类
     """
+    BATCH_SIZE = 1000  # 每批写入条数，也是检查点推进的粒度
+    STAMP_INTERVAL = 30  # 增量索引时更新索引版本戳的最小间隔 (秒)，每次更新都会让 Web 端清空整个查询缓存
+
     def __init__(self, host='localhost', port=9090, table_name='files'):
         self.host = host
         self.port = port
@@ -90,6 +118,22 @@ class HBaseFileImporter:
             else:
                 log_msg('info', '[INFO]', f"Table 'index' already exists.")
 
+            if STATS_TABLE.encode('utf-8') not in tables:
+                log_msg('info', '[INFO]', f"Table '{STATS_TABLE}' does not exist. Creating...")
+                self.connection.create_table(
+                    STATS_TABLE,
+                    {STATS_FAMILY: dict()}  # 语料统计: 文档数 / 总词数 / 各词 df
+                )
+                log_msg('info', '[Success]', f"Table '{STATS_TABLE}' created.")
+
+            if posting_codec.POSITIONS_TABLE.encode('utf-8') not in tables:
+                log_msg('info', '[INFO]', f"Table '{posting_codec.POSITIONS_TABLE}' does not exist. Creating...")
+                self.connection.create_table(
+                    posting_codec.POSITIONS_TABLE,
+                    {posting_codec.POSITIONS_FAMILY: dict()}  # 位置索引: x:<rowkey> -> 词在标题/正文中的位置
+                )
+                log_msg('info', '[Success]', f"Table '{posting_codec.POSITIONS_TABLE}' created.")
+
             if self.table_name.encode('utf-8') not in tables:
                 log_msg('info', '[INFO]', f"Table '{self.table_name}' does not exist. Creating...")
                 self.connection.create_table(
@@ -112,116 +156,480 @@ class HBaseFileImporter:
             return None
         return hashlib.md5(url.encode('utf-8')).hexdigest()
 
-    def import_data_from_json(self, json_filepath, fail_filepath):
-        """读取JSON文件并批量写入HBase"""
+    @staticmethod
+    def build_snippet(content):
+        """预先截取结果页摘要，搜索时只需读取这一小段而不是整篇正文"""
+        return content[:SNIPPET_LENGTH]
+
+    @staticmethod
+    def build_meta(content, seg_title_str, seg_content_str):
+        """文档元数据 (长度统计)，体积很小，可随结果页一并读取"""
+        return {
+            'content_length': len(content),
+            'title_tokens': len(seg_title_str.split()),
+            'content_tokens': len(seg_content_str.split()),
+        }
+
+    @classmethod
+    def build_row(cls, item):
+        """提取结果 -> (row_key, data_map)"""
+        row_key = cls.generate_rowkey(item.get('url', ''))
+
+        # 数据处理 (List -> String)
+        # 处理 seg_title
+        seg_title_val = item.get('seg_title', [])
+        if isinstance(seg_title_val, list):
+            seg_title_str = ' '.join(seg_title_val)
+        else:
+            seg_title_str = str(seg_title_val) if seg_title_val else ""
+
+        # 处理 seg_content
+        seg_content_val = item.get('seg_content', [])
+        if isinstance(seg_content_val, list):
+            seg_content_str = ' '.join(seg_content_val)
+        else:
+            seg_content_str = str(seg_content_val) if seg_content_val else ""
+
+        # 构造数据映射
+        meta = cls.build_meta(item.get('content', ''), seg_title_str, seg_content_str)
+        data_map = {
+            b'info:url': item.get('url', '').encode('utf-8'),
+            b'info:title': item.get('title', '').encode('utf-8'),
+            b'info:content': item.get('content', '').encode('utf-8'),
+            b'info:seg_title': seg_title_str.encode('utf-8'),
+            b'info:seg_content': seg_content_str.encode('utf-8'),
+            b'info:snippet': cls.build_snippet(item.get('content', '')).encode('utf-8'),
+            b'info:meta': json.dumps(meta).encode('utf-8')
+        }
+        return row_key, data_map
+
+    def rebuild_stats(self, batch_size=1000):
+        """扫描整张 files 表重新计算语料统计并覆盖 stats 表 (统计与文档不一致时的兜底)"""
+        log_msg('info', '[INFO]', f"Rebuilding corpus stats from table '{self.table_name}'...")
+        delta = StatsDelta()
+        table = self.connection.table(self.table_name)
+        for _, data in tqdm(table.scan(columns=[b'info:seg_title', b'info:seg_content'], batch_size=batch_size),
+                            desc="Scanning", unit="row"):
+            delta.add_doc(data.get(b'info:seg_title', b'').decode('utf-8'), data.get(b'info:seg_content', b'').decode('utf-8'))
+
+        self.connection.delete_table(STATS_TABLE, disable=True)
+        self.connection.create_table(STATS_TABLE, {STATS_FAMILY: dict()})
+        with self.connection.table(STATS_TABLE).batch(batch_size=batch_size) as batch:
+            for row_key, data_map in stats_rows(delta):
+                batch.put(row_key, data_map)
+        log_msg('info', '[Success]', f"Corpus stats rebuilt: {delta.doc_count} documents, {len(delta.df)} terms")
+
+    def check_index_format(self, sample_rows=100):
+        """
+        增量写入 index 表前确认它是原始词频格式 (或为空)。旧格式 / 紧凑格式的索引上追加 TF cell 会产生混合行，
+        紧凑格式的 doc_id 与新文档的 RowKey 无法对应，这里直接失败，应先用 inverted_index.py --format tf 全量重建
+        只抽查前 sample_rows 个词，且每行只取首个 cell (见 posting_codec.row_format)
+        """
+        index_table = self.connection.table('index')
+        if index_table.row(posting_codec.DOCMAP_ROW, columns=[posting_codec.DOCMAP_QUALIFIER]):
+            found = 'compact'
+        else:
+            formats = {posting_codec.row_format(row) for _, row in
+                       index_table.scan(row_start=b'\x01', limit=sample_rows, filter=b'FirstKeyOnlyFilter()')}
+            found = next((f for f in formats if f not in ('tf', None)), None)
+        if found:
+            raise IndexFormatError(f"Table 'index' is in {found} format; rebuild it with inverted_index.py --format tf "
+                                   f"before importing with --index.")
+
+    def _new_connection(self):
+        """写入线程各自使用独立连接 (happybase 连接不是线程安全的)"""
+        return happybase.Connection(self.host, self.port)
+
+    def import_data_from_json(self, json_filepath, fail_filepath, checkpoint=None, resume=False,
+                              threads=1, max_in_flight=None, update_index=False, update_positions=False):
+        """
+        逐条读取提取结果 (JSON Lines，兼容旧版 JSON 数组)，组装好的批次交给 BulkWriter 的写入线程并行发送
+        checkpoint: 批次按输入顺序确认后记录输入断点；resume=True 时从上次的断点继续
+        threads: 写入线程数 (每个线程一个连接)；max_in_flight: 排队 + 发送中的批次上限 (Default: threads * 2)
+        update_index: 同时把文档增量写入 index 表 (原始词频格式)，确认批次后更新索引版本戳 (至多每 STAMP_INTERVAL 秒一次，
+                      导入完成时再更新一次)，运行中的 Web 服务随即清空查询缓存，新文档导入后即可被检索到
+        update_positions: 同时增量维护位置索引 (positions 表，短语 / 邻近查询用)
+        """
         if not os.path.exists(json_filepath):
             log_msg('error', '[FAIL]', f"File not found: {json_filepath}")
             return
+        if update_index:
+            self.check_index_format()
 
         log_msg('info', '[INFO]', f"Loading data from {json_filepath}...")
-        
-        try:
-            with open(json_filepath, 'r', encoding='utf-8') as f:
-                data_list = json.load(f)
 
-            if not data_list:
-                log_msg('warn', '[WARN]', "JSON file is empty.")
-                return
+        # 断点续传: 检查点记录的是已确认写入的最后一个批次之后的输入位置，以及输入文件的指纹
+        # (提取阶段可能已重写了输入，多进程提取时记录顺序与条数都可能不同，旧断点会落在某一行的中间)
+        # JSON Lines 的断点是字节偏移，核对断点之前的内容；旧版 JSON 数组的断点是条数，核对整个文件
+        byte_offsets = not _is_json_array(json_filepath)
+        fingerprint_offset = (lambda position: position) if byte_offsets else (lambda _: os.path.getsize(json_filepath))
+        fingerprint = InputFingerprint(json_filepath)
+        state = checkpoint.load() if (checkpoint and resume) else None
+        if state and not (fingerprint.matches(state) and (byte_offsets or state['input_offset'] == os.path.getsize(json_filepath))):
+            log_msg('info', '[WARN]', "Input file has changed since the checkpoint was saved. Starting from scratch.")
+            state = None
+            fingerprint = InputFingerprint(json_filepath)
+        # 各批次写入前的旧版本快照 (见 BulkWriter._prepare_batch)，只在续传时沿用
+        journal = BatchJournal(os.path.splitext(checkpoint.path)[0] + '_batches') if checkpoint else None
+        if journal and not state:
+            journal.clear()
+        if state:
+            if fingerprint.changed(state):
+                log_msg('info', '[INFO]', "Input file was rewritten, but everything before the checkpoint is unchanged.")
+            log_msg('info', '[INFO]', f"Resuming from checkpoint: {state['total']} records already imported")
+        elif resume:
+            log_msg('info', '[INFO]', "No usable checkpoint found. Starting from scratch.")
 
-            total_count = len(data_list)
-            success_count = 0
-            failed_records = []
-            
-            # 使用 batch 批量插入
-            # transaction=True 意味着如果在 send 前发生异常，更改会被丢弃（但这里我们手动 send）
-            batch = self.table.batch(batch_size=1000)
-            
-            log_msg('info', '[INFO]', "Starting import process...")
+        last_stamp = [float('-inf')]
 
-            for item in tqdm(data_list, desc="Importing to HBase", unit="row"):
+        def save_checkpoint(committed):
+            if checkpoint:
+                checkpoint.save(dict(committed, **fingerprint.state(fingerprint_offset(committed['position']))))
+            if (update_index or update_positions) and time.monotonic() - last_stamp[0] >= self.STAMP_INTERVAL:
+                stamp_index_version()
+                last_stamp[0] = time.monotonic()
+
+        writer = BulkWriter(self._new_connection, self.table_name, threads=threads,
+                            max_in_flight=max_in_flight or threads * 2, committed=state, on_commit=save_checkpoint,
+                            journal=journal,
+                            stats_table=STATS_TABLE, index_table='index' if update_index else None,
+                            positions_table=posting_codec.POSITIONS_TABLE if update_positions else None)
+        try:
+            log_msg('info', '[INFO]', f"Starting import process ({threads} writer thread{'s' if threads > 1 else ''})...")
+
+            position = writer.committed['position']
+            rows, pre_failed, n_records = [], [], 0
+            records = iter_records_from(json_filepath, position)
+            for next_position, item in tqdm(records, desc="Importing to HBase", unit="row", initial=writer.committed['total']):
+                item['input_offset'], position = position, next_position  # 该条在输入中的起始位置，用于定位失败记录
+                n_records += 1
                 try:
-                    url = item.get('url', '')
-                    
                     # 1. 基础校验
-                    if not url:
+                    if not item.get('url', ''):
                         item['failure_type'] = 'MissingURL'
-                        failed_records.append(item)
-                        continue
-
-                    row_key = self.generate_rowkey(url)
-                    
-                    # 2. 数据处理 (List -> String)
-                    # 处理 seg_title
-                    seg_title_val = item.get('seg_title', [])
-                    if isinstance(seg_title_val, list):
-                        seg_title_str = ' '.join(seg_title_val)
-                    else:
-                        seg_title_str = str(seg_title_val) if seg_title_val else ""
-
-                    # 处理 seg_content
-                    seg_content_val = item.get('seg_content', [])
-                    if isinstance(seg_content_val, list):
-                        seg_content_str = ' '.join(seg_content_val)
+                        pre_failed.append(item)
                     else:
-                        seg_content_str = str(seg_content_val) if seg_content_val else ""
-
-                    # 3. 构造数据映射
-                    data_map = {
-                        b'info:url': item.get('url', '').encode('utf-8'),
-                        b'info:title': item.get('title', '').encode('utf-8'),
-                        b'info:content': item.get('content', '').encode('utf-8'),
-                        b'info:seg_title': seg_title_str.encode('utf-8'),
-                        b'info:seg_content': seg_content_str.encode('utf-8')
-                    }
-
-                    batch.put(row_key, data_map)
-                    success_count += 1
+                        # 2. 构造数据映射 (编码在主线程，发送在写入线程，两者流水线并行)
+                        rows.append(self.build_row(item) + (item,))
 
                 except Exception as row_e:
                     # 捕获单行处理错误
                     item['failure_type'] = 'ProcessingError'
                     item['error_msg'] = str(row_e)
-                    failed_records.append(item)
+                    pre_failed.append(item)
+
+                if n_records == self.BATCH_SIZE:
+                    # 队列已满时阻塞 (背压)，读取速度不会超过写入速度
+                    writer.submit(position, n_records, rows, pre_failed)
+                    rows, pre_failed, n_records = [], [], 0
+
+            # 3. 提交最后一批并等待所有写入线程结束
+            if n_records:
+                writer.submit(position, n_records, rows, pre_failed)
+            stats = writer.close()
+        except Exception as e:
+            writer.close(wait=False)
+            log_msg('error', '[FATAL]', f"Import aborted: {e}")
+            if checkpoint:
+                log_msg('info', '[INFO]', "Progress saved. Re-run with --resume to continue from the last checkpoint.")
+            raise
+
+        committed = writer.committed
+        if update_index or update_positions:
+            stamp_index_version()
+        if committed['total'] == 0:
+            log_msg('warn', '[WARN]', "JSON file is empty.")
+            return
+        if checkpoint:
+            checkpoint.clear()
+            journal.clear()
+
+        # 4. 结果总结
+        failed_records = committed['failed']
+        log_msg('info', '[INFO]', "--------------------------------------------------")
+        log_msg('info', '[Success]', "Import complete.")
+        log_msg('info', '[INFO]', f"Total Processed: {committed['total']}")
+        log_msg('info', '[INFO]', f"Successfully Imported: {committed['success']}")
+        log_msg('info', '[INFO]', f"Throughput: {stats['rows_per_sec']:.1f} rows/s, {stats['bytes_per_sec'] / 1024 / 1024:.2f} MB/s "
+                                  f"({stats['rows']} rows, {stats['bytes'] / 1024 / 1024:.1f} MB in {stats['elapsed']:.1f}s, "
+                                  f"{stats['retries']} retries)")
 
-            # 4. 提交批量操作
+        # 5. 处理失败记录
+        if failed_records:
             try:
-                batch.send()
-            except Exception as batch_e:
-                log_msg('error', '[FATAL]', f"Batch send failed: {batch_e}")
-                # 这里比较严重，如果批量发送失败，可能部分数据已丢失，需要检查 HBase 日志
-                raise
-
-            # 5. 结果总结
-            log_msg('info', '[INFO]', "--------------------------------------------------")
-            log_msg('info', '[Success]', "Import complete.")
-            log_msg('info', '[INFO]', f"Total Processed: {total_count}")
-            log_msg('info', '[INFO]', f"Successfully Imported: {success_count}")
-            
-            # 6. 处理失败记录
-            if failed_records:
+                with open(fail_filepath, 'w', encoding='utf-8') as f:
+                    json.dump(failed_records, f, ensure_ascii=False, indent=4)
+
+                # 统计失败原因
+                fail_types = [r.get('failure_type', 'Unknown') for r in failed_records]
+                type_counts = Counter(fail_types)
+
+                log_msg('info', '[FAIL]', f"Failed Records: {len(failed_records)} (Saved to: {os.path.abspath(fail_filepath)})")
+                log_msg('info', '[INFO]', "Failure Breakdown:")
+                for f_type, count in type_counts.items():
+                    log_msg('info', '[INFO]', f"   - {f_type}: {count}")
+            except Exception as e:
+                log_msg('error', '[FAIL]', f"Failed to save import_fail.json: {e}")
+        else:
+            log_msg('info', '[INFO]', "Failed Records: 0")
+
+        log_msg('info', '[INFO]', "--------------------------------------------------")
+
+# =========================================================================
+# 组件 2: 并行批量写入器
+# =========================================================================
+
+class IndexFormatError(Exception):
+    """index 表不是原始词频格式，不能增量更新"""
+
+
+class BulkWriterError(Exception):
+    """写入线程遇到无法恢复的错误 (如 HBase 不可用)，导入应中止并从检查点续传"""
+
+
+class BulkWriter:
+    """
+    多线程批量写入 HBase:
+    1. 主线程 submit 组装好的批次，有界队列提供背压
+    2. N 个写入线程各持有一个连接，发送失败时按指数退避重试并重连
+    3. 重试仍失败时逐行写入，精确定位失败的行；整批无一成功则视为 HBase 不可用，中止导入
+    4. 批次可能乱序完成，按提交顺序确认 (committed)，断点只推进到连续完成的最后一批
+    5. 每批写入后增量维护语料统计 (stats_table)、原始词频倒排 (index_table) 与位置索引 (positions_table)，均可不启用
+    """
+    def __init__(self, connection_factory, table_name, threads=1, max_in_flight=2,
+                 max_retries=5, backoff=0.5, max_backoff=30, committed=None, on_commit=None,
+                 stats_table=None, index_table=None, positions_table=None, journal=None):
+        self.connection_factory = connection_factory
+        self.journal = journal
+        self.table_name = table_name
+        self.stats_table = stats_table
+        self.index_table = index_table
+        self.positions_table = positions_table
+        self._stats_lock = threading.Lock()
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.on_commit = on_commit
+
+        self.committed = dict(committed) if committed else {'position': 0, 'total': 0, 'success': 0, 'failed': []}
+        for key in ('input', 'input_size', 'input_mtime_ns', 'input_offset', 'input_prefix_sha1'):
+            self.committed.pop(key, None)  # 输入指纹由 import_data_from_json 维护
+        self._next_seq = 0
+        self._commit_seq = 0
+        self._done = {}  # seq -> (position, n_records, n_success, failed)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_in_flight)
+        self.error = None
+
+        self.rows = 0
+        self.bytes = 0
+        self.retries = 0
+        self._start = time.monotonic()
+        self._threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(threads)]
+        for t in self._threads:
+            t.start()
+
+    @staticmethod
+    def _row_bytes(row_key, data_map):
+        return len(row_key) + sum(len(k) + len(v) for k, v in data_map.items())
+
+    def submit(self, position, n_records, rows, pre_failed):
+        """
+        position: 读完本批之后的输入断点; n_records: 本批读取的记录数
+        rows: [(row_key, data_map, item)]; pre_failed: 组装阶段已判定失败的 item
+        """
+        if self.error:
+            raise BulkWriterError(self.error)
+        seq = self._next_seq
+        self._next_seq += 1
+        self._queue.put((seq, position, n_records, rows, pre_failed))
+
+    def _send_batch(self, conn, rows):
+        with conn.table(self.table_name).batch() as batch:
+            for row_key, data_map, _ in rows:
+                batch.put(row_key, data_map)
+
+    def _reconnect(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        return self.connection_factory()
+
+    def _write(self, conn, rows):
+        """返回 (conn, 成功行数, 失败的 item 列表)"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._send_batch(conn, rows)
+                return conn, len(rows), []
+            except Exception:
+                if attempt == self.max_retries:
+                    break
+                with self._lock:
+                    self.retries += 1
+                time.sleep(min(self.backoff * 2 ** attempt, self.max_backoff))
                 try:
-                    with open(fail_filepath, 'w', encoding='utf-8') as f:
-                        json.dump(failed_records, f, ensure_ascii=False, indent=4)
-                    
-                    # 统计失败原因
-                    fail_types = [r.get('failure_type', 'Unknown') for r in failed_records]
-                    type_counts = Counter(fail_types)
-                    
-                    log_msg('info', '[FAIL]', f"Failed Records: {len(failed_records)} (Saved to: {os.path.abspath(fail_filepath)})")
-                    log_msg('info', '[INFO]', "Failure Breakdown:")
-                    for f_type, count in type_counts.items():
-                        log_msg('info', '[INFO]', f"   - {f_type}: {count}")
-                except Exception as e:
-                    log_msg('error', '[FAIL]', f"Failed to save import_fail.json: {e}")
-            else:
-                log_msg('info', '[INFO]', "Failed Records: 0")
-                
-            log_msg('info', '[INFO]', "--------------------------------------------------")
+                    conn = self._reconnect(conn)
+                except Exception:
+                    pass
 
-        except json.JSONDecodeError:
-            log_msg('error', '[FAIL]', f"Failed to decode JSON from {json_filepath}")
-        except Exception as e:
-            log_msg('error', '[FAIL]', f"An unexpected error occurred: {e}")
+        # 整批发送失败: 逐行写入，找出具体失败的行 (put 是幂等的，已写入的行重写无副作用)
+        landed, failed = 0, []
+        for row_key, data_map, item in rows:
+            try:
+                conn.table(self.table_name).put(row_key, data_map)
+                landed += 1
+            except Exception as e:
+                item['failure_type'] = 'WriteError'
+                item['error_msg'] = str(e)
+                item['row_key'] = row_key
+                failed.append(item)
+        if rows and landed == 0:
+            raise BulkWriterError(f"All {len(rows)} rows of a batch failed after {self.max_retries} retries: {failed[0]['error_msg']}")
+        return conn, landed, failed
+
+    def _worker(self):
+        conn = None
+        while True:
+            task = self._queue.get()
+            if task is None:
+                break
+            seq, position, n_records, rows, pre_failed = task
+            try:
+                if self.error:
+                    continue  # 已中止: 只消费队列，不再写入
+                if conn is None:
+                    conn = self.connection_factory()
+                tracked = self.stats_table or self.index_table or self.positions_table
+                existing, stats_applied = self._prepare_batch(conn, position, rows) if tracked else (None, False)
+                conn, landed, failed = self._write(conn, rows)
+                if tracked:
+                    latest = self._landed_rows(rows, failed)
+                    if self.stats_table and not stats_applied:
+                        self._update_stats(conn, latest, existing)
+                        if self.journal:
+                            self.journal.save(position, {'existing': existing, 'stats_applied': True})
+                    if self.index_table:
+                        self._update_index(conn, latest, existing)
+                    if self.positions_table:
+                        self._update_positions(conn, latest, existing)
+                nbytes = sum(self._row_bytes(k, d) for k, d, _ in rows)
+                self._commit(seq, position, n_records, landed, pre_failed + failed, nbytes)
+            except Exception as e:
+                self.error = self.error or str(e)
+            finally:
+                self._queue.task_done()
+        if conn is not None:
+            conn.close()
+
+    @staticmethod
+    def _landed_rows(rows, failed):
+        """真正写入的行 {row_key: data_map}；同一批次内重复的 URL 只保留最后写入的版本"""
+        failed_ids = {id(item) for item in failed}
+        return {row_key: data_map for row_key, data_map, item in rows if id(item) not in failed_ids}
+
+    def _prepare_batch(self, conn, position, rows):
+        """
+        记下本批中已存在文档的旧分词字段，写入后据此增量修正语料统计与索引，返回 (existing, stats_applied)
+        快照在写入前存入批次日志 (以批次结束处的输入断点为键)，批次确认进检查点后删除。
+        上次运行在写入之后、更新统计之前中断时，续传重做该批次会读到已写入的新版本，减旧加新相互抵消，
+        这些文档就永远不会计入 doc_count / df；因此日志中已有快照时沿用它，统计已更新过的批次不再更新
+        """
+        entry = self.journal.load(position) if self.journal else None
+        if entry:
+            return {k: tuple(v) for k, v in entry['existing'].items()}, entry['stats_applied']
+        existing = fetch_existing(conn.table(self.table_name), [k for k, _, _ in rows])
+        if self.journal:
+            self.journal.save(position, {'existing': existing, 'stats_applied': False})
+        return existing, False
+
+    def _update_stats(self, conn, latest, existing):
+        """
+        重新导入的文档先减去旧版本再加上新版本，因此续传时重发同一批次不会重复计数 (旧版本取自批次日志，见 _prepare_batch)。
+        apply_delta 与标记 stats_applied 之间中断仍会在续传时重复计入该批次；
+        同一 URL 恰好落在两个并发批次中时统计也可能出现偏差，两者都可用 --rebuild-stats 全量校正
+        """
+        delta = StatsDelta()
+        for row_key, data_map in latest.items():
+            if row_key in existing:
+                delta.remove_doc(*existing[row_key])
+            delta.add_doc(data_map[b'info:seg_title'].decode('utf-8'), data_map[b'info:seg_content'].decode('utf-8'))
+        # 读-改-写需要串行
+        with self._stats_lock:
+            apply_delta(conn.table(self.stats_table), delta)
+
+    def _update_index(self, conn, latest, existing):
+        """
+        增量更新原始词频格式的倒排 (posting_codec.TF_PREFIX)：
+        新版本出现的词 put 该文档的 TF cell，旧版本中有而新版本没有的词删除该 cell；
+        put / delete 都是幂等的，批次重发不影响结果
+        """
+        with conn.table(self.index_table).batch() as batch:
+            for row_key, data_map in latest.items():
+                qualifier = posting_codec.tf_qualifier(row_key)
+                seg_title, seg_content = data_map[b'info:seg_title'].decode('utf-8'), data_map[b'info:seg_content'].decode('utf-8')
+                tf = term_frequencies(seg_title.split(), seg_content.split())
+                if row_key in existing:
+                    old_title, old_content = existing[row_key]
+                    for term in (set(old_title.split()) | set(old_content.split())) - tf.keys():
+                        batch.delete(term.encode('utf-8'), columns=[qualifier])
+                for term, counts in tf.items():
+                    batch.put(term.encode('utf-8'), {qualifier: posting_codec.encode_tf(counts)})
+
+    def _update_positions(self, conn, latest, existing):
+        """与 _update_index 相同的增量方式维护位置索引 (positions 表的 x:<rowkey> cell)"""
+        with conn.table(self.positions_table).batch() as batch:
+            for row_key, data_map in latest.items():
+                qualifier = posting_codec.positions_qualifier(row_key)
+                seg_title, seg_content = data_map[b'info:seg_title'].decode('utf-8'), data_map[b'info:seg_content'].decode('utf-8')
+                positions = term_positions(seg_title.split(), seg_content.split())
+                if row_key in existing:
+                    old_title, old_content = existing[row_key]
+                    for term in (set(old_title.split()) | set(old_content.split())) - positions.keys():
+                        batch.delete(term.encode('utf-8'), columns=[qualifier])
+                for term, plist in positions.items():
+                    batch.put(term.encode('utf-8'), {qualifier: posting_codec.encode_positions(plist)})
+
+    def _commit(self, seq, position, n_records, landed, failed, nbytes):
+        with self._lock:
+            self.rows += landed
+            self.bytes += nbytes
+            self._done[seq] = (position, n_records, landed, failed)
+            advanced = []
+            while self._commit_seq in self._done:
+                position, n_records, landed, failed = self._done.pop(self._commit_seq)
+                advanced.append(position)
+                self.committed['position'] = position
+                self.committed['total'] += n_records
+                self.committed['success'] += landed
+                self.committed['failed'].extend(failure_record(item) for item in failed)
+                self._commit_seq += 1
+            if advanced and self.on_commit:
+                self.on_commit(self.committed)
+            # 检查点越过这些批次之后才删除它们的日志
+            if advanced and self.journal:
+                for position in advanced:
+                    self.journal.discard(position)
+
+    def close(self, wait=True):
+        """等待所有批次完成并停止写入线程，返回吞吐统计；有线程出错时抛出 BulkWriterError"""
+        if not wait:
+            self.error = self.error or "aborted"
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        if self.error and wait:
+            raise BulkWriterError(self.error)
+        elapsed = max(time.monotonic() - self._start, 1e-9)
+        return {
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'retries': self.retries,
+            'elapsed': elapsed,
+            'rows_per_sec': self.rows / elapsed,
+            'bytes_per_sec': self.bytes / elapsed,
+        }
 
 # =========================================================================
 # 主程序
@@ -230,6 +638,17 @@ class HBaseFileImporter:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HBase Import Pipeline")
+    parser.add_argument('--resume', action='store_true', help="Continue from the last checkpoint instead of starting over.")
+    parser.add_argument('--threads', type=int, default=1, help="Number of writer threads, one connection each. (Default: 1)")
+    parser.add_argument('--index', action='store_true',
+                        help="Also update the 'index' table incrementally (raw-TF format, see inverted_index.py --format tf).")
+    parser.add_argument('--positions', action='store_true',
+                        help="Also update the 'positions' table incrementally (phrase / proximity queries).")
+    parser.add_argument('--rebuild-stats', action='store_true', help="Recompute the stats table from a full scan of 'files' and exit.")
+    parser.add_argument('--max-in-flight', type=int, default=None, help="Max queued/in-flight batches. (Default: threads * 2)")
+    args = parser.parse_args()
+
     # 生成带时间戳的 Log 文件名
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     LOG_FILE = os.path.join(LOG_DIR, f'hbase_import_{timestamp}.log')
@@ -248,11 +667,18 @@ if __name__ == "__main__":
         # 2. 确保表存在
         importer.create_table_if_not_exists()
         
-        # 3. 导入数据
-        importer.import_data_from_json(JSON_FILE, FAIL_FILE)
+        # 3. 导入数据 (--rebuild-stats 时只重算语料统计)
+        if args.rebuild_stats:
+            importer.rebuild_stats()
+        else:
+            importer.import_data_from_json(JSON_FILE, FAIL_FILE, checkpoint=Checkpoint(CHECKPOINT_FILE), resume=args.resume,
+                                           threads=args.threads, max_in_flight=args.max_in_flight, update_index=args.index,
+                                           update_positions=args.positions)
         
     except Exception as e:
         log_msg('error', '[FATAL]', f"Main process halted: {e}")
+        # 非零退出码: run_workflow.sh 据此终止流程，下次以 --resume 从检查点继续
+        sys.exit(1)
     finally:
         # 4. 清理资源
         importer.close()
\ No newline at end of file
@@ -0,0 +1,89 @@
+import json
+import os
+
+# =========================================================================
+# 提取结果的流式读写 (JSON Lines: 每行一篇文档)
+# 写入端逐条追加并立即 flush，进程中途崩溃也不会丢失已完成的文档；
+# 读取端逐行解析，内存占用与语料规模无关。
+# 读取时兼容旧版 extract_data.json (整个文件是一个 JSON 数组)。
+# =========================================================================
+
+
+class JsonlWriter:
+    """
+    逐条写入 JSON Lines
+    resume_offset=None 时覆盖旧文件；否则先截断到该字节偏移 (丢弃检查点之后写入的内容) 再追加
+    """
+    def __init__(self, path, resume_offset=None):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if resume_offset is None:
+            self._f = open(path, 'wb')
+            self.offset = 0
+        else:
+            os.truncate(path, resume_offset)
+            self._f = open(path, 'ab')
+            self.offset = resume_offset
+        self.count = 0
+
+    def write(self, record):
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        self._f.write(line)
+        self._f.flush()
+        self.offset += len(line)
+        self.count += 1
+
+    def close(self):
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _is_json_array(path):
+    """根据第一个非空白字符判断是旧版 JSON 数组还是 JSON Lines"""
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            ch = f.read(1)
+            if not ch or not ch.isspace():
+                return ch == '['
+
+
+def iter_records_from(path, position=0):
+    """
+    从断点 position 开始逐条读取，产出 (读完该条后的断点, 文档 dict)，用于断点续传
+    JSON Lines: 断点为文件字节偏移，直接 seek 过去；没有换行符结尾的残缺末行 (写入途中崩溃) 会被跳过
+    JSON 数组: 旧格式只能整体加载，断点为已读条数，仅为兼容保留
+    """
+    if _is_json_array(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data_list = json.load(f)
+        for i in range(position, len(data_list)):
+            yield i + 1, data_list[i]
+        return
+
+    with open(path, 'rb') as f:
+        f.seek(position)
+        for raw in f:
+            position += len(raw)
+            line = raw.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                if raw.endswith(b'\n'):
+                    raise
+                return
+            yield position, record
+
+
+def iter_records(path):
+    """逐条产出文档 dict，内存占用与语料规模无关 (旧版 JSON 数组除外)"""
+    for _, record in iter_records_from(path):
+        yield record
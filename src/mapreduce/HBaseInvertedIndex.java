@@ -1,5 +1,7 @@
 import org.apache.hadoop.conf.Configuration;
 import org.apache.hadoop.hbase.HBaseConfiguration;
+import org.apache.hadoop.hbase.client.Admin;
+import org.apache.hadoop.hbase.client.Get;
 import org.apache.hadoop.hbase.client.Put;
 import org.apache.hadoop.hbase.client.Result;
 import org.apache.hadoop.hbase.client.Scan;
@@ -8,6 +10,7 @@ import org.apache.hadoop.hbase.client.Table;
 import org.apache.hadoop.hbase.client.Connection;
 import org.apache.hadoop.hbase.client.ConnectionFactory;
 import org.apache.hadoop.hbase.TableName;
+import org.apache.hadoop.hbase.filter.FirstKeyOnlyFilter;
 import org.apache.hadoop.hbase.io.ImmutableBytesWritable;
 import org.apache.hadoop.hbase.mapreduce.TableMapReduceUtil;
 import org.apache.hadoop.hbase.mapreduce.TableMapper;
@@ -18,6 +21,7 @@ import org.apache.hadoop.mapreduce.Job;
 
 import java.io.IOException;
 import java.util.ArrayList;
+import java.util.Arrays;
 import java.util.HashMap;
 import java.util.List;
 import java.util.Map;
@@ -95,11 +99,14 @@ public class HBaseInvertedIndex {
 
         private static final double W_TITLE = 5.0;
         private static final double W_CONTENT = 1.0;
+        private static final byte[] TF_PREFIX = Bytes.toBytes("t");
         private long totalDocs = 1;
+        private boolean rawTf = false;
 
         @Override
         protected void setup(Context context) {
             totalDocs = context.getConfiguration().getLong("total.docs", 1);
+            rawTf = context.getConfiguration().getBoolean("index.raw.tf", false);
         }
 
         @Override
@@ -124,14 +131,24 @@ public class HBaseInvertedIndex {
                 int contentCount = Integer.parseInt(parts[3]);
                 int contentTotal = Integer.parseInt(parts[4]);
 
+                // [修改] 使用 copyBytes() 避免获取到 Text 复用缓冲区里的脏数据
+                Put put = new Put(key.copyBytes());
+
+                // --raw-tf: 只存 TF 四元组 (p:t<url> = 4 个大端 int)，IDF 在查询时按 stats 表计算，
+                // 格式与 inverted_index.py --format tf / 导入器 --index 相同
+                if (rawTf) {
+                    put.addColumn(Bytes.toBytes("p"), Bytes.add(TF_PREFIX, Bytes.toBytes(url)),
+                            Bytes.add(Bytes.add(Bytes.toBytes(titleCount), Bytes.toBytes(titleTotal)),
+                                      Bytes.add(Bytes.toBytes(contentCount), Bytes.toBytes(contentTotal))));
+                    context.write(null, put);
+                    continue;
+                }
+
                 double tfTitle = (titleTotal == 0) ? 0 : (double) titleCount / titleTotal;
                 double tfContent = (contentTotal == 0) ? 0 : (double) contentCount / contentTotal;
 
                 double score = (W_TITLE * tfTitle + W_CONTENT * tfContent) * idf;
 
-                // [修改] 使用 copyBytes() 避免获取到 Text 复用缓冲区里的脏数据
-                Put put = new Put(key.copyBytes());
-                
                 put.addColumn(Bytes.toBytes("p"), Bytes.toBytes(url), Bytes.toBytes(score));
                 
                 context.write(null, put);
@@ -142,20 +159,44 @@ public class HBaseInvertedIndex {
     // =============================================================
     // 3. Driver (Main)
     // =============================================================
-    public static void main(String[] args) throws Exception {
-        Configuration conf = HBaseConfiguration.create();
-        
-        // 步骤 0: 统计源表 files 的总行数 N，用于计算 IDF
-        // 在实际生产中这通常从元数据读取，这里为了作业完整性手动统计
+    // 优先读取导入时增量维护的 stats 表 (行 \x00corpus, 列 s:doc_count)，O(1)；
+    // 统计表不存在或为空时才退回全表计数 (只取行键，不设上限)
+    private static long readTotalDocs(Configuration conf) throws IOException {
         long totalDocs = 0;
         try (Connection conn = ConnectionFactory.createConnection(conf);
-             Table table = conn.getTable(TableName.valueOf("files"));
-             ResultScanner scanner = table.getScanner(new Scan().setLimit(100000))) { // 预估限制或全表扫描
-             // 注意：全表 count 在大数据量下很慢，作业场景数据量少可直接扫
-             for (Result r : scanner) {
-                 totalDocs++;
-             }
+             Admin admin = conn.getAdmin()) {
+            TableName statsName = TableName.valueOf("stats");
+            if (admin.tableExists(statsName)) {
+                try (Table stats = conn.getTable(statsName)) {
+                    byte[] value = stats.get(new Get(Bytes.toBytes("\u0000corpus")))
+                            .getValue(Bytes.toBytes("s"), Bytes.toBytes("doc_count"));
+                    if (value != null) {
+                        totalDocs = Bytes.toLong(value);
+                    }
+                }
+            }
+            if (totalDocs <= 0) {
+                System.out.println("[WARN] Corpus stats missing, counting rows of 'files'");
+                Scan countScan = new Scan().setFilter(new FirstKeyOnlyFilter());
+                countScan.setCaching(1000);
+                try (Table table = conn.getTable(TableName.valueOf("files"));
+                     ResultScanner scanner = table.getScanner(countScan)) {
+                    for (Result r : scanner) {
+                        totalDocs++;
+                    }
+                }
+            }
         }
+        return totalDocs;
+    }
+
+    public static void main(String[] args) throws Exception {
+        Configuration conf = HBaseConfiguration.create();
+        boolean rawTf = Arrays.asList(args).contains("--raw-tf");
+        conf.setBoolean("index.raw.tf", rawTf);
+
+        // 步骤 0: 总文档数 N (用于计算 IDF；--raw-tf 不需要)
+        long totalDocs = rawTf ? 0 : readTotalDocs(conf);
         System.out.println("Total Documents (N): " + totalDocs);
         conf.setLong("total.docs", totalDocs);
 
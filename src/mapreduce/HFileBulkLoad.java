@@ -0,0 +1,278 @@
+import org.apache.hadoop.conf.Configuration;
+import org.apache.hadoop.fs.FileSystem;
+import org.apache.hadoop.fs.Path;
+import org.apache.hadoop.hbase.HBaseConfiguration;
+import org.apache.hadoop.hbase.KeyValue;
+import org.apache.hadoop.hbase.TableName;
+import org.apache.hadoop.hbase.client.Admin;
+import org.apache.hadoop.hbase.client.ColumnFamilyDescriptorBuilder;
+import org.apache.hadoop.hbase.client.Connection;
+import org.apache.hadoop.hbase.client.ConnectionFactory;
+import org.apache.hadoop.hbase.client.Result;
+import org.apache.hadoop.hbase.client.ResultScanner;
+import org.apache.hadoop.hbase.client.Scan;
+import org.apache.hadoop.hbase.client.Table;
+import org.apache.hadoop.hbase.client.TableDescriptorBuilder;
+import org.apache.hadoop.hbase.filter.FirstKeyOnlyFilter;
+import org.apache.hadoop.hbase.io.hfile.CacheConfig;
+import org.apache.hadoop.hbase.io.hfile.HFile;
+import org.apache.hadoop.hbase.io.hfile.HFileContext;
+import org.apache.hadoop.hbase.io.hfile.HFileContextBuilder;
+import org.apache.hadoop.hbase.regionserver.HStoreFile;
+import org.apache.hadoop.hbase.tool.BulkLoadHFiles;
+import org.apache.hadoop.hbase.util.Bytes;
+
+import java.io.BufferedInputStream;
+import java.io.DataInputStream;
+import java.io.EOFException;
+import java.io.File;
+import java.io.FileInputStream;
+import java.io.IOException;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.util.ArrayList;
+import java.util.Arrays;
+import java.util.HashMap;
+import java.util.List;
+import java.util.Map;
+import java.util.TreeSet;
+
+/**
+ * 把 bulk_load.py 生成的有序分区文件转成 HFile，并 bulk load 进 HBase
+ *
+ * 用法: hadoop jar bin/BulkLoad.jar HFileBulkLoad <table_dir> <table_name> [--recreate]
+ *   table_dir   bulk_load.py 的输出子目录 (如 data/processed/bulk/files)，包含 _splits 与 part-*.cells
+ *   --recreate  全量重建: 先载入按 _splits 预分区的新表 <table_name>_bulk_<时间戳>，行数与分区文件一致后
+ *               再经快照 clone 为 <table_name> 替换旧表 (旧数据不会残留)；校验失败时旧表保持不动
+ *
+ * 表不存在时按 _splits 预分区创建；每个 HFile 由 BulkLoadHFiles 整体移入对应 Region，
+ * 对读请求来说要么看不到、要么完整可见。
+ */
+public class HFileBulkLoad {
+
+    // =============================================================
+    // 1. 读取分区文件 (格式见 bulk_load.py)
+    // =============================================================
+    private static byte[] readBlock(DataInputStream in) throws IOException {
+        byte[] data = new byte[in.readInt()];
+        in.readFully(data);
+        return data;
+    }
+
+    private static List<byte[]> readSplits(File tableDir) throws IOException {
+        List<byte[]> splits = new ArrayList<>();
+        for (String line : Files.readAllLines(new File(tableDir, "_splits").toPath(), StandardCharsets.UTF_8)) {
+            line = line.trim();
+            if (!line.isEmpty()) {
+                splits.add(Bytes.fromHex(line));
+            }
+        }
+        return splits;
+    }
+
+    private static File[] listPartitions(File tableDir) {
+        File[] parts = tableDir.listFiles((dir, name) -> name.startsWith("part-") && name.endsWith(".cells"));
+        if (parts == null) {
+            return new File[0];
+        }
+        Arrays.sort(parts);
+        return parts;
+    }
+
+    // =============================================================
+    // 2. 分区文件 -> HFile (每个分区、每个列族一个 HFile)
+    // =============================================================
+    private static TreeSet<String> writeHFiles(Configuration conf, FileSystem fs, File[] parts, Path staging,
+                                               long[] rowCount) throws IOException {
+        TreeSet<String> families = new TreeSet<>();
+        HFileContext context = new HFileContextBuilder().build();
+        long now = System.currentTimeMillis();
+
+        for (File part : parts) {
+            Map<String, HFile.Writer> writers = new HashMap<>();
+            byte[] lastRow = null;
+            try (DataInputStream in = new DataInputStream(new BufferedInputStream(new FileInputStream(part)))) {
+                while (true) {
+                    byte[] row;
+                    try {
+                        row = readBlock(in);
+                    } catch (EOFException e) {
+                        break;
+                    }
+                    byte[] column = readBlock(in);
+                    byte[] value = readBlock(in);
+                    if (lastRow == null || !Bytes.equals(lastRow, row)) {
+                        rowCount[0]++;
+                        lastRow = row;
+                    }
+
+                    // 列名为 family:qualifier
+                    int sep = Bytes.indexOf(column, (byte) ':');
+                    String family = Bytes.toString(column, 0, sep);
+                    byte[] qualifier = Arrays.copyOfRange(column, sep + 1, column.length);
+
+                    HFile.Writer writer = writers.get(family);
+                    if (writer == null) {
+                        Path path = new Path(new Path(staging, family), part.getName().replace(".cells", ""));
+                        writer = HFile.getWriterFactory(conf, new CacheConfig(conf))
+                                .withPath(fs, path)
+                                .withFileContext(context)
+                                .create();
+                        writers.put(family, writer);
+                        families.add(family);
+                    }
+                    // 分区文件已按 (行键, 列名) 排好序，可直接顺序追加
+                    writer.append(new KeyValue(row, Bytes.toBytes(family), qualifier, now, value));
+                }
+            } finally {
+                for (HFile.Writer writer : writers.values()) {
+                    writer.appendFileInfo(HStoreFile.BULKLOAD_TIME_KEY, Bytes.toBytes(now));
+                    writer.close();
+                }
+            }
+            System.out.println("[INFO] HFile written for " + part.getName());
+        }
+        return families;
+    }
+
+    // =============================================================
+    // 3. 建表 (按 _splits 预分区)
+    // =============================================================
+    private static void prepareTable(Admin admin, TableName tableName, TreeSet<String> families,
+                                     List<byte[]> splits) throws IOException {
+        if (admin.tableExists(tableName)) {
+            return;
+        }
+
+        TableDescriptorBuilder builder = TableDescriptorBuilder.newBuilder(tableName);
+        for (String family : families) {
+            builder.setColumnFamily(ColumnFamilyDescriptorBuilder.of(family));
+        }
+        if (splits.isEmpty()) {
+            admin.createTable(builder.build());
+        } else {
+            admin.createTable(builder.build(), splits.toArray(new byte[0][]));
+        }
+        System.out.println("[Success] Table " + tableName + " created with " + (splits.size() + 1) + " regions");
+    }
+
+    // =============================================================
+    // 4. 全量重建: 校验新表后替换旧表
+    // =============================================================
+    private static long countRows(Connection conn, TableName tableName) throws IOException {
+        // 每行只返回首个 cell，只为数行数
+        Scan scan = new Scan().setFilter(new FirstKeyOnlyFilter()).setCaching(10000);
+        long rows = 0;
+        try (Table table = conn.getTable(tableName); ResultScanner scanner = table.getScanner(scan)) {
+            for (Result ignored : scanner) {
+                rows++;
+            }
+        }
+        return rows;
+    }
+
+    private static void verifyRows(Connection conn, TableName tableName, long expected) throws IOException {
+        long rows = countRows(conn, tableName);
+        if (rows != expected) {
+            throw new IOException("Table " + tableName + " has " + rows + " rows, expected " + expected);
+        }
+        System.out.println("[INFO] Verified " + tableName + ": " + rows + " rows");
+    }
+
+    private static void dropTable(Admin admin, TableName tableName) throws IOException {
+        if (admin.tableExists(tableName)) {
+            if (admin.isTableEnabled(tableName)) {
+                admin.disableTable(tableName);
+            }
+            admin.deleteTable(tableName);
+        }
+    }
+
+    /**
+     * 用已校验的新表替换旧表: 新表打快照，旧表先留一份快照再删除，由新表快照 clone 出同名表
+     * clone 只复制元数据与 HFile 引用，旧表删除到新表可用之间只有很短的空档；clone 失败时由旧表快照恢复
+     */
+    private static void swapTable(Connection conn, Admin admin, TableName staged, TableName live, long expected)
+            throws IOException {
+        String stamp = Long.toString(System.currentTimeMillis());
+        String stagedSnapshot = staged.getQualifierAsString() + "_snapshot";
+        String backupSnapshot = live.getQualifierAsString() + "_backup_" + stamp;
+        admin.snapshot(stagedSnapshot, staged);
+        boolean hadLive = admin.tableExists(live);
+        try {
+            if (hadLive) {
+                admin.snapshot(backupSnapshot, live);
+                dropTable(admin, live);
+            }
+            try {
+                admin.cloneSnapshot(stagedSnapshot, live);
+                verifyRows(conn, live, expected);
+            } catch (IOException e) {
+                if (hadLive) {
+                    System.err.println("[FAIL] Swap failed, restoring " + live + " from " + backupSnapshot + ": " + e);
+                    dropTable(admin, live);
+                    admin.cloneSnapshot(backupSnapshot, live);
+                }
+                throw e;
+            }
+            // 新表校验通过后才清理旧数据
+            if (hadLive) {
+                admin.deleteSnapshot(backupSnapshot);
+            }
+        } finally {
+            admin.deleteSnapshot(stagedSnapshot);
+        }
+        dropTable(admin, staged);
+        System.out.println("[Success] Table " + live + " replaced by " + staged);
+    }
+
+    // =============================================================
+    // 5. Driver (Main)
+    // =============================================================
+    public static void main(String[] args) throws Exception {
+        if (args.length < 2) {
+            System.err.println("Usage: HFileBulkLoad <table_dir> <table_name> [--recreate]");
+            System.exit(2);
+        }
+        File tableDir = new File(args[0]);
+        TableName tableName = TableName.valueOf(args[1]);
+        boolean recreate = args.length > 2 && "--recreate".equals(args[2]);
+
+        Configuration conf = HBaseConfiguration.create();
+        FileSystem fs = FileSystem.get(conf);
+        Path staging = new Path("/tmp/hfile_bulkload/" + tableName.getNameAsString() + "_" + System.currentTimeMillis());
+
+        List<byte[]> splits = readSplits(tableDir);
+        File[] parts = listPartitions(tableDir);
+        System.out.println("[INFO] " + parts.length + " partitions, " + splits.size() + " split keys for " + tableName);
+
+        // 全量重建时先载入新表，旧表在新表校验通过前一直可读
+        TableName target = recreate
+                ? TableName.valueOf(tableName.getNamespaceAsString(),
+                                    tableName.getQualifierAsString() + "_bulk_" + System.currentTimeMillis())
+                : tableName;
+
+        try (Connection conn = ConnectionFactory.createConnection(conf);
+             Admin admin = conn.getAdmin()) {
+            long[] rowCount = {0};
+            TreeSet<String> families = writeHFiles(conf, fs, parts, staging, rowCount);
+            prepareTable(admin, target, families, splits);
+
+            // 把 HFile 移入各 Region (跨 Region 的文件会被自动切分)
+            BulkLoadHFiles.create(conf).bulkLoad(target, staging);
+            System.out.println("[Success] Bulk load into " + target + " complete");
+
+            if (recreate) {
+                try {
+                    verifyRows(conn, target, rowCount[0]);
+                } catch (IOException e) {
+                    dropTable(admin, target);
+                    throw e;
+                }
+                swapTable(conn, admin, target, tableName, rowCount[0]);
+            }
+        } finally {
+            fs.delete(staging, true);
+        }
+    }
+}
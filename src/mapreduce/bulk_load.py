@@ -0,0 +1,383 @@
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import shutil
+import struct
+import sys
+import time
+from pathlib import Path
+
+# 直接运行本脚本时，把项目根目录加入搜索路径以便导入 src.*
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.settings import EXTRACT_DATA_PATH, BULK_LOAD_PATH
+from src.etl.hbase_import import HBaseFileImporter
+from src.etl.jsonl_io import iter_records
+from src.etl.corpus_stats import CORPUS_ROW, DOC_COUNT, DF_COLUMN, StatsDelta, decode_long, stats_rows
+from src.mapreduce import posting_codec
+from src.mapreduce.inverted_index import build_index, compact_rows, legacy_rows, tf_rows
+from src.mapreduce.scoring import term_frequencies
+
+# =========================================================================
+# 离线批量加载 (全量重建时替代逐条 Thrift put / TableReducer put)
+#   1. 按行键分布计算 Region 预分区点 (files: URL 的 MD5，近似均匀; index: 词，按实际分布取分位点)
+#   2. 每行按预分区点分桶写入临时文件，再逐个分区在内存中排序 (内存占用只与单个分区大小有关)
+#   3. 输出与 HFile 相同顺序 (行键 -> 列名) 的有序分区文件，整个目录写完后原子替换旧目录
+#   4. HFileBulkLoad.java 把分区文件转成 HFile 并 bulk load 进 HBase (不存在的表按分区点预建)
+#
+# 输出目录:
+#   <table>/_splits          预分区点，每行一个十六进制行键
+#   <table>/_manifest.json   表名、列族、各分区的行键范围 / 行数 / cell 数 / 字节数 / SHA-1
+#   表: files / index / stats (语料统计，见 corpus_stats.py)
+#   <table>/part-NNNNN.cells 有序 cell 序列: >I 行键长度, 行键, >I 列名长度, 列名 (family:qualifier), >I 值长度, 值
+# =========================================================================
+
+LENGTH = struct.Struct('>I')
+
+
+def compute_split_keys(row_keys, regions):
+    """取排序后行键的等分位点作为 Region 起始键 (第一个 Region 从空键开始)"""
+    keys = sorted(set(row_keys))
+    if regions <= 1 or len(keys) < regions:
+        return []
+    splits = [keys[len(keys) * i // regions] for i in range(1, regions)]
+    return sorted(set(splits))
+
+
+def _write_cell(f, row_key, column, value):
+    for part in (row_key, column, value):
+        f.write(LENGTH.pack(len(part)))
+        f.write(part)
+
+
+def _read_exact(f, n):
+    data = f.read(n)
+    if len(data) != n:
+        raise ValueError("分区文件被截断")
+    return data
+
+
+def read_cells(path):
+    """逐个产出分区文件中的 (row_key, column, value)"""
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(LENGTH.size)
+            if not header:
+                return
+            row_key = _read_exact(f, LENGTH.unpack(header)[0])
+            column = _read_exact(f, LENGTH.unpack(_read_exact(f, LENGTH.size))[0])
+            value = _read_exact(f, LENGTH.unpack(_read_exact(f, LENGTH.size))[0])
+            yield row_key, column, value
+
+
+def read_rows(path):
+    """按行聚合分区文件: 产出 (row_key, {column: value})"""
+    current, columns = None, {}
+    for row_key, column, value in read_cells(path):
+        if row_key != current:
+            if current is not None:
+                yield current, columns
+            current, columns = row_key, {}
+        columns[column] = value
+    if current is not None:
+        yield current, columns
+
+
+def write_table(table_dir, table_name, row_keys, rows, regions):
+    """
+    row_keys: 全部行键 (用于计算预分区点)
+    rows: 可迭代的 (row_key, {column: value})，无需有序；同一行键出现多次时按 put 语义合并
+    """
+    table_dir.mkdir(parents=True)
+    split_keys = compute_split_keys(row_keys, regions)
+    bounds = [b''] + split_keys + [None]
+
+    # 1. 分桶: 每行写入所属 Region 的临时文件 (未排序)
+    spills = [open(table_dir / f"spill-{i:05d}", 'wb') for i in range(len(split_keys) + 1)]
+    try:
+        for row_key, data_map in rows:
+            f = spills[bisect.bisect_right(split_keys, row_key)]
+            for column, value in data_map.items():
+                _write_cell(f, row_key, column, value)
+    finally:
+        for f in spills:
+            f.close()
+
+    # 2. 逐个分区排序后写出
+    families, partitions = set(), []
+    for i in range(len(split_keys) + 1):
+        spill_path = table_dir / f"spill-{i:05d}"
+        merged = {}
+        for row_key, column, value in read_cells(spill_path):
+            merged.setdefault(row_key, {})[column] = value
+        os.remove(spill_path)
+
+        part_path = table_dir / f"part-{i:05d}.cells"
+        rows_sorted = sorted(merged)
+        digest, cells, nbytes = hashlib.sha1(), 0, 0
+        with open(part_path, 'wb') as f:
+            for row_key in rows_sorted:
+                columns = merged[row_key]
+                for column in sorted(columns):
+                    families.add(column.split(b':', 1)[0].decode('utf-8'))
+                    _write_cell(f, row_key, column, columns[column])
+                    cells += 1
+                    nbytes += len(row_key) + len(column) + len(columns[column])
+        with open(part_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+
+        partitions.append({
+            'file': part_path.name,
+            'start_key': bounds[i].hex(),
+            'end_key': bounds[i + 1].hex() if bounds[i + 1] is not None else None,
+            'first_row': rows_sorted[0].hex() if rows_sorted else None,
+            'last_row': rows_sorted[-1].hex() if rows_sorted else None,
+            'rows': len(merged),
+            'cells': cells,
+            'bytes': nbytes,
+            'sha1': digest.hexdigest(),
+        })
+
+    with open(table_dir / '_splits', 'w', encoding='utf-8') as f:
+        for key in split_keys:
+            f.write(key.hex() + '\n')
+    with open(table_dir / '_manifest.json', 'w', encoding='utf-8') as f:
+        json.dump({'table': table_name, 'families': sorted(families), 'partitions': partitions}, f, indent=2)
+    return partitions
+
+
+def write_bulk_output(output_dir, tables, regions):
+    """
+    tables: {table_name: (row_keys, rows)}
+    所有表先写到 <output_dir>.tmp，完成后整体替换旧目录，加载端不会看到写了一半的输出
+    """
+    output_dir = Path(output_dir)
+    tmp_dir = output_dir.with_name(output_dir.name + '.tmp')
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+
+    summary = {}
+    for table_name, (row_keys, rows) in tables.items():
+        summary[table_name] = write_table(tmp_dir / table_name, table_name, row_keys, rows, regions)
+
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+    os.replace(tmp_dir, output_dir)
+    return summary
+
+# =========================================================================
+# 校验 (本地即可运行，无需 HBase)
+# =========================================================================
+
+def verify_table(table_dir):
+    """检查分区文件是否满足 HFile 的要求，返回问题列表 (空列表表示通过)"""
+    table_dir = Path(table_dir)
+    with open(table_dir / '_manifest.json', 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    with open(table_dir / '_splits', 'r', encoding='utf-8') as f:
+        split_keys = [bytes.fromhex(line.strip()) for line in f if line.strip()]
+
+    problems = []
+    if split_keys != sorted(set(split_keys)):
+        problems.append("_splits 未严格递增")
+    if len(manifest['partitions']) != len(split_keys) + 1:
+        problems.append("分区数与预分区点数量不匹配")
+
+    for part in manifest['partitions']:
+        path = table_dir / part['file']
+        start = bytes.fromhex(part['start_key'])
+        end = bytes.fromhex(part['end_key']) if part['end_key'] is not None else None
+        digest, prev, rows, cells = hashlib.sha1(), None, 0, 0
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        for row_key, column, _ in read_cells(path):
+            key = (row_key, column)
+            if prev is not None and key <= prev:
+                problems.append(f"{part['file']}: cell 未严格有序 ({row_key!r}, {column!r})")
+                break
+            if row_key < start or (end is not None and row_key >= end):
+                problems.append(f"{part['file']}: 行键 {row_key!r} 超出分区范围")
+                break
+            if prev is None or row_key != prev[0]:
+                rows += 1
+            prev = key
+            cells += 1
+        if digest.hexdigest() != part['sha1']:
+            problems.append(f"{part['file']}: SHA-1 与 manifest 不一致")
+        if (rows, cells) != (part['rows'], part['cells']):
+            problems.append(f"{part['file']}: 行数/cell 数与 manifest 不一致")
+    return problems
+
+
+def iter_table_rows(table_dir):
+    """按行键顺序流式读出整张表的 (row_key, {column: value})"""
+    for part in sorted(Path(table_dir).glob('part-*.cells')):
+        yield from read_rows(part)
+
+
+def _posting_count(index_format, columns, docmap):
+    """index 行中的倒排条数，以及该行包含的 RowKey 集合"""
+    if index_format == 'compact':
+        doc_ids, _ = posting_codec.decode(columns[posting_codec.BLOB_QUALIFIER])
+        rowkeys = {docmap[i * posting_codec.ROWKEY_LENGTH:(i + 1) * posting_codec.ROWKEY_LENGTH]
+                   for i in doc_ids.tolist()}
+        return len(doc_ids), rowkeys
+    prefix = posting_codec.TF_PREFIX if index_format == 'tf' else b'p:'
+    return len(columns), {col[len(prefix):] for col in columns}
+
+
+def verify_against_put_path(output_dir, input_path, index_format, sample=1000):
+    """
+    抽样与逐条 put 路径独立重建的内容比对，返回问题列表 (空列表表示通过)
+    不复用写出分区文件的生成器: 抽中的文档按导入器的方式 (build_row / term_frequencies) 重新构造，
+    files 行逐字节比对，index 行检查文档是否在对应词的倒排中 (tf 格式再比对 TF cell)，
+    stats 的文档数与 files 行数比对、各词 df 与 index 中的倒排条数比对
+    按 RowKey 的哈希值抽样，输入与分区文件都只流式读一遍，内存只与样本大小有关
+    """
+    output_dir = Path(output_dir)
+    with open(output_dir / 'files' / '_manifest.json', 'r', encoding='utf-8') as f:
+        n_docs = sum(p['rows'] for p in json.load(f)['partitions'])
+    step = max(1, n_docs // sample) if sample else 1
+
+    def sampled(row_key):
+        return int(row_key[:8], 16) % step == 0
+
+    # 1. 抽中的文档按 put 路径重新构造 (同一 URL 以最后一次出现为准)
+    expected_files, expected_tf = {}, {}
+    for item in iter_records(input_path):
+        if not item.get('url'):
+            continue
+        row_key, data_map = HBaseFileImporter.build_row(item)
+        row_key = row_key.encode('utf-8')
+        if sampled(row_key):
+            expected_files[row_key] = data_map
+            expected_tf[row_key] = term_frequencies(data_map[b'info:seg_title'].decode('utf-8').split(),
+                                                    data_map[b'info:seg_content'].decode('utf-8').split())
+    wanted_terms = {}
+    for row_key, tf in expected_tf.items():
+        for term, counts in tf.items():
+            wanted_terms.setdefault(term.encode('utf-8'), {})[row_key] = counts
+
+    problems = []
+    found = set()
+    for row_key, columns in iter_table_rows(output_dir / 'files'):
+        if row_key in expected_files:
+            found.add(row_key)
+            if columns != expected_files[row_key]:
+                problems.append(f"files: 行 {row_key!r} 与 put 路径的内容不一致")
+    problems += [f"files: 缺少行 {row_key!r}" for row_key in expected_files.keys() - found]
+
+    # 2. index: 抽中文档的每个词，倒排中都应有该文档
+    docmap, df_index = b'', {}
+    for term, columns in iter_table_rows(output_dir / 'index'):
+        if term == posting_codec.DOCMAP_ROW:
+            docmap = columns[posting_codec.DOCMAP_QUALIFIER]  # \x00 开头，排在所有词之前
+            continue
+        if term not in wanted_terms:
+            continue
+        df_index[term], rowkeys = _posting_count(index_format, columns, docmap)
+        for row_key, counts in wanted_terms[term].items():
+            if row_key not in rowkeys:
+                problems.append(f"index: 词 {term!r} 的倒排中缺少文档 {row_key!r}")
+            elif index_format == 'tf' and columns[posting_codec.TF_PREFIX + row_key] != posting_codec.encode_tf(counts):
+                problems.append(f"index: 词 {term!r} 中文档 {row_key!r} 的 TF 与 put 路径不一致")
+    problems += [f"index: 缺少词 {term!r}" for term in wanted_terms.keys() - df_index.keys()]
+
+    # 3. stats: 文档数 = files 行数，df = index 中的倒排条数
+    for row_key, columns in iter_table_rows(output_dir / 'stats'):
+        if row_key == CORPUS_ROW and decode_long(columns.get(DOC_COUNT)) != n_docs:
+            problems.append(f"stats: doc_count {decode_long(columns.get(DOC_COUNT))} != files 行数 {n_docs}")
+        elif row_key in df_index and decode_long(columns.get(DF_COLUMN)) != df_index[row_key]:
+            problems.append(f"stats: 词 {row_key!r} 的 df 与 index 中的倒排条数 {df_index[row_key]} 不一致")
+    return problems
+
+# =========================================================================
+# 主程序
+# =========================================================================
+
+def file_row_keys(input_path):
+    """files 表的行键，与 files_rows 一一对应 (只计算 URL 的 MD5，不组装整行)"""
+    for item in iter_records(input_path):
+        if item.get('url'):
+            yield HBaseFileImporter.generate_rowkey(item['url']).encode('utf-8')
+
+
+def files_rows(input_path):
+    """files 表的行，与 HBaseFileImporter 逐条导入时写入的内容完全相同"""
+    for item in iter_records(input_path):
+        if item.get('url'):
+            row_key, data_map = HBaseFileImporter.build_row(item)
+            yield row_key.encode('utf-8'), data_map
+
+
+def corpus_delta(input_path):
+    """
+    全量语料统计 (stats 表)，按行键去重 (同一 URL 以最后一次出现为准)，与逐条导入后 stats 表的内容一致
+    先扫一遍只记每个行键最后出现的序号，第二遍流式累加，不在内存中保留整行
+    """
+    last = {row_key: i for i, row_key in enumerate(file_row_keys(input_path))}
+    delta = StatsDelta()
+    for i, (row_key, data_map) in enumerate(files_rows(input_path)):
+        if last[row_key] == i:
+            delta.add_doc(data_map[b'info:seg_title'].decode('utf-8'), data_map[b'info:seg_content'].decode('utf-8'))
+    return delta
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write sorted, pre-split bulk-load files for the files, index and stats tables")
+    parser.add_argument('--input', default=str(EXTRACT_DATA_PATH), help="提取结果路径 (JSON Lines 或旧版 JSON 数组)")
+    parser.add_argument('--output-dir', default=str(BULK_LOAD_PATH), help="输出目录 (Default: data/processed/bulk)")
+    parser.add_argument('--regions', type=int, default=8, help="每张表预分区数 (Default: 8)")
+    parser.add_argument('--format', choices=['compact', 'legacy', 'tf'], default='compact', help="index 表倒排格式 (Default: compact)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="索引构建进程数 (Default: CPU 核数)")
+    parser.add_argument('--verify', action='store_true', help="写完后校验有序性/分区范围，并抽样与逐条 put 路径独立重建的内容比对")
+    parser.add_argument('--verify-sample', type=int, default=1000, help="--verify 抽样比对的文档数 (Default: 1000, 0 表示全部)")
+    args = parser.parse_args()
+
+    start = time.time()
+    # files 表行键只依赖 URL，先扫一遍拿到行键分布，第二遍再流式分桶
+    file_keys = list(file_row_keys(args.input))
+    postings, docs, term_stats = build_index(list(iter_records(args.input)), args.workers)
+    index_rows = {
+        'compact': lambda: compact_rows(postings, docs),
+        'legacy': lambda: legacy_rows(postings),
+        'tf': lambda: tf_rows(term_stats),
+    }[args.format]
+    index_keys = [row_key for row_key, _ in index_rows()]
+    delta = corpus_delta(args.input)
+    stats_keys = [row_key for row_key, _ in stats_rows(delta)]
+    print(f"[INFO] {len(file_keys)} documents, {len(postings)} terms ({time.time() - start:.2f}s)")
+
+    summary = write_bulk_output(args.output_dir, {
+        'files': (file_keys, files_rows(args.input)),
+        'index': (index_keys, index_rows()),
+        'stats': (stats_keys, stats_rows(delta)),
+    }, args.regions)
+    for table_name, partitions in summary.items():
+        sizes = [p['rows'] for p in partitions]
+        print(f"[INFO] {table_name}: {len(partitions)} regions, rows per region min/max = {min(sizes)}/{max(sizes)}, "
+              f"{sum(p['bytes'] for p in partitions) / 1024 / 1024:.1f} MB")
+    print(f"[Success] Bulk-load files written to {os.path.abspath(args.output_dir)} ({time.time() - start:.2f}s)")
+
+    if args.verify:
+        failed = False
+        for table_name in summary:
+            problems = verify_table(Path(args.output_dir) / table_name)
+            if problems:
+                failed = True
+                print(f"[FAIL] {table_name}: {len(problems)} problems, e.g. {problems[:3]}")
+        # 抽样与逐条 put 路径独立重建的内容比对
+        problems = verify_against_put_path(args.output_dir, args.input, args.format, args.verify_sample)
+        if problems:
+            failed = True
+            print(f"[FAIL] {len(problems)} rows differ from the put path, e.g. {problems[:3]}")
+        if failed:
+            sys.exit(1)
+        print("[Success] Verification passed: partitions sorted, within region bounds, sampled rows match the put path")
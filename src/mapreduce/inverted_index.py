@@ -0,0 +1,349 @@
+import argparse
+import happybase
+import json
+import math
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# 直接运行本脚本时，把项目根目录加入搜索路径以便导入 src.*
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.settings import EXTRACT_DATA_PATH, LOCAL_INDEX_PATH
+from src.etl.hbase_import import HBaseFileImporter
+from src.etl.jsonl_io import iter_records
+from src.mapreduce import posting_codec
+from src.mapreduce.local_index import LocalIndexWriter
+from src.mapreduce.scoring import W_TITLE, W_CONTENT, term_frequencies, term_positions, idf, score
+
+JSON_FILE = EXTRACT_DATA_PATH
+INDEX_FAMILY = 'p'  # index 表的列族 (与 HBaseFileImporter.create_table_if_not_exists 一致)
+
+# =========================================================================
+# Python 版倒排索引构建 (HBaseInvertedIndex.java 的单机替代)
+# 小语料下省去 JVM / YARN 作业启动开销:
+#   1. Map:    进程池按分片并行处理文档，每个分片产出一份局部索引
+#   2. Merge:  合并各分片的局部索引
+#   3. Reduce: 按与 IndexReducer 相同的公式打分
+#   4. 输出:   写入 HBase index 表，或写成本地索引目录 (local_index.py)
+# =========================================================================
+
+def _as_tokens(value):
+    """与导入 + IndexMapper 的处理一致: 列表先以空格拼接，再按空白切分"""
+    if isinstance(value, list):
+        value = ' '.join(value)
+    return str(value).split() if value else []
+
+
+def map_document(item):
+    """
+    对应 IndexMapper.map: 统计单篇文档的词频
+    返回 (rowkey, {word: (titleCount, titleTotal, contentCount, contentTotal)}, title_tokens, content_tokens)
+    """
+    rowkey = HBaseFileImporter.generate_rowkey(item.get('url', ''))
+    title_tokens = _as_tokens(item.get('seg_title', []))
+    content_tokens = _as_tokens(item.get('seg_content', []))
+    return rowkey, term_frequencies(title_tokens, content_tokens), title_tokens, content_tokens
+
+
+def index_shard(args):
+    """
+    进程池任务: 处理一个分片，返回局部索引
+    partial: {word: [(rowkey, titleCount, titleTotal, contentCount, contentTotal), ...]}
+    docs:    with_docs=True 时附带本地索引需要的文档字段
+    """
+    items, with_docs = args
+    partial, docs = {}, []
+    for item in items:
+        if not item.get('url'):
+            continue
+        rowkey, stats, title_tokens, content_tokens = map_document(item)
+        for word, counts in stats.items():
+            partial.setdefault(word, []).append((rowkey,) + counts)
+
+        if with_docs:
+            content = item.get('content', '')
+            summary = {
+                'url': item['url'],
+                'title': item.get('title', ''),
+                'snippet': HBaseFileImporter.build_snippet(content),
+                'meta': HBaseFileImporter.build_meta(content, ' '.join(title_tokens), ' '.join(content_tokens)),
+            }
+            docs.append((rowkey, summary, content))
+        else:
+            docs.append((rowkey, None, None))
+    return partial, docs
+
+
+def merge_partials(partials):
+    """合并各分片的局部索引 (分片内文档互不重叠，直接拼接即可)"""
+    merged = {}
+    for partial in partials:
+        for word, values in partial.items():
+            bucket = merged.get(word)
+            if bucket is None:
+                merged[word] = values
+            else:
+                bucket.extend(values)
+    return merged
+
+
+def reduce_postings(stats, total_docs):
+    """对应 IndexReducer.reduce: {word: [...]} -> {word: {rowkey: score}}"""
+    postings = {}
+    for word, values in stats.items():
+        idf_value = idf(total_docs, len(values))
+        postings[word] = {rowkey: score(tc, tt, cc, ct, idf_value) for rowkey, tc, tt, cc, ct in values}
+    return postings
+
+
+def latest_records(data_list):
+    """同一 URL 只保留最后一次出现的记录 (与逐条导入覆盖 files 表行、corpus_delta 去重的结果一致)"""
+    last = {item.get('url'): i for i, item in enumerate(data_list)}
+    return [item for i, item in enumerate(data_list) if last[item.get('url')] == i]
+
+
+def build_index(data_list, workers=None, shards=None, with_docs=False):
+    """
+    并行构建倒排索引 (重复的 URL 以最后一次出现为准)
+    返回 (postings, docs, stats)，docs 顺序与输入一致
+    """
+    data_list = latest_records(data_list)
+    workers = workers or os.cpu_count() or 1
+    shards = max(1, min(shards or workers * 4, len(data_list)))
+    chunk = math.ceil(len(data_list) / shards) if data_list else 1
+    tasks = [(data_list[i:i + chunk], with_docs) for i in range(0, len(data_list), chunk)]
+
+    if workers == 1:
+        results = [index_shard(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(index_shard, tasks))
+
+    stats = merge_partials(partial for partial, _ in results)
+    docs = [doc for _, shard_docs in results for doc in shard_docs]
+    postings = reduce_postings(stats, len(docs))
+    return postings, docs, stats
+
+
+def position_shard(items):
+    """进程池任务: 一个分片的词位置 {word: {rowkey: [位置, ...]}}"""
+    partial = {}
+    for item in items:
+        if not item.get('url'):
+            continue
+        rowkey = HBaseFileImporter.generate_rowkey(item['url'])
+        for word, positions in term_positions(_as_tokens(item.get('seg_title', [])),
+                                              _as_tokens(item.get('seg_content', []))).items():
+            partial.setdefault(word, {})[rowkey] = positions
+    return partial
+
+
+def build_positions(data_list, workers=None, shards=None):
+    """并行构建可选的位置索引: {word: {rowkey: [位置, ...]}}"""
+    data_list = latest_records(data_list)
+    workers = workers or os.cpu_count() or 1
+    shards = max(1, min(shards or workers * 4, len(data_list)))
+    chunk = math.ceil(len(data_list) / shards) if data_list else 1
+    tasks = [data_list[i:i + chunk] for i in range(0, len(data_list), chunk)]
+
+    if workers == 1:
+        results = [position_shard(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(position_shard, tasks))
+
+    merged = {}
+    for partial in results:
+        for word, plist in partial.items():
+            merged.setdefault(word, {}).update(plist)
+    return merged
+
+# =========================================================================
+# 输出
+# =========================================================================
+
+def legacy_rows(postings):
+    """旧格式的 index 表行，与 IndexReducer 一致: 行键=词，列 p:<rowkey>，值为 8 字节双精度"""
+    for word, plist in postings.items():
+        yield word.encode('utf-8'), {
+            f"p:{rowkey}".encode('utf-8'): struct.pack('>d', value) for rowkey, value in plist.items()
+        }
+
+
+def compact_rows(postings, docs):
+    """
+    紧凑格式的 index 表行: 每个词一个 p:_blob cell，doc_id 为文档在 docs 中的位置
+    最后一行 \x00docmap 保存 doc_id -> RowKey 映射
+    """
+    doc_ids = {rowkey: i for i, (rowkey, _, _) in enumerate(docs)}
+    for word, plist in postings.items():
+        blob = posting_codec.encode([doc_ids[rowkey] for rowkey in plist], list(plist.values()))
+        yield word.encode('utf-8'), {posting_codec.BLOB_QUALIFIER: blob}
+    docmap = ''.join(rowkey for rowkey, _, _ in docs).encode('utf-8')
+    yield posting_codec.DOCMAP_ROW, {posting_codec.DOCMAP_QUALIFIER: docmap}
+
+
+def tf_rows(stats):
+    """
+    原始词频格式的 index 表行: 列 p:t<rowkey> 只存 TF 四元组，不含 IDF
+    与导入器 --index 增量写入的内容相同，之后新增的文档可直接追加
+    """
+    for word, values in stats.items():
+        yield word.encode('utf-8'), {
+            posting_codec.tf_qualifier(rowkey): posting_codec.encode_tf((tc, tt, cc, ct))
+            for rowkey, tc, tt, cc, ct in values
+        }
+
+
+def position_rows(positions):
+    """positions 表的行: 行键=词，列 x:<rowkey> = 差值 varint 编码的位置列表"""
+    for word, plist in positions.items():
+        yield word.encode('utf-8'), {
+            posting_codec.positions_qualifier(rowkey): posting_codec.encode_positions(p) for rowkey, p in plist.items()
+        }
+
+
+def recreate_table(table_name, families, host='localhost', port=9090):
+    """
+    全量重建前清空目标表 (删除后按原列族重建)。只覆盖写入时，上次构建留下的旧格式 cell 与已删除文档的倒排仍在，
+    index 表会变成 mixed 行 (check_index_format / BM25 检索据此拒绝或降级)
+    """
+    connection = happybase.Connection(host, port=port)
+    try:
+        if table_name.encode('utf-8') in connection.tables():
+            connection.delete_table(table_name, disable=True)
+        connection.create_table(table_name, {family: dict() for family in families})
+    finally:
+        connection.close()
+
+
+def write_rows_to_hbase(rows, host='localhost', port=9090, table_name='index', batch_size=1000, families=None):
+    """families 不为空时，表不存在则先建表 (positions 等可选表)"""
+    connection = happybase.Connection(host, port=port)
+    try:
+        if families and table_name.encode('utf-8') not in connection.tables():
+            connection.create_table(table_name, {family: dict() for family in families})
+        table = connection.table(table_name)
+        with table.batch(batch_size=batch_size) as batch:
+            for row_key, data_map in rows:
+                batch.put(row_key, data_map)
+    finally:
+        connection.close()
+
+
+def write_to_hbase(postings, host='localhost', port=9090, table_name='index', batch_size=1000):
+    """以旧格式写入 HBase index 表"""
+    write_rows_to_hbase(legacy_rows(postings), host, port, table_name, batch_size)
+
+
+def write_compact_to_hbase(postings, docs, host='localhost', port=9090, table_name='index', batch_size=1000):
+    """以紧凑格式写入 HBase index 表；返回 (紧凑字节数, 旧格式估算字节数)"""
+    compact_bytes = 0
+    legacy_bytes = sum(posting_codec.legacy_size(len(plist)) for plist in postings.values())
+    connection = happybase.Connection(host, port=port)
+    try:
+        table = connection.table(table_name)
+        with table.batch(batch_size=batch_size) as batch:
+            for row_key, data_map in compact_rows(postings, docs):
+                batch.put(row_key, data_map)
+                if row_key != posting_codec.DOCMAP_ROW:
+                    compact_bytes += len(data_map[posting_codec.BLOB_QUALIFIER])
+    finally:
+        connection.close()
+    return compact_bytes, legacy_bytes
+
+
+def write_to_local(postings, docs, index_dir, positions=None):
+    LocalIndexWriter(index_dir).write(postings, docs, positions)
+
+# =========================================================================
+# 一致性校验: 与 Java 版打分逐条比对
+# =========================================================================
+
+def java_reference_score(value_str, df, total_docs):
+    """逐行移植 IndexReducer.reduce 对单条 "url:tc:tt:cc:ct" 的处理，用作对照"""
+    parts = value_str.split(":")
+    title_count, title_total = int(parts[1]), int(parts[2])
+    content_count, content_total = int(parts[3]), int(parts[4])
+    idf = math.log(float(total_docs) / (df + 1))
+    tf_title = 0 if title_total == 0 else float(title_count) / title_total
+    tf_content = 0 if content_total == 0 else float(content_count) / content_total
+    return (W_TITLE * tf_title + W_CONTENT * tf_content) * idf
+
+
+def check_parity(postings, stats, total_docs, tolerance=1e-12):
+    """返回不一致的 (word, rowkey, python_score, java_score) 列表"""
+    mismatches = []
+    for word, values in stats.items():
+        df = len(values)
+        for rowkey, tc, tt, cc, ct in values:
+            expected = java_reference_score(f"{rowkey}:{tc}:{tt}:{cc}:{ct}", df, total_docs)
+            actual = postings[word][rowkey]
+            if abs(actual - expected) > tolerance:
+                mismatches.append((word, rowkey, actual, expected))
+    return mismatches
+
+# =========================================================================
+# 主程序
+# =========================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the inverted index in Python (alternative to HBaseInvertedIndex)")
+    parser.add_argument('--input', default=str(JSON_FILE), help="提取结果路径 (JSON Lines 或旧版 JSON 数组)")
+    parser.add_argument('--output', choices=['hbase', 'local'], default='local', help="输出目标 (Default: local)")
+    parser.add_argument('--format', choices=['compact', 'legacy', 'tf'], default='compact',
+                        help="HBase 倒排格式: compact=每词一个 blob, legacy=与 IndexReducer 相同, "
+                             "tf=原始词频 (查询时计算 IDF，支持导入器 --index 增量更新) (Default: compact)")
+    parser.add_argument('--index-dir', default=str(LOCAL_INDEX_PATH), help="本地索引目录 (仅 --output local)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="进程数 (Default: CPU 核数)")
+    parser.add_argument('--shards', type=int, default=None, help="分片数 (Default: workers * 4)")
+    parser.add_argument('--check-parity', action='store_true', help="构建后与 Java 版打分公式逐条比对")
+    parser.add_argument('--positions', action='store_true',
+                        help="同时构建位置索引 (短语 / 邻近查询用)，HBase 写入 positions 表，本地写入 positions.bin")
+    args = parser.parse_args()
+
+    start = time.time()
+    data_list = list(iter_records(args.input))
+    print(f"[INFO] Loaded {len(data_list)} documents from {args.input}")
+
+    postings, docs, stats = build_index(data_list, args.workers, args.shards, with_docs=(args.output == 'local'))
+    print(f"[INFO] Indexed {len(docs)} docs, {len(postings)} terms with {args.workers} workers ({time.time() - start:.2f}s)")
+
+    if args.check_parity:
+        mismatches = check_parity(postings, stats, len(docs))
+        if mismatches:
+            print(f"[FAIL] {len(mismatches)} postings differ from the Java scoring formula, e.g. {mismatches[:3]}")
+            sys.exit(1)
+        print(f"[Success] Parity check passed: {sum(len(p) for p in postings.values())} postings match IndexReducer")
+
+    positions = None
+    if args.positions:
+        positions = build_positions(data_list, args.workers, args.shards)
+        print(f"[INFO] Built positional index for {len(positions)} terms ({time.time() - start:.2f}s)")
+        if args.output == 'hbase':
+            recreate_table(posting_codec.POSITIONS_TABLE, [posting_codec.POSITIONS_FAMILY])
+            write_rows_to_hbase(position_rows(positions), table_name=posting_codec.POSITIONS_TABLE)
+            print(f"[Success] Positions written to HBase table '{posting_codec.POSITIONS_TABLE}'")
+
+    if args.output == 'hbase':
+        recreate_table('index', [INDEX_FAMILY])
+    if args.output == 'hbase' and args.format == 'compact':
+        compact_bytes, legacy_bytes = write_compact_to_hbase(postings, docs)
+        print(f"[INFO] Postings size: {compact_bytes / 1024:.1f} KB compact vs {legacy_bytes / 1024:.1f} KB legacy "
+              f"({legacy_bytes / max(compact_bytes, 1):.1f}x smaller)")
+        print(f"[Success] Compact index written to HBase table 'index' ({time.time() - start:.2f}s)")
+    elif args.output == 'hbase' and args.format == 'tf':
+        write_rows_to_hbase(tf_rows(stats))
+        print(f"[Success] Raw-TF index written to HBase table 'index' ({time.time() - start:.2f}s)")
+    elif args.output == 'hbase':
+        write_to_hbase(postings)
+        print(f"[Success] Index written to HBase table 'index' ({time.time() - start:.2f}s)")
+    else:
+        write_to_local(postings, docs, args.index_dir, positions)
+        print(f"[Success] Local index written to {os.path.abspath(args.index_dir)} ({time.time() - start:.2f}s)")
@@ -0,0 +1,225 @@
+import json
+import mmap
+import os
+import shutil
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+
+import numpy as np
+
+from src.mapreduce import posting_codec
+from src.etl.corpus_stats import corpus_summary
+
+# =========================================================================
+# 本地索引文件格式 (单机部署 / 基准测试用，无需 Hadoop/HBase)
+# 由 inverted_index.py --output local 生成，Web 端 LocalStorage 只读打开
+#
+#   lexicon.tsv   按词排序: term \t blob 起始字节 \t blob 字节数 \t 文档频率 df
+#   postings.bin  每个词一个紧凑倒排 blob (delta + varint doc_id，int16 量化分数，见 posting_codec.py)
+#   rowkeys.txt   doc_id -> files 表 RowKey (URL 的 MD5)，每行一个
+#   docs.bin      结果页字段 (url/title/snippet/meta) 的 JSON，按 doc_id 顺序拼接
+#   docs.off      docs.bin 的偏移数组 (uint64, N+1 个)
+#   content.bin   全文 (UTF-8)，按 doc_id 顺序拼接
+#   content.off   content.bin 的偏移数组 (uint64, N+1 个)
+#   meta.json     {"format_version": 2, "total_docs": N, "title_tokens": 标题总词数, "content_tokens": 正文总词数}
+#
+# 可选的位置索引 (--positions，短语 / 邻近查询用；首次短语查询时才加载):
+#   positions.tsv 按词排序: term \t blob 起始字节 \t blob 字节数
+#   positions.bin 每个词一个位置 blob (见 posting_codec.encode_position_lists)
+# =========================================================================
+
+FORMAT_VERSION = 2
+
+
+def _load_offsets(path):
+    offsets = array('Q')
+    with open(path, 'rb') as f:
+        offsets.frombytes(f.read())
+    return offsets
+
+
+def _mmap_file(path):
+    """只读映射文件；空文件无法 mmap，返回空 bytes"""
+    if os.path.getsize(path) == 0:
+        return b''
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class LocalIndexWriter:
+    """把倒排表和文档写成本地索引目录；先写临时目录，完成后整体替换旧索引"""
+    def __init__(self, index_dir):
+        self.index_dir = Path(index_dir)
+
+    def write(self, postings, docs, positions=None):
+        """
+        postings: {term: {rowkey: score}}
+        docs: [(rowkey, summary_dict, content_str), ...]，列表顺序即 doc_id
+        positions: 可选，{term: {rowkey: [位置, ...]}}
+        """
+        tmp_dir = self.index_dir.with_name(self.index_dir.name + '.tmp')
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+        tmp_dir.mkdir(parents=True)
+
+        doc_ids = {}
+        title_tokens = content_tokens = 0
+        docs_off, content_off = array('Q', [0]), array('Q', [0])
+        with open(tmp_dir / 'rowkeys.txt', 'w', encoding='utf-8') as f_keys, \
+                open(tmp_dir / 'docs.bin', 'wb') as f_docs, \
+                open(tmp_dir / 'content.bin', 'wb') as f_content:
+            for doc_id, (rowkey, summary, content) in enumerate(docs):
+                doc_ids[rowkey] = doc_id
+                title_tokens += summary['meta'].get('title_tokens', 0)
+                content_tokens += summary['meta'].get('content_tokens', 0)
+                f_keys.write(rowkey + '\n')
+                summary_bytes = json.dumps(summary, ensure_ascii=False).encode('utf-8')
+                content_bytes = content.encode('utf-8')
+                f_docs.write(summary_bytes)
+                f_content.write(content_bytes)
+                docs_off.append(docs_off[-1] + len(summary_bytes))
+                content_off.append(content_off[-1] + len(content_bytes))
+        with open(tmp_dir / 'docs.off', 'wb') as f:
+            docs_off.tofile(f)
+        with open(tmp_dir / 'content.off', 'wb') as f:
+            content_off.tofile(f)
+
+        offset = 0
+        with open(tmp_dir / 'lexicon.tsv', 'w', encoding='utf-8') as f_lex, \
+                open(tmp_dir / 'postings.bin', 'wb') as f_post:
+            for term in sorted(postings):
+                plist = postings[term]
+                blob = posting_codec.encode([doc_ids[rowkey] for rowkey in plist], list(plist.values()))
+                f_lex.write(f"{term}\t{offset}\t{len(blob)}\t{len(plist)}\n")
+                f_post.write(blob)
+                offset += len(blob)
+
+        if positions is not None:
+            offset = 0
+            with open(tmp_dir / 'positions.tsv', 'w', encoding='utf-8') as f_lex, \
+                    open(tmp_dir / 'positions.bin', 'wb') as f_pos:
+                for term in sorted(positions):
+                    plist = positions[term]
+                    blob = posting_codec.encode_position_lists([doc_ids[rowkey] for rowkey in plist], list(plist.values()))
+                    f_lex.write(f"{term}\t{offset}\t{len(blob)}\n")
+                    f_pos.write(blob)
+                    offset += len(blob)
+
+        with open(tmp_dir / 'meta.json', 'w', encoding='utf-8') as f:
+            json.dump({'format_version': FORMAT_VERSION, 'total_docs': len(docs),
+                       'title_tokens': title_tokens, 'content_tokens': content_tokens}, f)
+
+        if self.index_dir.exists():
+            shutil.rmtree(self.index_dir)
+        os.replace(tmp_dir, self.index_dir)
+
+
+class LocalIndexReader:
+    """以 mmap 方式只读打开本地索引目录，倒排和文档按需从映射中解码"""
+    def __init__(self, index_dir):
+        self.index_dir = Path(index_dir)
+        with open(self.index_dir / 'meta.json', 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"不支持的本地索引版本: {self.meta.get('format_version')}")
+
+        self.lexicon = {}
+        with open(self.index_dir / 'lexicon.tsv', 'r', encoding='utf-8') as f:
+            for line in f:
+                term, offset, length, df = line.rstrip('\n').split('\t')
+                self.lexicon[term] = (int(offset), int(length), int(df))
+        self.sorted_terms = list(self.lexicon)  # lexicon.tsv 按词排序写出，插入顺序即字典序
+
+        with open(self.index_dir / 'rowkeys.txt', 'r', encoding='utf-8') as f:
+            self.rowkeys = [line.rstrip('\n') for line in f]
+        self.doc_ids = {rowkey: i for i, rowkey in enumerate(self.rowkeys)}
+
+        self.docs_off = _load_offsets(self.index_dir / 'docs.off')
+        self.content_off = _load_offsets(self.index_dir / 'content.off')
+        self._postings = _mmap_file(self.index_dir / 'postings.bin')
+        self._docs = _mmap_file(self.index_dir / 'docs.bin')
+        self._content = _mmap_file(self.index_dir / 'content.bin')
+        self._position_lexicon = None  # 位置索引在首次短语查询时才加载
+        self._positions = None
+
+    @property
+    def total_docs(self):
+        return self.meta['total_docs']
+
+    def corpus_stats(self):
+        """语料统计 (与 HBase stats 表相同的结构)，旧索引没有总词数时平均长度为 0"""
+        return corpus_summary(self.total_docs, self.meta.get('title_tokens', 0), self.meta.get('content_tokens', 0))
+
+    def df(self, term):
+        entry = self.lexicon.get(term)
+        return entry[2] if entry else 0
+
+    def terms(self, prefix='', limit=None):
+        """以 prefix 开头的词及其 df，按字典序排列: [(term, df), ...]"""
+        terms = self.sorted_terms
+        start = bisect_left(terms, prefix)
+        stop = len(terms) if limit is None else min(len(terms), start + limit)
+        result = []
+        for i in range(start, stop):
+            if not terms[i].startswith(prefix):
+                break
+            result.append((terms[i], self.lexicon[terms[i]][2]))
+        return result
+
+    def postings(self, term):
+        """返回 {doc_id: score}，词不存在时返回空字典"""
+        entry = self.lexicon.get(term)
+        if entry is None:
+            return {}
+        offset, length, _ = entry
+        return posting_codec.decode_dict(self._postings[offset:offset + length])
+
+    def posting_arrays(self, term):
+        """返回 (doc_ids, scores) 数组，词不存在时为空数组"""
+        entry = self.lexicon.get(term)
+        if entry is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+        offset, length, _ = entry
+        return posting_codec.decode(self._postings[offset:offset + length])
+
+    @property
+    def has_positions(self):
+        return (self.index_dir / 'positions.tsv').exists()
+
+    def _load_positions(self):
+        lexicon = {}
+        with open(self.index_dir / 'positions.tsv', 'r', encoding='utf-8') as f:
+            for line in f:
+                term, offset, length = line.rstrip('\n').split('\t')
+                lexicon[term] = (int(offset), int(length))
+        # 先映射文件再发布词表，并发查询看到词表时映射一定已就绪
+        self._positions = _mmap_file(self.index_dir / 'positions.bin')
+        self._position_lexicon = lexicon
+
+    def positions(self, term, doc_ids=None):
+        """返回 {doc_id: [位置, ...]}；doc_ids 不为空时只解出这些文档，没有位置索引时返回 None"""
+        if self._position_lexicon is None:
+            if not self.has_positions:
+                return None
+            self._load_positions()
+        entry = self._position_lexicon.get(term)
+        if entry is None:
+            return {}
+        offset, length = entry
+        return posting_codec.decode_position_lists(self._positions[offset:offset + length], doc_ids)
+
+    def summary(self, doc_id):
+        if not 0 <= doc_id < self.total_docs:
+            return None
+        return json.loads(self._docs[self.docs_off[doc_id]:self.docs_off[doc_id + 1]])
+
+    def content(self, doc_id):
+        if not 0 <= doc_id < self.total_docs:
+            return None
+        return self._content[self.content_off[doc_id]:self.content_off[doc_id + 1]].decode('utf-8')
+
+    def close(self):
+        for m in (self._postings, self._docs, self._content, self._positions):
+            if isinstance(m, mmap.mmap):
+                m.close()
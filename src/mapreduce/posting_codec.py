@@ -0,0 +1,223 @@
+import struct
+from itertools import accumulate
+
+import numpy as np
+
+# =========================================================================
+# 紧凑倒排列表编码 (每个词一个 blob)
+#
+#   header   <B version, I count, I varint_bytes, d scale>  (小端, 17 字节)
+#   doc_ids  按升序排列，差值 (delta) 后做 varint 编码，共 varint_bytes 字节
+#   scores   int16 量化分数，score ≈ q / 32767 * scale，共 count * 2 字节
+#
+# 与旧格式 (每条倒排一个 HBase cell，列名 p:<32 位 MD5>，值 8 字节) 相比，
+# 每条倒排只需约 1~3 字节 doc_id + 2 字节分数
+# =========================================================================
+
+CODEC_VERSION = 1
+HEADER = struct.Struct('<BIId')
+SCORE_LEVELS = 32767
+
+
+def _encode_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def encode(doc_ids, scores):
+    """doc_ids: 整数 ID 序列 (互不重复)，scores: 对应分数；返回 bytes"""
+    ids = np.asarray(doc_ids, dtype=np.int64)
+    values = np.asarray(scores, dtype=np.float64)
+    order = np.argsort(ids, kind='stable')
+    ids, values = ids[order], values[order]
+
+    varints = bytearray()
+    deltas = np.diff(ids, prepend=0)
+    for delta in deltas.tolist():
+        _encode_varint(delta, varints)
+
+    # 同一个词的 IDF 相同，分数同号；按绝对值最大者归一化后量化到 int16
+    scale = float(np.abs(values).max()) if len(values) else 0.0
+    if scale > 0:
+        quantized = np.rint(values / scale * SCORE_LEVELS).astype('<i2')
+    else:
+        quantized = np.zeros(len(values), dtype='<i2')
+
+    return HEADER.pack(CODEC_VERSION, len(ids), len(varints), scale) + bytes(varints) + quantized.tobytes()
+
+
+def _decode_varints(buf):
+    """向量化 varint 解码: 以最高位为 0 的字节作为每个数的结尾，按组移位求和"""
+    if not len(buf):
+        return np.zeros(0, dtype=np.int64)
+    ends = np.flatnonzero(buf < 0x80)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    # 每个字节在所属 varint 中的位置 (0, 1, 2, ...)
+    position = np.arange(len(buf)) - np.repeat(starts, ends - starts + 1)
+    chunks = (buf & 0x7F).astype(np.int64) << (7 * position)
+    return np.add.reduceat(chunks, starts)
+
+
+def decode(blob):
+    """返回 (doc_ids: int64 数组, scores: float64 数组)，doc_ids 升序"""
+    version, count, varint_bytes, scale = HEADER.unpack_from(blob, 0)
+    if version != CODEC_VERSION:
+        raise ValueError(f"不支持的倒排编码版本: {version}")
+    buf = np.frombuffer(blob, dtype=np.uint8, count=varint_bytes, offset=HEADER.size)
+    doc_ids = np.cumsum(_decode_varints(buf))
+    quantized = np.frombuffer(blob, dtype='<i2', count=count, offset=HEADER.size + varint_bytes)
+    scores = quantized.astype(np.float64) * (scale / SCORE_LEVELS)
+    return doc_ids, scores
+
+
+def decode_dict(blob):
+    """解码为 {doc_id: score}，供基于字典的合并逻辑使用"""
+    doc_ids, scores = decode(blob)
+    return dict(zip(doc_ids.tolist(), scores.tolist()))
+
+
+def decode_legacy_row(row):
+    """
+    旧格式的一行 {b'p:<rowkey>': 8 字节大端 double} -> (列名列表, float64 分数数组)
+    所有值拼成一块缓冲区后按 >f8 视图一次转换；列名保持 bytes，取结果页时才解码
+    兼容以字符串存储的分数 (长度不为 8)，无法解析时记 0；原始词频格式的 p:t<rowkey> 列不计入
+    """
+    cols, vals = [], []
+    for col, val in row.items():
+        if col.startswith(b'p:') and not col.startswith(TF_PREFIX):
+            cols.append(col)
+            vals.append(val)
+    if all(len(v) == 8 for v in vals):
+        scores = np.frombuffer(b''.join(vals), dtype='>f8').astype(np.float64)
+    else:
+        scores = np.fromiter((_parse_score(v) for v in vals), dtype=np.float64, count=len(vals))
+    return cols, scores
+
+
+def _parse_score(val):
+    if len(val) == 8:
+        return struct.unpack('>d', val)[0]
+    try:
+        return float(val.decode('utf-8'))
+    except (UnicodeDecodeError, ValueError):
+        return 0.0
+
+
+def legacy_size(postings_count, rowkey_length=32):
+    """估算旧格式下一个词的倒排在 HBase 中的体积 (列名 + 值，不含 KeyValue 固定开销)"""
+    return postings_count * (len('p:') + rowkey_length + 8)
+
+# =========================================================================
+# 紧凑格式在 HBase index 表中的布局 (沿用已有的列族 p，无需修改表结构)
+#   行键 = 词，列 p:_blob = 该词的倒排 blob (MD5 列名只含十六进制字符，不会与 _blob 冲突)
+#   行键 \x00docmap，列 p:_rowkeys = 按 doc_id 顺序拼接的 32 字节 RowKey
+# =========================================================================
+
+BLOB_QUALIFIER = b'p:_blob'
+DOCMAP_ROW = b'\x00docmap'
+DOCMAP_QUALIFIER = b'p:_rowkeys'
+ROWKEY_LENGTH = 32
+
+# =========================================================================
+# 原始词频格式 (tf，支持增量更新): 同样位于列族 p
+#   行键 = 词，列 p:t<RowKey> = >IIII (titleCount, titleTotal, contentCount, contentTotal)
+#   每篇文档单独一个 cell，导入新文档时只需 put / delete 对应的 cell；分数在查询时计算 (见 scoring.py)
+#   前缀 t 不是十六进制字符，不会与旧格式的 p:<MD5> 冲突
+# =========================================================================
+
+TF_PREFIX = b'p:t'
+TF_CELL = struct.Struct('>IIII')
+
+
+def tf_qualifier(rowkey):
+    return TF_PREFIX + rowkey.encode('utf-8')
+
+
+def encode_tf(counts):
+    return TF_CELL.pack(*counts)
+
+
+def decode_tf_cells(row):
+    """从 index 表的一行中取出 tf cell: 返回 (RowKey 列表, (n, 4) int64 数组)"""
+    cells = [(col, val) for col, val in row.items() if col.startswith(TF_PREFIX)]
+    rowkeys = [col[len(TF_PREFIX):].decode('utf-8') for col, _ in cells]
+    tf = np.frombuffer(b''.join(val for _, val in cells), dtype='>u4').reshape(-1, 4).astype(np.int64)
+    return rowkeys, tf
+
+
+def row_format(row):
+    """
+    index 表一行的格式: 'compact' / 'legacy' / 'tf'，在旧格式或紧凑格式的索引上增量导入后为 'mixed'，空行为 None
+    列名按字节序排列时 p:_blob 与 p:<MD5> 都排在 p:t 之前，因此只取一行的首个 cell 也能区分 'tf' 与其他格式
+    """
+    has_tf = any(col.startswith(TF_PREFIX) for col in row)
+    has_stored = any(not col.startswith(TF_PREFIX) for col in row)
+    if has_tf and has_stored:
+        return 'mixed'
+    if has_tf:
+        return 'tf'
+    if not has_stored:
+        return None
+    return 'compact' if BLOB_QUALIFIER in row else 'legacy'
+
+# =========================================================================
+# 位置索引 (可选，短语 / 邻近查询用): 与倒排分开存放，普通查询不会读取
+#   HBase: 表 positions，行键 = 词，列 x:<RowKey> = 该词在文档中的位置 (升序，差值 varint)
+#   本地索引: 每个词一个 blob，按 doc_id 升序依次为 varint(doc_id 差值)、varint(位置个数)、位置差值...
+#   位置编号见 scoring.term_positions (标题在前、正文在后)
+# =========================================================================
+
+POSITIONS_TABLE = 'positions'
+POSITIONS_FAMILY = 'x'
+POSITIONS_PREFIX = b'x:'
+
+
+def positions_qualifier(rowkey):
+    return POSITIONS_PREFIX + rowkey.encode('utf-8')
+
+
+def encode_positions(positions):
+    """升序位置列表 -> 差值 varint bytes"""
+    out, prev = bytearray(), 0
+    for p in positions:
+        _encode_varint(p - prev, out)
+        prev = p
+    return bytes(out)
+
+
+def decode_positions(blob):
+    """返回升序位置列表 (list，便于逐个跳跃查找)"""
+    return np.cumsum(_decode_varints(np.frombuffer(blob, dtype=np.uint8))).tolist()
+
+
+def encode_position_lists(doc_ids, position_lists):
+    """doc_ids: 整数 ID 序列，position_lists: 对应的升序位置列表；返回一个词的位置 blob"""
+    out, prev_id = bytearray(), 0
+    for doc_id, positions in sorted(zip(doc_ids, position_lists)):
+        _encode_varint(doc_id - prev_id, out)
+        _encode_varint(len(positions), out)
+        prev_id = doc_id
+        prev = 0
+        for p in positions:
+            _encode_varint(p - prev, out)
+            prev = p
+    return bytes(out)
+
+
+def decode_position_lists(blob, doc_ids=None):
+    """一次向量化解出全部 varint，再按结构切分: {doc_id: [位置, ...]}；doc_ids 不为空时只保留这些文档"""
+    values = _decode_varints(np.frombuffer(blob, dtype=np.uint8)).tolist()
+    wanted = set(doc_ids) if doc_ids is not None else None
+    result, i, doc_id = {}, 0, 0
+    while i < len(values):
+        doc_id += values[i]
+        count = values[i + 1]
+        start = i + 2
+        i = start + count
+        if wanted is None or doc_id in wanted:
+            result[doc_id] = list(accumulate(values[start:i]))
+    return result
@@ -0,0 +1,65 @@
+import math
+from collections import Counter
+
+import numpy as np
+
+# =========================================================================
+# 打分公式 (与 HBaseInvertedIndex.IndexReducer 一致)
+#   score = (W_TITLE * titleCount / titleTotal + W_CONTENT * contentCount / contentTotal) * log(N / (df + 1))
+#
+# 全量构建 (compact / legacy 格式) 在写入时就代入了 IDF，N 变化后旧分数不会更新；
+# 原始词频格式 (tf) 只存 (titleCount, titleTotal, contentCount, contentTotal)，
+# 查询时用 stats 表中实时的 N 与 df 计算 IDF，新导入的文档无需重建整个索引
+# =========================================================================
+
+W_TITLE = 5.0
+W_CONTENT = 1.0
+
+
+def term_frequencies(title_tokens, content_tokens):
+    """对应 IndexMapper.map: {word: (titleCount, titleTotal, contentCount, contentTotal)}"""
+    title_total, content_total = len(title_tokens), len(content_tokens)
+    title_counts, content_counts = Counter(title_tokens), Counter(content_tokens)
+    return {
+        word: (title_counts[word], title_total, content_counts[word], content_total)
+        for word in title_counts.keys() | content_counts.keys()
+    }
+
+
+def idf(total_docs, df):
+    return math.log(total_docs / (df + 1)) if total_docs > 0 else 0.0
+
+
+def score(t_count, t_total, c_count, c_total, idf_value):
+    """单条倒排的分数"""
+    tf_title = t_count / t_total if t_total else 0.0
+    tf_content = c_count / c_total if c_total else 0.0
+    return (W_TITLE * tf_title + W_CONTENT * tf_content) * idf_value
+
+
+def score_array(tf, idf_value):
+    """向量化版本: tf 为 (n, 4) 整数数组，每行一个四元组；返回 float64 分数数组"""
+    tf = np.asarray(tf, dtype=np.float64).reshape(-1, 4)
+    tf_title = np.divide(tf[:, 0], tf[:, 1], out=np.zeros(len(tf)), where=tf[:, 1] > 0)
+    tf_content = np.divide(tf[:, 2], tf[:, 3], out=np.zeros(len(tf)), where=tf[:, 3] > 0)
+    return (W_TITLE * tf_title + W_CONTENT * tf_content) * idf_value
+
+
+# =========================================================================
+# 词位置 (位置索引，短语 / 邻近查询用)
+#   标题位置为 0 .. titleTotal-1，正文从 titleTotal + FIELD_GAP 开始编号，
+#   两个字段之间留出空档，短语和邻近窗口 (slop < FIELD_GAP) 不会跨字段匹配
+# =========================================================================
+
+FIELD_GAP = 100
+
+
+def term_positions(title_tokens, content_tokens):
+    """{word: [位置, ...]}，位置升序"""
+    positions = {}
+    for i, word in enumerate(title_tokens):
+        positions.setdefault(word, []).append(i)
+    offset = len(title_tokens) + FIELD_GAP
+    for i, word in enumerate(content_tokens):
+        positions.setdefault(word, []).append(offset + i)
+    return positions
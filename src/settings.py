@@ -13,6 +13,31 @@ BIN_DIR = PROJECT_ROOT / "bin"
 
 # 3. 具体文件路径 (可选)
 STOPWORDS_PATH = CONFIG_DIR / "stopwords_full.txt"
+JIEBA_CACHE_PATH = CONFIG_DIR / "jieba.cache"  # jieba 词典的序列化缓存 (src/etl/analyzer.py，首次分词时生成)
 RAW_DATA_PATH = DATA_DIR / "raw"
 PROCESSED_DATA_PATH = DATA_DIR / "processed"
 FAIL_DATA_PATH = DATA_DIR / "failures"
+LOCAL_INDEX_PATH = PROCESSED_DATA_PATH / "local_index"  # 本地索引目录 (不依赖 HBase 的单机模式)
+INDEX_VERSION_PATH = PROCESSED_DATA_PATH / "index.version"  # 索引版本戳，重建索引后更新，Web 端据此清空缓存
+EXTRACT_DATA_PATH = PROCESSED_DATA_PATH / "extract_data.jsonl"  # 提取结果 (JSON Lines，每行一篇文档)
+BULK_LOAD_PATH = PROCESSED_DATA_PATH / "bulk"  # 批量加载用的有序预分区文件 (bulk_load.py -> HFileBulkLoad.java)
+CHECKPOINT_DIR = PROCESSED_DATA_PATH / "checkpoints"  # 提取 / 导入的断点续传检查点
+EXTRACT_CACHE_PATH = PROCESSED_DATA_PATH / "extract_cache.sqlite"  # 提取缓存 (文件内容哈希 -> 解析与分词结果)
+
+# 4. 检索相关参数
+SNIPPET_LENGTH = 300  # 导入时预先截取的摘要长度 (info:snippet)，结果页只展示这一段
+
+# 5. BM25F 排序参数 (search_engine.BM25FScorer，仅用于原始词频格式的索引)
+BM25_K1 = 1.2  # 词频饱和速度
+BM25_B = 0.75  # 文档长度归一化强度 (0 = 不归一化，1 = 完全按长度归一化)
+BM25_TITLE_WEIGHT = 5.0  # 标题字段权重 (与 IndexReducer 的 W_TITLE 一致)
+BM25_CONTENT_WEIGHT = 1.0  # 正文字段权重
+
+# 6. 分词模式 (TextTokenizer): pos = 词性标注过滤 (默认)，fast = 不做词性标注 (更快，见 src/etl/benchmark.py)
+#    建索引与查询必须一致，修改后需重新提取并重建索引
+TOKENIZER_MODE = "pos"
+
+# 7. 通配符 / 前缀查询 (教学*、compu*、comp?ter): 按 df 展开为若干个索引中的词
+WILDCARD_SCAN_LIMIT = 5000  # 每个模式最多扫描的候选词数 (index 表 row_prefix 扫描 / 本地词表的 limit)
+WILDCARD_MAX_TERMS = 50  # 每个模式最多展开的词数 (取 df 最高的)
+WILDCARD_MAX_POSTINGS = 200000  # 每个模式展开词的 df 之和上限，限制读取与合并的倒排总量
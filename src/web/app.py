@@ -1,10 +1,14 @@
 import time
 import logging
+import threading
 import re  # [新增] 正则表达式
-from flask import Flask, render_template, request
+from flask import Flask, render_template, request, jsonify, abort
 from markupsafe import Markup  # [修改] 从 markupsafe 导入
-from search_engine import HBaseConnector, SearchEngine
+from search_engine import SearchEngine, QueryPlanner, create_storage
+from storage import HBaseStorage, LocalStorage
+from src.settings import LOCAL_INDEX_PATH
 import math
+import argparse
 
 # ================= 配置日志 =================
 # 配置日志格式，让终端输出看起来更专业
@@ -41,34 +45,42 @@ logger.addHandler(ch)
 app = Flask(__name__)
 
 # 全局变量保持连接
-connector = None
+storage = None
 engine = None
 
-def init_engine():
-    """初始化 HBase 连接"""
-    global connector, engine
+def init_engine(backend='hbase', index_dir=LOCAL_INDEX_PATH, ranking=SearchEngine.RANKING_BM25):
+    """初始化存储后端 (HBase 连接池 / 本地索引) 与搜索引擎"""
+    global storage, engine
     if not engine:
-        try:
+        if backend == LocalStorage.name:
+            logger.info(f"正在加载本地索引: {index_dir}")
+        else:
             logger.info("正在连接 HBase Thrift Server...")
-            connector = HBaseConnector(host='localhost', port=9090)
-            connector.connect()
-            engine = SearchEngine(connector)
-            logger.info("搜索引擎核心模块加载完毕！")
-        except Exception as e:
-            logger.error(f"HBase 连接失败: {str(e)}")
+        # 连接池大小与 Flask 并发线程数相匹配；HBase 在后台线程中连接，暂不可用时照常启动，请求到来时自动重连
+        storage = create_storage(backend, host='localhost', port=9090, pool_size=8, index_dir=index_dir, wait=False)
+        engine = SearchEngine(storage, ranking=ranking)
+        # jieba 词典在后台加载，服务无需等待即可开始监听，就绪状态见 /health
+        threading.Thread(target=engine.warm_up, name='warm-up', daemon=True).start()
+        logger.info("搜索引擎核心模块加载完毕！")
 
 @app.template_filter('highlight')
 def highlight_filter(text, keyword):
     """
     使用正则忽略大小写替换，给关键词加上高亮标签
+    keyword 可以是单个字符串，也可以是分词后的检索词列表
     注意：为了防止 XSS，生产环境应先转义 text，再替换，这里 Demo 直接处理
     """
     if not keyword or not text:
         return text
+
+    terms = [keyword] if isinstance(keyword, str) else [t for t in keyword if t]
+    if not terms:
+        return text
     
     # 忽略大小写，保留原文的大小写，包裹在 <mark> 中
-    # pattern: (keyword) -> <span class="highlight">\1</span>
-    pattern = re.compile(f'({re.escape(keyword)})', re.IGNORECASE)
+    # pattern: (kw1|kw2) -> <span class="highlight">\1</span>，长词优先匹配
+    alternation = '|'.join(re.escape(t) for t in sorted(terms, key=len, reverse=True))
+    pattern = re.compile(f'({alternation})', re.IGNORECASE)
     
     # 使用 Markup 标记为安全 HTML，否则会被 Flask 转义显示为 &lt;span...
     return Markup(pattern.sub(r'<span class="highlight">\1</span>', text))
@@ -91,16 +103,26 @@ def search():
 
     page_size = 9  # 每页显示 10 条
 
+    # 多词查询的合并方式: and (默认，求交) / or (求并)
+    operator = request.args.get('op', QueryPlanner.OP_AND).lower()
+    if operator not in (QueryPlanner.OP_AND, QueryPlanner.OP_OR):
+        operator = QueryPlanner.OP_AND
+
     if not keyword:
         return render_template('index.html')
 
     start_time = time.time()
+    terms = [keyword]
+    expansions = {}
     
     try:
-        logger.info(f"搜索请求: '{keyword}' | Page={page}")
+        logger.info(f"搜索请求: '{keyword}' | Page={page} | Op={operator}")
         
-        # [修改] 调用 search 接收两个返回值
-        results, total_count = engine.search(keyword, page=page, page_size=page_size)
+        # [修改] 调用 search 接收结果、总数与通配符展开结果
+        results, total_count, expansions = engine.search(keyword, page=page, page_size=page_size, operator=operator,
+                                                         with_expansions=True)
+        terms = engine.planner.plan(engine.planner.parse_wildcards(keyword)[0])
+        terms += [t for e in expansions.values() for t in e['terms']]
         
         # [新增] 计算总页数
         total_pages = math.ceil(total_count / page_size)
@@ -112,20 +134,66 @@ def search():
         total_pages = 0
 
     elapsed_time = time.time() - start_time
-    logger.info(f"耗时: {elapsed_time:.4f}s | 总数: {total_count} | 当前页: {len(results)}")
+    cache_info = engine.cache_stats()['result_cache'] if engine else {'hit_rate': 0.0}
+    logger.info(f"耗时: {elapsed_time:.4f}s | 总数: {total_count} | 当前页: {len(results)} | 缓存命中率: {cache_info['hit_rate']:.1%}")
 
     return render_template(
         'index.html', 
         results=results, 
         keyword=keyword, 
+        terms=terms,             # 分词后的检索词 (含通配符展开出的词)，用于高亮
+        expansions=expansions,   # 通配符模式 -> {'terms': 展开的词, 'truncated': 是否截断}
+        op=operator,
         count=total_count,  # 这里的 count 是总条数
         time=f"{elapsed_time:.4f}",
         current_page=page,       # [新增] 传给模板
         total_pages=total_pages  # [新增] 传给模板
     )
 
+@app.route('/suggest')
+def suggest():
+    """前缀补全 (JSON): /suggest?q=教学&n=10，按文档频率降序返回以最后一个词为前缀的索引词"""
+    keyword = request.args.get('q', '')
+    try:
+        limit = min(max(int(request.args.get('n', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+    try:
+        suggestions = engine.suggest(keyword, limit=limit)
+    except Exception as e:
+        logger.error(f"补全出错: {str(e)}")
+        abort(503)
+    return jsonify({'q': keyword, 'suggestions': suggestions})
+
+@app.route('/health')
+def health():
+    """就绪检查: 分词器已预热、存储后端已连接时返回 200，否则 503 (进程存活但尚未就绪)"""
+    status = engine.health() if engine else {'ready': False}
+    return jsonify(status), (200 if status['ready'] else 503)
+
+@app.route('/doc/<rowkey>')
+def document(rowkey):
+    """按需返回单个文档的全文 (JSON)，结果页默认只加载摘要"""
+    try:
+        doc = engine.get_document(rowkey)
+    except Exception as e:
+        logger.error(f"读取文档出错: {str(e)}")
+        abort(503)
+    if doc is None:
+        abort(404)
+    return jsonify(doc)
+
 if __name__ == '__main__':
-    init_engine()
+    parser = argparse.ArgumentParser(description="HBase Search Engine Web Server")
+    parser.add_argument('--backend', choices=[HBaseStorage.name, LocalStorage.name], default=HBaseStorage.name,
+                        help="存储后端: hbase 或 local (Default: hbase)")
+    parser.add_argument('--index-dir', default=str(LOCAL_INDEX_PATH), help="本地索引目录 (仅 local 后端)")
+    parser.add_argument('--ranking', choices=[SearchEngine.RANKING_BM25, SearchEngine.RANKING_STORED],
+                        default=SearchEngine.RANKING_BM25,
+                        help="排序方式: bm25 = 原始词频格式的索引查询时按 BM25F 打分, stored = 使用索引中的分数 (Default: bm25)")
+    args = parser.parse_args()
+
+    init_engine(args.backend, args.index_dir, args.ranking)
     # 启动 Web 服务器，host='0.0.0.0' 允许局域网/WSL宿主机访问
     logger.info("Web 服务器启动在 http://localhost:5000")
-    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False, threaded=True)
\ No newline at end of file
@@ -0,0 +1,435 @@
+import argparse
+import contextlib
+import hashlib
+import heapq
+import io
+import random
+import statistics
+import struct
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from pathlib import Path
+
+from search_engine import SearchEngine, BM25FScorer, RankedHits, TermSuggester
+from storage import HBaseConnector, HBaseStorage, LocalStorage
+from src.mapreduce import posting_codec
+from src.mapreduce.local_index import LocalIndexWriter
+
+# =========================================================================
+# 工具函数: 生成合成数据 & 计时
+# =========================================================================
+
+def make_posting_row(n, seed=42):
+    """生成与 IndexReducer 输出格式一致的合成倒排行: {b'p:<md5>': 8字节双精度分数}"""
+    rng = random.Random(seed)
+    row = {}
+    for i in range(n):
+        rowkey = hashlib.md5(f"doc-{seed}-{i}".encode('utf-8')).hexdigest()
+        row[f"p:{rowkey}".encode('utf-8')] = struct.pack('>d', rng.random() * 10)
+    return row
+
+
+def time_it(func, repeat):
+    """运行 repeat 次，返回单次平均耗时 (毫秒)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def print_table(header, rows):
+    widths = [max(len(str(x)) for x in col) for col in zip(header, *rows)]
+    line = "  ".join(f"{{:>{w}}}" for w in widths)
+    print(line.format(*header))
+    print("-" * (sum(widths) + 2 * (len(widths) - 1)))
+    for r in rows:
+        print(line.format(*r))
+
+# =========================================================================
+# 基准 1: Top-k 堆选择 vs 全量排序
+# =========================================================================
+
+def heap_top_k(scored, k):
+    """
+    字典版 Top-k (检索热路径改用 SearchEngine.top_k_indices 之前的实现，保留作对照):
+    用大小为 k 的堆取出分数最高的 k 条，只对这 k 条排序，复杂度 O(n log k)
+    scored: {url: score}；返回按分数降序的 [(url, score), ...]
+    """
+    if k <= 0:
+        return []
+    if k >= len(scored):
+        return sorted(scored.items(), key=itemgetter(1), reverse=True)
+    return heapq.nlargest(k, scored.items(), key=itemgetter(1))
+
+
+def legacy_rank(row, start_idx, end_idx):
+    """旧版路径: 每条命中一个 dict，然后全量排序再切片"""
+    hits = []
+    for col_key, val_bytes in row.items():
+        full_col_name = col_key.decode('utf-8')
+        if full_col_name.startswith('p:'):
+            hits.append({'url': full_col_name[2:], 'score': struct.unpack('>d', val_bytes)[0]})
+    hits.sort(key=lambda x: x['score'], reverse=True)
+    return hits[start_idx:end_idx]
+
+
+def topk_rank(row, start_idx, end_idx):
+    """新版路径: 解析为 {url: score}，堆选择前 end_idx 名"""
+    scored = HBaseStorage._parse_postings(row)
+    return heap_top_k(scored, end_idx)[start_idx:end_idx]
+
+
+def bench_topk(sizes, page, page_size, repeat):
+    print(f"[BENCH] Top-k vs 全量排序 (page={page}, page_size={page_size}, repeat={repeat})")
+    start_idx = (page - 1) * page_size
+    end_idx = start_idx + page_size
+    table = []
+    for n in sizes:
+        row = make_posting_row(n)
+        # 两条路径的结果必须一致
+        expected = [h['url'] for h in legacy_rank(row, start_idx, end_idx)]
+        actual = [url for url, _ in topk_rank(row, start_idx, end_idx)]
+        assert expected == actual, f"Top-k 结果与全量排序不一致 (n={n})"
+
+        t_legacy = time_it(lambda: legacy_rank(row, start_idx, end_idx), repeat)
+        t_topk = time_it(lambda: topk_rank(row, start_idx, end_idx), repeat)
+        table.append((n, f"{t_legacy:.3f}", f"{t_topk:.3f}", f"{t_legacy / t_topk:.2f}x"))
+    print_table(("postings", "sort (ms)", "top-k (ms)", "speedup"), table)
+
+# =========================================================================
+# 基准 2: 紧凑倒排编码 vs 旧格式 (体积 & 解码耗时)
+# =========================================================================
+
+def bench_codec(sizes, repeat):
+    print(f"[BENCH] 紧凑倒排 blob vs 旧格式 p:<rowkey> 列 (repeat={repeat})")
+    table = []
+    for n in sizes:
+        row = make_posting_row(n)
+        legacy = HBaseStorage._parse_postings(row)
+        # 模拟全量文档集中的稀疏 doc_id (语料规模取 postings 的 20 倍)
+        doc_ids = sorted(random.Random(n).sample(range(n * 20), n))
+        blob = posting_codec.encode(doc_ids, list(legacy.values()))
+        legacy_bytes = sum(len(k) + len(v) for k, v in row.items())
+
+        t_legacy = time_it(lambda: HBaseStorage._parse_postings(row), repeat)
+        t_compact = time_it(lambda: posting_codec.decode_dict(blob), repeat)
+        table.append((n, legacy_bytes, len(blob), f"{legacy_bytes / len(blob):.1f}x",
+                      f"{t_legacy:.3f}", f"{t_compact:.3f}", f"{t_legacy / t_compact:.1f}x"))
+    print_table(("postings", "legacy (B)", "compact (B)", "size", "parse (ms)", "decode (ms)", "speedup"), table)
+
+# =========================================================================
+# 基准 3: 并发负载测试 (本地 HBase 替身)
+# =========================================================================
+
+class StandInTable:
+    """内存表，每次 RPC 按 latency 秒休眠以模拟 Thrift 往返 (休眠期间释放 GIL)"""
+    def __init__(self, data, latency):
+        self.data = data
+        self.latency = latency
+
+    @staticmethod
+    def _select(row, columns):
+        if not columns:
+            return dict(row)
+        return {c: v for c, v in row.items() if c in columns}
+
+    def row(self, key, columns=None):
+        time.sleep(self.latency)
+        return self._select(self.data.get(key, {}), columns)
+
+    def rows(self, keys, columns=None):
+        time.sleep(self.latency)
+        return [(k, self._select(self.data[k], columns)) for k in keys if k in self.data]
+
+
+class StandInConnection:
+    def __init__(self, tables, latency):
+        self._tables = tables
+        self.latency = latency
+
+    def table(self, name):
+        return StandInTable(self._tables[name], self.latency)
+
+    def tables(self):
+        time.sleep(self.latency)
+        return [name.encode('utf-8') for name in self._tables]
+
+    def close(self):
+        pass
+
+
+class StandInConnector(HBaseConnector):
+    """复用真实的 HBaseConnector 连接池逻辑，只把底层连接换成内存替身"""
+    def __init__(self, tables, latency, pool_size):
+        super().__init__(pool_size=pool_size)
+        self.stand_in_tables = tables
+        self.latency = latency
+
+    def _new_connection(self):
+        return StandInConnection(self.stand_in_tables, self.latency)
+
+
+LOAD_TERMS = ["教学", "管理", "学生", "课程", "考试", "教师", "研究", "学院", "本科", "培养"]
+
+
+def make_stand_in_tables(num_docs, postings_per_term, seed=42):
+    rng = random.Random(seed)
+    rowkeys = [hashlib.md5(f"doc-{i}".encode('utf-8')).hexdigest() for i in range(num_docs)]
+    files = {
+        key.encode('utf-8'): {
+            b'info:url': f"https://example.com/{key}.pdf".encode('utf-8'),
+            b'info:title': f"文档 {key[:8]}".encode('utf-8'),
+            b'info:snippet': ("教学管理 " * 30).encode('utf-8'),
+            b'info:meta': b'{}',
+        }
+        for key in rowkeys
+    }
+    index = {}
+    for term in LOAD_TERMS:
+        docs = rng.sample(rowkeys, min(postings_per_term, num_docs))
+        index[term.encode('utf-8')] = {f"p:{d}".encode('utf-8'): struct.pack('>d', rng.random()) for d in docs}
+    return {'index': index, 'files': files}
+
+
+def bench_load(workers_list, pool_size, latency_ms, requests_per_run, num_docs, postings_per_term):
+    print(f"[BENCH] 并发负载测试 (pool_size={pool_size}, latency={latency_ms}ms, requests={requests_per_run})")
+    tables = make_stand_in_tables(num_docs, postings_per_term)
+    rng = random.Random(0)
+    queries = [" ".join(rng.sample(LOAD_TERMS, rng.randint(1, 2))) for _ in range(requests_per_run)]
+
+    table = []
+    baseline = None
+    for workers in workers_list:
+        connector = StandInConnector(tables, latency_ms / 1000, pool_size)
+        # 关闭结果/文档缓存，测量每个请求都打到 HBase 时的吞吐
+        engine = SearchEngine(HBaseStorage(connector), result_cache_size=0, doc_cache_size=0)
+        engine.planner.plan(LOAD_TERMS[0])  # 预热 jieba，避免计入首个请求
+
+        def one_request(query):
+            page = rng.randint(1, 3)
+            return engine.search(query, page=page, page_size=9, operator='or')
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(one_request, queries))
+            elapsed = time.perf_counter() - start
+
+        qps = requests_per_run / elapsed
+        baseline = baseline or qps
+        table.append((workers, f"{qps:.1f}", f"{qps / baseline:.2f}x", connector.stats()['reconnects']))
+        connector.close()
+    print_table(("workers", "req/s", "scaling", "connections"), table)
+
+# =========================================================================
+# 基准 4: 存储后端延迟对比 (HBase 替身 vs 本地 mmap 索引)
+# =========================================================================
+
+def write_local_index_from_tables(tables, index_dir):
+    """把替身表中的同一份数据写成本地索引 (紧凑格式，分数经 int16 量化)"""
+    postings = {}
+    for term, row in tables['index'].items():
+        postings[term.decode('utf-8')] = HBaseStorage._parse_postings(row)
+    docs = []
+    for key, row in tables['files'].items():
+        summary = {
+            'url': row[b'info:url'].decode('utf-8'),
+            'title': row[b'info:title'].decode('utf-8'),
+            'snippet': row[b'info:snippet'].decode('utf-8'),
+            'meta': {},
+        }
+        docs.append((key.decode('utf-8'), summary, summary['snippet']))
+    LocalIndexWriter(index_dir).write(postings, docs)
+
+
+def bench_backends(latency_ms, requests_per_run, num_docs, postings_per_term):
+    print(f"[BENCH] 存储后端延迟对比 (HBase 替身 latency={latency_ms}ms, requests={requests_per_run}, 缓存关闭)")
+    tables = make_stand_in_tables(num_docs, postings_per_term)
+    rng = random.Random(0)
+    queries = [" ".join(rng.sample(LOAD_TERMS, rng.randint(1, 2))) for _ in range(requests_per_run)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index_dir = Path(tmp) / 'local_index'
+        write_local_index_from_tables(tables, index_dir)
+        backends = [
+            ('hbase (stand-in)', HBaseStorage(StandInConnector(tables, latency_ms / 1000, pool_size=1))),
+            ('local (mmap)', LocalStorage(index_dir)),
+        ]
+
+        table, reference = [], None
+        for name, storage in backends:
+            engine = SearchEngine(storage, result_cache_size=0, doc_cache_size=0)
+            engine.planner.plan(LOAD_TERMS[0])
+            latencies, answers = [], []
+            with contextlib.redirect_stdout(io.StringIO()):
+                for query in queries:
+                    start = time.perf_counter()
+                    results, total = engine.search(query, page=1, page_size=9, operator='or')
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    answers.append((total, [r['id'] for r in results]))
+            if reference is None:
+                reference = answers
+            # 命中总数必须一致；量化只可能改变分数几乎相同的文档之间的先后，用首页重合率衡量
+            assert [t for t, _ in answers] == [t for t, _ in reference], f"{name} 的命中总数与 HBase 后端不一致"
+            overlap = statistics.mean(
+                len(set(ids) & set(ref_ids)) / len(ref_ids) if ref_ids else 1.0
+                for (_, ids), (_, ref_ids) in zip(answers, reference)
+            )
+
+            latencies.sort()
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            table.append((name, f"{statistics.mean(latencies):.3f}", f"{statistics.median(latencies):.3f}",
+                          f"{p95:.3f}", f"{overlap:.3f}"))
+            storage.close()
+    print_table(("backend", "mean (ms)", "p50 (ms)", "p95 (ms)", "overlap@9"), table)
+
+# =========================================================================
+# 基准 5: BM25F 打分 (向量化 vs 逐条倒排)
+# =========================================================================
+
+def make_tf_row(n, seed=42):
+    """生成原始词频格式的合成倒排行: {b'p:t<md5>': TF 四元组}"""
+    rng = random.Random(seed)
+    row = {}
+    for i in range(n):
+        rowkey = hashlib.md5(f"doc-{seed}-{i}".encode('utf-8')).hexdigest()
+        title_total, content_total = rng.randint(1, 20), rng.randint(50, 5000)
+        counts = (rng.randint(0, 2), title_total, rng.randint(1, 30), content_total)
+        row[posting_codec.tf_qualifier(rowkey)] = posting_codec.encode_tf(counts)
+    return row
+
+
+def loop_bm25(scorer, rowkeys, tf, corpus):
+    """逐条倒排的参考实现，用于校验向量化结果"""
+    df, n = len(rowkeys), corpus['doc_count']
+    idf = scorer.idf(n, df)
+    scores = {}
+    for rowkey, (tc, tt, cc, ct) in zip(rowkeys, tf.tolist()):
+        weighted = (scorer.title_weight * tc / (1 - scorer.b + scorer.b * tt / corpus['avg_title_tokens'])
+                    + scorer.content_weight * cc / (1 - scorer.b + scorer.b * ct / corpus['avg_content_tokens']))
+        scores[rowkey] = idf * weighted / (scorer.k1 + weighted)
+    return scores
+
+
+def bench_bm25(sizes, repeat):
+    print(f"[BENCH] BM25F 打分: 向量化 vs 逐条 (repeat={repeat})")
+    scorer = BM25FScorer()
+    table = []
+    for n in sizes:
+        rowkeys, tf = posting_codec.decode_tf_cells(make_tf_row(n))
+        corpus = {'doc_count': n * 20, 'avg_title_tokens': 10.0, 'avg_content_tokens': 2500.0}
+        expected = loop_bm25(scorer, rowkeys, tf, corpus)
+        actual = dict(zip(rowkeys, scorer.score(tf, corpus).tolist()))
+        assert all(abs(actual[k] - v) < 1e-9 for k, v in expected.items()), f"向量化 BM25F 与逐条计算不一致 (n={n})"
+
+        t_loop = time_it(lambda: loop_bm25(scorer, rowkeys, tf, corpus), repeat)
+        t_vec = time_it(lambda: dict(zip(rowkeys, scorer.score(tf, corpus).tolist())), repeat)
+        table.append((n, f"{t_loop:.3f}", f"{t_vec:.3f}", f"{t_loop / t_vec:.1f}x"))
+    print_table(("postings", "loop (ms)", "vectorized (ms)", "speedup"), table)
+
+# =========================================================================
+# 基准 6: 倒排解码 + 排序 (逐列 unpack vs 整块 >f8 视图 + argpartition)
+# =========================================================================
+
+def percolumn_rank(row, start_idx, end_idx):
+    """原热路径: 逐列解码列名、struct.unpack 分数、构造字典，再用堆选出前 end_idx 名"""
+    scored = {}
+    for col_key, val_bytes in row.items():
+        full_col_name = col_key.decode('utf-8')
+        if full_col_name.startswith('p:'):
+            try:
+                scored[full_col_name[2:]] = struct.unpack('>d', val_bytes)[0]
+            except struct.error:
+                scored[full_col_name[2:]] = float(val_bytes.decode('utf-8'))
+    return heap_top_k(scored, end_idx)[start_idx:end_idx]
+
+
+def vectorized_rank(row, start_idx, end_idx):
+    """新热路径: 分数整体转成 float64 数组，argpartition 选出前 end_idx 名，只解码当前页的列名"""
+    return RankedHits(HBaseStorage._decode_arrays(row)).page(start_idx, end_idx)
+
+
+def bench_decode(sizes, page, page_size, repeat):
+    print(f"[BENCH] 倒排解码 + 排序: 逐列 vs 向量化 (page={page}, page_size={page_size}, repeat={repeat})")
+    start_idx = (page - 1) * page_size
+    end_idx = start_idx + page_size
+    table = []
+    for n in sizes:
+        row = make_posting_row(n)
+        expected = percolumn_rank(row, start_idx, end_idx)
+        actual = vectorized_rank(row, start_idx, end_idx)
+        assert [s for _, s in expected] == [s for _, s in actual], f"向量化排序结果与逐列解码不一致 (n={n})"
+
+        t_loop = time_it(lambda: percolumn_rank(row, start_idx, end_idx), repeat)
+        t_vec = time_it(lambda: vectorized_rank(row, start_idx, end_idx), repeat)
+        table.append((n, f"{t_loop:.3f}", f"{t_vec:.3f}", f"{t_loop / t_vec:.1f}x"))
+    print_table(("postings", "per-column (ms)", "vectorized (ms)", "speedup"), table)
+
+# =========================================================================
+# 基准 7: 前缀补全 (有序词表 + 二分查找 vs 逐词 startswith 扫描)
+# =========================================================================
+
+def make_term_dictionary(n, seed=42):
+    """合成词表: 2~8 个小写字母的词 (首字母集中，模拟真实词表中短前缀命中大量词的情况)，df 服从长尾分布"""
+    rng = random.Random(seed)
+    terms = set()
+    while len(terms) < n:
+        terms.add(''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 8))))
+    return [(t, int(rng.paretovariate(1.2))) for t in sorted(terms)]
+
+
+def scan_suggest(entries, prefix, limit):
+    matches = [(t, df) for t, df in entries if t.startswith(prefix)]
+    return sorted(matches, key=lambda x: (-x[1], x[0]))[:limit]
+
+
+def bench_suggest(sizes, limit, repeat):
+    print(f"[BENCH] 前缀补全 (limit={limit}, repeat={repeat})")
+    table = []
+    for n in sizes:
+        entries = make_term_dictionary(n)
+        suggester = TermSuggester(entries)
+        for prefix in ('c', 'co', 'com'):
+            assert suggester.suggest(prefix, limit) == scan_suggest(entries, prefix, limit), f"补全结果不一致 (n={n})"
+            lo, hi = suggester.span(prefix)
+            t_scan = time_it(lambda: scan_suggest(entries, prefix, limit), repeat)
+            t_bisect = time_it(lambda: suggester.suggest(prefix, limit), repeat)
+            table.append((n, prefix, hi - lo, f"{t_scan:.3f}", f"{t_bisect:.4f}", f"{t_scan / t_bisect:.0f}x"))
+    print_table(("terms", "prefix", "matches", "scan (ms)", "sorted array (ms)", "speedup"), table)
+
+# =========================================================================
+# 主程序
+# =========================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search Engine Benchmarks")
+    parser.add_argument('suite', choices=['topk', 'codec', 'load', 'backends', 'bm25', 'decode', 'suggest'], help="要运行的基准")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000],
+                        help="[topk/codec/bm25/decode] 合成倒排列表长度 / [suggest] 词表大小 (Default: 1000 10000 50000)")
+    parser.add_argument('--page', type=int, default=1, help="页码 (Default: 1)")
+    parser.add_argument('--page-size', type=int, default=9, help="每页条数，与 app.py 一致 (Default: 9)")
+    parser.add_argument('--repeat', type=int, default=20, help="每组重复次数 (Default: 20)")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16],
+                        help="[load] 并发线程数 (Default: 1 2 4 8 16)")
+    parser.add_argument('--pool-size', type=int, default=8, help="[load] 连接池大小 (Default: 8)")
+    parser.add_argument('--latency-ms', type=float, default=2.0, help="[load/backends] 模拟单次 RPC 延迟 (Default: 2.0)")
+    parser.add_argument('--requests', type=int, default=400, help="[load/backends] 每轮请求数 (Default: 400)")
+    args = parser.parse_args()
+
+    if args.suite == 'topk':
+        bench_topk(args.sizes, args.page, args.page_size, args.repeat)
+    elif args.suite == 'codec':
+        bench_codec(args.sizes, args.repeat)
+    elif args.suite == 'load':
+        bench_load(args.workers, args.pool_size, args.latency_ms, args.requests,
+                   num_docs=5000, postings_per_term=1000)
+    elif args.suite == 'backends':
+        bench_backends(args.latency_ms, args.requests, num_docs=5000, postings_per_term=1000)
+    elif args.suite == 'bm25':
+        bench_bm25(args.sizes, args.repeat)
+    elif args.suite == 'decode':
+        bench_decode(args.sizes, args.page, args.page_size, args.repeat)
+    elif args.suite == 'suggest':
+        bench_suggest(args.sizes, args.page_size, args.repeat)
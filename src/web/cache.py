@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    线程安全的 LRU 缓存，支持:
+    1. 条目数上限 (maxsize)，超出时淘汰最久未使用的条目
+    2. 内存上限 (maxbytes)，按 sizeof(value) 估算每个条目的字节数，None 表示不限制
+    3. 过期时间 (ttl, 秒)，None 表示永不过期
+    4. 命中/未命中计数，便于观察缓存效果
+    """
+    def __init__(self, maxsize=1024, ttl=None, maxbytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self._data = OrderedDict()  # key -> (expire_at, nbytes, value)
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key, now):
+        """调用方需持有锁；返回 (是否命中, value)"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+        expire_at, nbytes, value = entry
+        if expire_at is not None and expire_at < now:
+            del self._data[key]
+            self.nbytes -= nbytes
+            self.misses += 1
+            return False, None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return True, value
+
+    def get(self, key, default=None):
+        with self._lock:
+            found, value = self._lookup(key, time.monotonic())
+            return value if found else default
+
+    def get_many(self, keys):
+        """批量查询，返回 (命中的 {key: value}, 未命中的 key 列表)，便于一次性批量回填"""
+        found_map, missing = {}, []
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                found, value = self._lookup(key, now)
+                if found:
+                    found_map[key] = value
+                else:
+                    missing.append(key)
+        return found_map, missing
+
+    def put(self, key, value):
+        expire_at = time.monotonic() + self.ttl if self.ttl else None
+        nbytes = self.sizeof(value) if self.sizeof else 0
+        # 单个条目超过内存上限时不缓存
+        if self.maxbytes is not None and nbytes > self.maxbytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self._data[key] = (expire_at, nbytes, value)
+            self.nbytes += nbytes
+            while len(self._data) > self.maxsize or (self.maxbytes is not None and self.nbytes > self.maxbytes):
+                _, (_, evicted_bytes, _) = self._data.popitem(last=False)
+                self.nbytes -= evicted_bytes
+
+    def invalidate(self):
+        """清空缓存 (索引重建后调用)，计数器保留"""
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'bytes': self.nbytes,
+            'maxbytes': self.maxbytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
@@ -1,72 +1,588 @@
-import happybase
-import struct
+import argparse
+import heapq
+import os
+import re
 import sys
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
 
-class HBaseConnector:
-    def __init__(self, host='localhost', port=9090):
-        self.host = host
-        self.port = port
-        self.connection = None
+import numpy as np
 
-    def connect(self):
+# web 目录下直接运行 (python app.py) 时，把项目根目录加入搜索路径以便导入 src.*
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.settings import (STOPWORDS_PATH, INDEX_VERSION_PATH, LOCAL_INDEX_PATH,
+                          BM25_K1, BM25_B, BM25_TITLE_WEIGHT, BM25_CONTENT_WEIGHT,
+                          WILDCARD_SCAN_LIMIT, WILDCARD_MAX_TERMS, WILDCARD_MAX_POSTINGS)
+from src.etl.analyzer import Analyzer, normalize
+from src.mapreduce.scoring import FIELD_GAP
+from cache import LRUCache
+from storage import HBaseConnector, HBaseConnectionError, HBaseStorage, LocalStorage, PostingArrays
+
+class QueryPlanner:
+    """
+    查询规划器：
+    1. 使用与建索引时相同的 Analyzer 把查询串切成检索词 (NFKC、大小写折叠、分词、停用词)
+    2. 合并各检索词的倒排列表 (AND 求交 / OR 求并)，按稀有度从小到大处理
+    """
+    OP_AND = 'and'
+    OP_OR = 'or'
+
+    # 短语查询 "本科 学习 指南"；邻近查询 "本科 学习 指南"~N (各词在 N 个位置的空档内出现即可)
+    PHRASE_PATTERN = re.compile(r'^\s*"(?P<text>[^"]+)"\s*(?:~(?P<slop>\d+))?\s*$')
+    MAX_SLOP = FIELD_GAP - 1  # 邻近窗口不能跨过标题与正文之间的位置空档
+    # 通配符查询: 含 * (任意多个字符) 或词中间的 ? (单个字符) 的词不分词，按索引中的词展开
+    # 词尾的 ? 是问句的问号 (NFKC 会把全角 ？ 变成 ?)，与其他句末标点一起先去掉，不当作通配符
+    WILDCARD_TOKEN = re.compile(r'\S*\*\S*|\S+\?\S+')
+    SENTENCE_END = re.compile(r'[?!.,;:。、…]+(?=\s|$)')
+    WILDCARD_CHARS = re.compile(r'[*?]')
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+
+    def _tokenize(self, text):
+        # 分词器会过滤单字、虚词等，全部被过滤时退化为按空格切分，保持旧版单词查询的行为
+        return self.analyzer.analyze_query(text) or normalize(text).split()
+
+    def parse_phrase(self, query):
+        """
+        短语 / 邻近查询返回 (按查询顺序的检索词，不去重, slop)，精确短语的 slop 为 None
+        普通查询返回 (None, None)
+        """
+        match = self.PHRASE_PATTERN.match(query)
+        if not match:
+            return None, None
+        slop = match.group('slop')
+        return self._tokenize(match.group('text')), (min(int(slop), self.MAX_SLOP) if slop else None)
+
+    def parse_wildcards(self, query):
+        """
+        拆出通配符模式 (与索引相同的归一化，全角 ＊ ／ 词中间的 ？ 也按通配符处理)
+        返回 (去掉模式后的普通查询串, [模式, ...])；没有模式时原样返回查询串，交给分词器
+        """
+        text = self.SENTENCE_END.sub('', normalize(query))
+        patterns = list(dict.fromkeys(self.WILDCARD_TOKEN.findall(text)))
+        if not patterns:
+            return query, []
+        return self.WILDCARD_TOKEN.sub(' ', text), patterns
+
+    @classmethod
+    def wildcard_prefix(cls, pattern):
+        """第一个通配符之前的固定前缀 (决定扫描的行键范围)"""
+        return cls.WILDCARD_CHARS.split(pattern, 1)[0]
+
+    @staticmethod
+    def wildcard_regex(pattern):
+        return re.compile(''.join('.*' if c == '*' else '.' if c == '?' else re.escape(c) for c in pattern))
+
+    def plan(self, query):
+        """返回去重后的检索词列表 (保持原顺序)"""
+        phrase, _ = self.parse_phrase(query)
+        terms = phrase if phrase is not None else self._tokenize(query)
+        seen = set()
+        return [t for t in terms if not (t in seen or seen.add(t))]
+
+    @staticmethod
+    def merge(postings_list, operator=OP_AND):
+        """
+        合并多个倒排列表 {url: score}，命中文档的分数为各检索词分数之和
+        postings_list: 与检索词一一对应的倒排列表，缺失的词对应空字典
+        """
+        if not postings_list:
+            return {}
+
+        # 稀有词优先：AND 的代价只与最短的倒排列表相关
+        ordered = sorted(postings_list, key=len)
+
+        if operator == QueryPlanner.OP_OR:
+            merged = dict(ordered[-1])
+            for postings in ordered[:-1]:
+                for url, score in postings.items():
+                    merged[url] = merged.get(url, 0.0) + score
+            return merged
+
+        rarest, others = ordered[0], ordered[1:]
+        merged = {}
+        for url, score in rarest.items():
+            total = score
+            for postings in others:
+                other_score = postings.get(url)
+                if other_score is None:
+                    break
+                total += other_score
+            else:
+                merged[url] = total
+        return merged
+
+    @staticmethod
+    def merge_expansions(postings_list):
+        """
+        通配符展开出的各词合起来视为一个检索词: 求并集，文档分数取各词中的最高分
+        (不求和，避免同一文档因为命中多个变体而被重复加分)
+        """
+        merged = {}
+        for postings in postings_list:
+            for url, score in postings.items():
+                if url not in merged or score > merged[url]:
+                    merged[url] = score
+        return merged
+
+
+class PhraseMatcher:
+    """
+    基于位置索引的短语 / 邻近匹配，输入为各词在同一文档中的升序位置列表:
+    1. 短语: 第 i 个词的位置减去 i 后求交集，以最短的列表驱动，其余列表跳跃 (galloping) 查找
+    2. 邻近: 每个词各取一个位置，求覆盖所有词的最小窗口
+    """
+    @staticmethod
+    def gallop(seq, target, lo):
+        """从 lo 起按 1, 2, 4, ... 的步长前进，越过 target 后在最后一段内二分: 返回第一个 >= target 的下标"""
+        n, step, hi = len(seq), 1, lo
+        while hi < n and seq[hi] < target:
+            lo = hi + 1
+            hi += step
+            step *= 2
+        return bisect_left(seq, target, lo, min(hi, n))
+
+    @classmethod
+    def phrase_starts(cls, position_lists):
+        """position_lists[i] 为短语中第 i 个词的位置列表；返回短语每次出现的起始位置"""
+        driver = min(range(len(position_lists)), key=lambda i: len(position_lists[i]))
+        cursors = [0] * len(position_lists)
+        starts = []
+        for p in position_lists[driver]:
+            start = p - driver
+            for i, seq in enumerate(position_lists):
+                if i == driver:
+                    continue
+                # 起始位置递增，各列表的游标只会向前移动
+                j = cursors[i] = cls.gallop(seq, start + i, cursors[i])
+                if j == len(seq):
+                    return starts
+                if seq[j] != start + i:
+                    break
+            else:
+                starts.append(start)
+        return starts
+
+    @staticmethod
+    def min_span(position_lists):
+        """覆盖每个词至少一次的最小窗口长度 (最大位置 - 最小位置)"""
+        heap = [(seq[0], i, 0) for i, seq in enumerate(position_lists)]
+        heapq.heapify(heap)
+        highest = max(p for p, _, _ in heap)
+        best = highest - heap[0][0]
+        while True:
+            p, i, j = heapq.heappop(heap)
+            best = min(best, highest - p)
+            if j + 1 == len(position_lists[i]):
+                return best
+            nxt = position_lists[i][j + 1]
+            highest = max(highest, nxt)
+            heapq.heappush(heap, (nxt, i, j + 1))
+
+
+class BM25FScorer:
+    """
+    查询时 BM25F 打分 (对一个词的整条倒排向量化计算):
+      tf~   = w_title * tf_title / B_title + w_content * tf_content / B_content
+      B_f   = 1 - b + b * len_f / avg_len_f              (字段长度归一化)
+      score = idf * tf~ / (k1 + tf~)                     (词频饱和)
+      idf   = log(1 + (N - df + 0.5) / (df + 0.5))       (恒为正，常见词不会得到负分)
+    TF 与字段长度取自原始词频格式的倒排，N 与平均长度取自语料统计
+    """
+    def __init__(self, k1=BM25_K1, b=BM25_B, title_weight=BM25_TITLE_WEIGHT, content_weight=BM25_CONTENT_WEIGHT):
+        self.k1 = k1
+        self.b = b
+        self.title_weight = title_weight
+        self.content_weight = content_weight
+
+    @staticmethod
+    def idf(doc_count, df):
+        return float(np.log1p((doc_count - df + 0.5) / (df + 0.5)))
+
+    def _field_tf(self, counts, lengths, avg_length):
+        """按字段长度归一化后的词频；语料统计缺失平均长度时用本条倒排的平均长度代替"""
+        if avg_length <= 0:
+            avg_length = lengths.mean() if len(lengths) else 0.0
+        if avg_length <= 0:
+            return np.zeros(len(counts))
+        return counts / (1.0 - self.b + self.b * lengths / avg_length)
+
+    def score(self, tf, corpus, df=None):
+        """
+        tf: (n, 4) 数组 (titleCount, titleTotal, contentCount, contentTotal)，每行一条倒排
+        corpus: corpus_stats() 的结果；df 缺省时取倒排长度
+        返回 float64 分数数组
+        """
+        tf = np.asarray(tf, dtype=np.float64).reshape(-1, 4)
+        df = len(tf) if df is None else df
+        doc_count = max(corpus.get('doc_count', 0), df)
+        weighted = (self.title_weight * self._field_tf(tf[:, 0], tf[:, 1], corpus.get('avg_title_tokens', 0.0))
+                    + self.content_weight * self._field_tf(tf[:, 2], tf[:, 3], corpus.get('avg_content_tokens', 0.0)))
+        return self.idf(doc_count, df) * weighted / (self.k1 + weighted)
+
+
+class RankedHits:
+    """
+    单个查询的命中结果 (PostingArrays)，以及按需扩展的已排序前缀 (下标数组)
+    缓存在查询结果缓存中，翻页时只需切片，不再访问 HBase；只有当前页的条目才转成 Python 对象
+    同一对象会被多个请求线程同时翻页: 扩展在局部变量上完成，加锁后只在比当前前缀更长时才替换 self.order
+    """
+    def __init__(self, hits, expansions=None):
+        self.hits = hits if isinstance(hits, PostingArrays) else PostingArrays.from_dict(hits)
+        self.order = np.zeros(0, dtype=np.int64)
+        self.expansions = expansions or {}  # 通配符模式 -> 展开结果 (见 SearchEngine.expand_wildcard)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.hits)
+
+    def page(self, start_idx, end_idx):
+        order = self.order
+        if end_idx > len(order) and len(order) < len(self.hits):
+            # 已排序前缀不够时成倍扩展，连续翻页不会每页都重做一次 top-k
+            order = SearchEngine.top_k_indices(self.hits.scores, max(end_idx, 2 * len(order)))
+            with self._lock:
+                if len(order) > len(self.order):
+                    self.order = order
+        return [(self.hits.key(i), float(self.hits.scores[i])) for i in order[start_idx:end_idx].tolist()]
+
+
+class TermSuggester:
+    """
+    前缀补全: 全部索引词按字典序排成一个数组 (与 index 表行键顺序一致)，以某前缀开头的词是其中连续的一段，
+    两次二分查找定位后在段内按 df 取前 limit 个；词表在索引重建后整体重新构建
+    """
+    PREFIX_END = '\U0010ffff'  # 拼在前缀后作为该段的上界
+
+    def __init__(self, entries):
+        """entries: [(term, df), ...]，已按词排序 (StorageBackend.term_dictionary 的返回值)"""
+        self.terms = [term for term, _ in entries]
+        self.dfs = np.fromiter((df for _, df in entries), dtype=np.int64, count=len(entries))
+
+    @classmethod
+    def build(cls, storage):
+        return cls(storage.term_dictionary())
+
+    def __len__(self):
+        return len(self.terms)
+
+    def span(self, prefix):
+        lo = bisect_left(self.terms, prefix)
+        return lo, bisect_left(self.terms, prefix + self.PREFIX_END, lo)
+
+    def suggest(self, prefix, limit=10):
+        """返回 [(term, df), ...]，df 降序，df 相同时按字典序"""
+        if not prefix or limit <= 0:
+            return []
+        lo, hi = self.span(prefix)
+        if hi - lo > limit:
+            # 第 limit 大的 df 作为门槛: 高于门槛的全部入选，等于门槛的按字典序补足 (结果与全量排序一致)
+            dfs = self.dfs[lo:hi]
+            threshold = np.partition(dfs, len(dfs) - limit)[len(dfs) - limit]
+            above = np.flatnonzero(dfs > threshold)
+            ties = np.flatnonzero(dfs == threshold)[:limit - len(above)]
+            indices = (np.concatenate([above, ties]) + lo).tolist()
+        else:
+            indices = range(lo, hi)
+        ranked = sorted(indices, key=lambda i: (-self.dfs[i], self.terms[i]))
+        return [(self.terms[i], int(self.dfs[i])) for i in ranked]
+
+
+class SearchEngine:
+    MISSING_DOC = {'url': "", 'title': "无标题", 'content': "无内容", 'meta': {}}
+
+    RANKING_BM25 = 'bm25'
+    RANKING_STORED = 'stored'
+
+    def __init__(self, storage, result_cache_size=1024, result_cache_ttl=300,
+                 doc_cache_size=10000, doc_cache_bytes=64 * 1024 * 1024, ranking=RANKING_BM25, scorer=None):
+        """
+        storage: 存储后端 (HBaseStorage / LocalStorage)，见 storage.py
+        ranking: bm25 = 原始词频格式的倒排在查询时按 BM25F 打分，其余格式沿用索引中的分数；
+                 stored = 始终使用索引中的分数
+        """
+        self.storage = storage
+        self.ranking = ranking
+        self.scorer = scorer or BM25FScorer()
+        self.planner = QueryPlanner(Analyzer(stop_words_path=STOPWORDS_PATH))
+
+        # 查询结果缓存: (检索词, 合并方式) -> RankedHits
+        self.result_cache = LRUCache(maxsize=result_cache_size, ttl=result_cache_ttl)
+        # 文档详情缓存: doc_key -> 结果页所需字段，导入之间文档不变，只按内存上限淘汰
+        self.doc_cache = LRUCache(maxsize=doc_cache_size, maxbytes=doc_cache_bytes, sizeof=self._doc_sizeof)
+        # 前缀补全: 词表在第一次补全请求 (或预热) 时构建，索引版本变化后重建；热门前缀的结果另行缓存
+        self.suggest_cache = LRUCache(maxsize=4096)
+        self._suggester = None
+        self._suggester_lock = threading.Lock()
+        self._index_version = self._read_index_version()
+
+    @staticmethod
+    def _read_index_version():
+        """索引版本戳: run_workflow.sh 每次重建索引后会更新该文件"""
+        try:
+            return os.stat(INDEX_VERSION_PATH).st_mtime_ns
+        except OSError:
+            return None
+
+    def invalidate_caches(self):
+        """索引重建后重新加载存储后端并清空所有缓存"""
+        self.storage.reload()
+        self.result_cache.invalidate()
+        self.doc_cache.invalidate()
+        self.suggest_cache.invalidate()
+        self._suggester = None
+        print("[INFO] 索引已更新，查询缓存已清空")
+
+    def _check_index_version(self):
+        version = self._read_index_version()
+        if version != self._index_version:
+            self._index_version = version
+            self.invalidate_caches()
+
+    def cache_stats(self):
+        return {'result_cache': self.result_cache.stats(), 'doc_cache': self.doc_cache.stats(),
+                'suggest_cache': self.suggest_cache.stats()}
+
+    def warm_up(self):
+        """加载分词词典 (耗时主要在这里) 并构建补全词表，可放到后台线程中执行；未预热时第一次请求会自行加载"""
+        elapsed = self.planner.analyzer.warm_up()
+        print(f"[INFO] 分词器预热完成 ({elapsed:.2f}s)")
         try:
-            self.connection = happybase.Connection(self.host, port=self.port)
-            self.connection.open()
-            print(f"[INFO] 成功连接到 HBase Thrift Server ({self.host}:{self.port})")
+            self.suggester()
         except Exception as e:
-            print(f"[ERROR] 连接 HBase 失败: {e}")
-            print("请确保已运行 'hbase-daemon.sh start thrift'")
-            sys.exit(1)
+            print(f"[WARN] 补全词表构建失败，将在收到补全请求时重试: {e}")
 
-    def get_table(self, table_name):
-        if not self.connection:
-            self.connect()
-        return self.connection.table(table_name)
+    def suggester(self):
+        """当前索引的补全词表 (TermSuggester)，不存在时扫描一遍索引的词构建"""
+        suggester = self._suggester
+        if suggester is None:
+            with self._suggester_lock:
+                suggester = self._suggester
+                if suggester is None:
+                    start = time.perf_counter()
+                    suggester = self._suggester = TermSuggester.build(self.storage)
+                    print(f"[INFO] 补全词表构建完成: {len(suggester)} 个词 ({time.perf_counter() - start:.2f}s)")
+        return suggester
 
-    def close(self):
-        if self.connection:
-            self.connection.close()
+    def suggest(self, text, limit=10):
+        """
+        对查询串的最后一个词做前缀补全 (与索引相同的归一化)，前面的词原样保留
+        返回 [{'term', 'df', 'query'}, ...]，query 为补全后的整个查询串
+        """
+        self._check_index_version()
+        head, _, prefix = normalize(text).rpartition(' ')
+        prefix = prefix.lstrip('"')
+        if not prefix:
+            return []
+        key = (prefix, limit)
+        suggestions = self.suggest_cache.get(key)
+        if suggestions is None:
+            suggestions = self.suggester().suggest(prefix, limit)
+            self.suggest_cache.put(key, suggestions)
+        return [{'term': term, 'df': df, 'query': f"{head} {term}".lstrip()} for term, df in suggestions]
 
-class SearchEngine:
-    def __init__(self, connector):
-        self.connector = connector
-        self.index_table = self.connector.get_table('index')
-        self.files_table = self.connector.get_table('files')
+    def health(self):
+        """就绪状态: 分词器已预热且存储后端可用时 ready 为 True (不发起存储请求)"""
+        storage = self.storage.status()
+        analyzer = self.planner.analyzer.warmed
+        return {'ready': analyzer and storage['ready'], 'analyzer': analyzer, 'storage': storage,
+                'index_version': self._index_version}
+
+    @staticmethod
+    def _doc_sizeof(doc):
+        return sum(sys.getsizeof(v) for v in doc.values())
 
-    def search(self, keyword, page=1, page_size=10):
+    def fetch_documents(self, doc_keys):
         """
-        分页搜索
-        返回: (results, total_count)
+        批量获取文档详情: 先查文档缓存，未命中的 doc_key 合并为一次 storage.get_docs 请求
+        doc_key 即倒排中的文档标识 (旧格式为 RowKey，紧凑格式为整数 doc_id)
+        返回: {doc_key: doc}，不存在的文档不出现在结果中
         """
-        print(f"\n[SEARCH]正在检索关键词: '{keyword}' (Page {page}) ...")
-        
-        # 1. 查 Index 表 (获取所有相关的 URL 和 分数)
-        row = self.index_table.row(keyword)
-        if not row:
-            return [], 0  # 返回空列表和总数0
+        docs, missing = self.doc_cache.get_many(doc_keys)
+        if not missing:
+            return docs
 
-        # 2. 解析 Index
-        hits = []
-        for col_key, val_bytes in row.items():
-            full_col_name = col_key.decode('utf-8')
-            if full_col_name.startswith('p:'):
-                url = full_col_name[2:]
-                try:
-                    # 兼容双精度字节流或字符串
-                    if len(val_bytes) == 8:
-                        score = struct.unpack('>d', val_bytes)[0]
-                    else:
-                        score = float(val_bytes.decode('utf-8'))
-                except:
-                    score = 0.0
-                
-                hits.append({'url': url, 'score': score})
-
-        # 3. 按分数降序排序
-        hits.sort(key=lambda x: x['score'], reverse=True)
-        
+        for doc_key, doc in self.storage.get_docs(missing).items():
+            docs[doc_key] = doc
+            self.doc_cache.put(doc_key, doc)
+        return docs
+
+    def get_document(self, rowkey):
+        """按需读取单个文档的全文 (不经过缓存)，不存在时返回 None"""
+        return self.storage.get_document(rowkey)
+
+    def corpus_stats(self):
+        """语料统计 (文档数 / 平均字段长度)，由存储后端 O(1) 读取"""
+        return self.storage.corpus_stats()
+
+    def match_phrase(self, phrase, slop, scored):
+        """
+        用位置索引过滤 AND 合并后的候选文档 (只读取候选文档的位置)
+        精确短语: 保留短语出现过的文档，分数不变
+        邻近查询: 保留最小窗口内多余空档 <= slop 的文档，空档越小加权越多
+        没有位置索引时按普通 AND 查询处理
+        """
+        terms = list(dict.fromkeys(phrase))
+        positions = self.storage.get_positions(terms, list(scored))
+        if positions is None:
+            print("[WARN] 索引中没有位置信息 (构建时未加 --positions)，短语按 AND 查询处理")
+            return scored
+        by_term = dict(zip(terms, positions))
+
+        matched = {}
+        for doc_key, score in scored.items():
+            lists = [by_term[t].get(doc_key) for t in terms]
+            if not all(lists):
+                continue
+            if slop is None:
+                if PhraseMatcher.phrase_starts([by_term[t][doc_key] for t in phrase]):
+                    matched[doc_key] = score
+            else:
+                gap = PhraseMatcher.min_span(lists) - (len(terms) - 1)
+                if gap <= slop:
+                    matched[doc_key] = score * (1.0 + 1.0 / (1 + max(gap, 0)))
+        return matched
+
+    def expand_wildcard(self, pattern):
+        """
+        通配符模式 -> 索引中匹配的词，按 df 降序:
+        以固定前缀做一次有界的行键范围扫描 (最多 WILDCARD_SCAN_LIMIT 个候选)，再按整个模式过滤；
+        最多取 WILDCARD_MAX_TERMS 个词，且 df 之和 (需要读取与合并的倒排条数) 不超过 WILDCARD_MAX_POSTINGS
+        返回 {'terms': [...], 'truncated': 是否因上限丢弃了部分匹配}；没有固定前缀的模式 (如 *学) 需要全表扫描，不展开
+        """
+        prefix = self.planner.wildcard_prefix(pattern)
+        if not prefix:
+            return {'terms': [], 'truncated': False}
+        candidates = self.storage.term_dictionary(prefix, limit=WILDCARD_SCAN_LIMIT + 1)
+        truncated = len(candidates) > WILDCARD_SCAN_LIMIT
+        regex = self.planner.wildcard_regex(pattern)
+        matches = sorted(((t, df) for t, df in candidates[:WILDCARD_SCAN_LIMIT] if regex.fullmatch(t)),
+                         key=lambda x: (-x[1], x[0]))
+
+        terms, cost = [], 0
+        for term, df in matches:
+            if len(terms) >= WILDCARD_MAX_TERMS or (terms and cost + df > WILDCARD_MAX_POSTINGS):
+                truncated = True
+                break
+            terms.append(term)
+            cost += df
+        return {'terms': terms, 'truncated': truncated}
+
+    def fetch_term(self, term):
+        """单词查询: 直接以数组形式取回倒排 (PostingArrays)，不构造 {url: score} 字典"""
+        if self.ranking != self.RANKING_BM25:
+            return self.storage.get_posting_arrays([term])[0]
+        postings = self.storage.get_ranking_postings([term])[0]
+        if isinstance(postings, PostingArrays):
+            return postings
+        doc_keys, tf = postings
+        return PostingArrays(doc_keys, self.scorer.score(tf, self.corpus_stats()))
+
+    def fetch_postings(self, terms):
+        """批量取回所有检索词的倒排列表，返回与 terms 对齐的 [{url: score}, ...]"""
+        if not terms:
+            return []
+        if self.ranking != self.RANKING_BM25:
+            return self.storage.get_postings(terms)
+
+        # 所有命中的词都有原始词频时按 BM25F 现算分数，都只存了分数 (旧格式 / 紧凑格式) 时直接用已有分数；两者来自同一次读取
+        fetched = self.storage.get_ranking_postings(terms)
+        stored = [t for t, postings in zip(terms, fetched) if isinstance(postings, PostingArrays) and len(postings)]
+        if stored and not all(isinstance(postings, PostingArrays) for postings in fetched):
+            # BM25F 分数与已存的 TF-IDF 分数量纲不同，不能相加: 整个查询退回已存分数排序 (TF cell 按 TF-IDF 折算)
+            print(f"[WARN] 检索词 {stored} 没有原始词频 (索引格式不一致)，本次查询按已存分数排序；"
+                  "请用 inverted_index.py --format tf 重建索引")
+            return self.storage.get_postings(terms)
+
+        corpus = None
+        postings_list = []
+        for postings in fetched:
+            if isinstance(postings, PostingArrays):
+                postings_list.append(postings.to_dict())
+            else:
+                doc_keys, tf = postings
+                corpus = corpus or self.corpus_stats()
+                postings_list.append(dict(zip(doc_keys, self.scorer.score(tf, corpus).tolist())))
+        return postings_list
+
+    @staticmethod
+    def top_k_indices(scores, k):
+        """
+        数组版 Top-k: argpartition 选出分数最高的 k 个下标 (O(n))，只对这 k 个排序
+        返回按分数降序的下标数组
+        """
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        if k >= len(scores):
+            return np.argsort(-scores, kind='stable')
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top], kind='stable')]
+
+    def search(self, keyword, page=1, page_size=10, operator=QueryPlanner.OP_AND, with_expansions=False):
+        """
+        分页搜索，多个检索词按 operator ('and' / 'or') 合并；含 * / ? 的词按索引中的词展开 (见 expand_wildcard)
+        返回: (results, total_count)；with_expansions=True 时返回 (results, total_count, {模式: 展开结果})
+        """
+        print(f"\n[SEARCH]正在检索关键词: '{keyword}' (Page {page}, {operator.upper()}) ...")
+
+        # 1. 分词，先查结果缓存 (同一查询翻页时直接命中)
+        self._check_index_version()
+        phrase, slop = self.planner.parse_phrase(keyword)
+        patterns = []
+        if phrase is not None:
+            terms = self.planner.plan(keyword)
+            operator = QueryPlanner.OP_AND
+            cache_key = (tuple(phrase), 'phrase', slop)
+        else:
+            text, patterns = self.planner.parse_wildcards(keyword)
+            terms = self.planner.plan(text)
+            cache_key = (tuple(sorted(terms)), operator)
+            if patterns:
+                cache_key += (tuple(sorted(patterns)),)
+        ranked = self.result_cache.get(cache_key)
+
+        if ranked is None:
+            if len(terms) == 1 and not patterns and (phrase is None or len(phrase) == 1):
+                # 2'. 单词查询: 倒排以数组形式取回，排序直接在分数数组上进行
+                ranked = RankedHits(self.fetch_term(terms[0]))
+            elif patterns:
+                # 2''. 通配符查询: 各模式展开后与普通检索词一起批量取回倒排，每个模式的展开词先合并为一个检索词
+                expansions = {p: self.expand_wildcard(p) for p in patterns}
+                all_terms = list(dict.fromkeys(terms + [t for e in expansions.values() for t in e['terms']]))
+                by_term = dict(zip(all_terms, self.fetch_postings(all_terms)))
+                postings_list = [by_term[t] for t in terms]
+                postings_list += [self.planner.merge_expansions([by_term[t] for t in e['terms']])
+                                  for e in expansions.values()]
+                ranked = RankedHits(self.planner.merge(postings_list, operator), expansions)
+                print(f"[INFO] 通配符展开: {expansions}")
+            else:
+                # 2. 批量查 Index 表 (获取所有相关的 URL 和 分数)
+                postings_list = self.fetch_postings(terms)
+
+                # 3. 合并倒排列表 (稀有词优先)，分数求和；短语 / 邻近查询再按位置过滤候选文档
+                scored = self.planner.merge(postings_list, operator)
+                if phrase is not None and scored:
+                    scored = self.match_phrase(phrase, slop, scored)
+                ranked = RankedHits(scored)
+            self.result_cache.put(cache_key, ranked)
+
+        results, total_count = self._page_results(ranked, terms, page, page_size)
+        if with_expansions:
+            return results, total_count, ranked.expansions
+        return results, total_count
+
+    def _page_results(self, ranked, terms, page, page_size):
+        """取出 ranked 中第 page 页的命中并补全文档详情，返回 (results, total_count)"""
         # [新增] 计算总条数
-        total_count = len(hits)
+        total_count = len(ranked)
+        if not total_count:
+            return [], 0  # 返回空列表和总数0
 
         # [新增] 执行内存切片 (只获取当前页的 url)
         # 举例: page=1 -> [0:10], page=2 -> [10:20]
@@ -77,45 +593,60 @@ class SearchEngine:
         if start_idx >= total_count:
             return [], total_count
 
-        current_page_hits = hits[start_idx:end_idx]
-        print(f"[INFO] 命中总数: {total_count}, 当前页获取详情: {len(current_page_hits)} 条")
+        # Top-k 选择: 只排出前 end_idx 名，不做全量排序
+        current_page_hits = [{'key': key, 'score': score} for key, score in ranked.page(start_idx, end_idx)]
+        print(f"[INFO] 检索词: {terms}, 命中总数: {total_count}, 当前页获取详情: {len(current_page_hits)} 条")
 
-        # 4. 批量去 Files 表查详情 (只查这10条)
-        urls = [h['url'] for h in current_page_hits]
-        files_data = self.files_table.rows(urls)
-        files_map = {key.decode('utf-8'): data for key, data in files_data}
+        # 4. 批量取文档详情 (只查当前页；缓存未命中的部分一次批量请求)
+        docs = self.fetch_documents([h['key'] for h in current_page_hits])
 
         # 5. 组装结果
         results = []
         for hit in current_page_hits:
-            url = hit['url']
-            score = hit['score']
-            file_row = files_map.get(url, {})
-            
-            title_bytes = file_row.get(b'info:title') 
-            title = title_bytes.decode('utf-8') if title_bytes else "无标题"
-
-            content_bytes = file_row.get(b'info:content') 
-            content = content_bytes.decode('utf-8') if content_bytes else "无内容"
-
-            url_bytes = file_row.get(b'info:url') 
-            url = url_bytes.decode('utf-8') if url_bytes else ""
-
+            doc = docs.get(hit['key'], self.MISSING_DOC)
             results.append({
-                'score': score,
-                'url': url,
-                'title': title,
-                'content': content
+                'id': doc.get('id', str(hit['key'])),  # files 表 RowKey，用于按需读取全文
+                'score': hit['score'],
+                'url': doc['url'],
+                'title': doc['title'],
+                'content': doc['content']
             })
 
         return results, total_count  # 返回元组
 
+def create_storage(backend='hbase', host='localhost', port=9090, pool_size=8, index_dir=LOCAL_INDEX_PATH, wait=True):
+    """
+    按名称创建存储后端
+    hbase: 连接 HBase Thrift (连接失败时仍返回后端，请求到来时自动重连)；
+           wait=False 时在后台线程中连接，立即返回 (Web 服务启动不等待 HBase)
+    local: 打开 src/mapreduce/local_index.py 构建的本地索引目录
+    """
+    if backend == LocalStorage.name:
+        return LocalStorage(index_dir)
+
+    connector = HBaseConnector(host=host, port=port, pool_size=pool_size)
+    try:
+        connector.connect(wait=wait)
+    except HBaseConnectionError as e:
+        print(f"[WARN] {e}，将在收到请求时重试")
+    return HBaseStorage(connector)
+
+
 def main():
-    connector = HBaseConnector(host='localhost', port=9090)
-    connector.connect()
+    parser = argparse.ArgumentParser(description="Search Engine CLI")
+    parser.add_argument('--backend', choices=[HBaseStorage.name, LocalStorage.name], default=HBaseStorage.name,
+                        help="存储后端 (Default: hbase)")
+    parser.add_argument('--ranking', choices=[SearchEngine.RANKING_BM25, SearchEngine.RANKING_STORED],
+                        default=SearchEngine.RANKING_BM25, help="排序方式 (Default: bm25)")
+    parser.add_argument('--index-dir', default=str(LOCAL_INDEX_PATH), help="本地索引目录 (仅 local 后端)")
+    args = parser.parse_args()
+
+    storage = create_storage(args.backend, pool_size=1, index_dir=args.index_dir)
+    if not storage.health_check():
+        sys.exit(1)
 
     try:
-        engine = SearchEngine(connector)
+        engine = SearchEngine(storage, ranking=args.ranking)
 
         while True:
             print("="*60)
@@ -126,7 +657,10 @@ def main():
             if not keyword:
                 continue
 
-            results = engine.search(keyword)
+            results, _, expansions = engine.search(keyword, with_expansions=True)
+            for pattern, expansion in expansions.items():
+                print(f"[INFO] {pattern} -> {', '.join(expansion['terms']) or '(无匹配的词)'}"
+                      f"{' (已截断)' if expansion['truncated'] else ''}")
 
             if not results:
                 print(f"[RESULT] 未找到关于 '{keyword}' 的结果。")
@@ -143,7 +677,7 @@ def main():
     except KeyboardInterrupt:
         print("\n程序已终止")
     finally:
-        connector.close()
+        storage.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,555 @@
+import happybase
+import json
+import queue
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+# web 目录下直接运行时，把项目根目录加入搜索路径以便导入 src.*
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.settings import SNIPPET_LENGTH
+from src.mapreduce import posting_codec
+from src.mapreduce.local_index import LocalIndexReader
+from src.etl.corpus_stats import STATS_TABLE, read_corpus_stats, read_df, read_term_stats
+from src.mapreduce.scoring import idf, score_array
+from thriftpy2.thrift import TException
+
+# =========================================================================
+# 组件 0: HBase Thrift 连接池
+# =========================================================================
+
+class HBaseConnectionError(Exception):
+    """HBase Thrift 不可用 (连接失败或借出连接超时)"""
+
+
+class HBaseConnector:
+    """
+    HBase Thrift 连接池:
+    1. 最多 pool_size 个连接，每个请求用 connection() / table() 借出，用完归还
+    2. 连接空闲超过 health_check_interval 秒，借出前先做一次健康检查
+    3. 通信异常时丢弃该连接，下次借出时自动重连 (不再 sys.exit)
+    """
+    def __init__(self, host='localhost', port=9090, pool_size=8, timeout=None,
+                 checkout_timeout=10, health_check_interval=30):
+        self.host = host
+        self.port = port
+        self.pool_size = pool_size
+        self.timeout = timeout  # Thrift socket 超时 (毫秒)
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+
+        # 池中元素为 (connection, 上次使用时间)；connection 为 None 表示尚未建立，借出时再连接
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        for _ in range(pool_size):
+            self._pool.put((None, 0.0))
+        self._closed = False
+        self._lock = threading.Lock()
+        self.reconnects = 0
+        self.ready = threading.Event()  # 最近一次建连 / 健康检查成功，通信失败后清除 (供 /health 无阻塞查询)
+
+    def _new_connection(self):
+        connection = happybase.Connection(self.host, port=self.port, timeout=self.timeout, autoconnect=False)
+        connection.open()
+        return connection
+
+    @staticmethod
+    def _ping(connection):
+        connection.tables()
+
+    @staticmethod
+    def _discard(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def connect(self, wait=True):
+        """
+        预先建立一个连接并做健康检查，失败时抛出 HBaseConnectionError
+        wait=False 时在后台线程中连接并立即返回 (失败只打印警告，请求到来时照常重连)，进度见 ready
+        """
+        if not wait:
+            threading.Thread(target=self._connect_in_background, name='hbase-connect', daemon=True).start()
+            return
+        if self.health_check():
+            print(f"[INFO] 成功连接到 HBase Thrift Server ({self.host}:{self.port}), 连接池大小: {self.pool_size}")
+        else:
+            print(f"[ERROR] 连接 HBase 失败 ({self.host}:{self.port})")
+            print("请确保已运行 'hbase-daemon.sh start thrift'")
+            raise HBaseConnectionError(f"无法连接到 HBase Thrift Server ({self.host}:{self.port})")
+
+    def _connect_in_background(self):
+        try:
+            self.connect()
+        except HBaseConnectionError as e:
+            print(f"[WARN] {e}，将在收到请求时重试")
+
+    @contextmanager
+    def connection(self):
+        """从池中借出一个可用连接，with 块结束后归还"""
+        if self._closed:
+            raise HBaseConnectionError("连接池已关闭")
+        try:
+            connection, last_used = self._pool.get(timeout=self.checkout_timeout)
+        except queue.Empty:
+            raise HBaseConnectionError(f"等待 HBase 连接超时 ({self.checkout_timeout}s)，连接池大小: {self.pool_size}")
+
+        try:
+            # 空闲过久的连接可能已被服务端断开，借出前先检查
+            if connection is not None and time.monotonic() - last_used > self.health_check_interval:
+                try:
+                    self._ping(connection)
+                except (TException, socket.error):
+                    self._discard(connection)
+                    connection = None
+
+            if connection is None:
+                try:
+                    connection = self._new_connection()
+                except (TException, socket.error) as e:
+                    self.ready.clear()
+                    raise HBaseConnectionError(f"连接 HBase 失败: {e}")
+                with self._lock:
+                    self.reconnects += 1
+                self.ready.set()
+
+            yield connection
+
+        except (TException, socket.error):
+            # 通信异常: 连接状态未知，丢弃后由下一次借出重连
+            if connection is not None:
+                self._discard(connection)
+            connection = None
+            self.ready.clear()
+            raise
+        finally:
+            self._pool.put((connection, time.monotonic()))
+
+    @contextmanager
+    def table(self, table_name):
+        """借出连接并返回指定表，例如: with connector.table('index') as t: t.rows(...)"""
+        with self.connection() as connection:
+            yield connection.table(table_name)
+
+    def health_check(self):
+        """借出一个连接执行一次轻量请求，返回 HBase 是否可用"""
+        try:
+            with self.connection() as connection:
+                self._ping(connection)
+            self.ready.set()
+            return True
+        except (HBaseConnectionError, TException, socket.error):
+            return False
+
+    def stats(self):
+        return {'pool_size': self.pool_size, 'idle': self._pool.qsize(), 'reconnects': self.reconnects,
+                'ready': self.ready.is_set()}
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                connection, _ = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            if connection is not None:
+                self._discard(connection)
+
+# =========================================================================
+# 组件 1: 存储后端接口
+# SearchEngine 只依赖以下两个批量接口，不关心底层是 HBase 还是本地文件
+# =========================================================================
+
+class PostingArrays:
+    """
+    数组形式的单个倒排列表: keys 与 scores (float64 数组) 一一对应
+    keys 可以是尚未解码的原始值 (如旧格式的列名 bytes)，只有进入结果页的条目才经 decode_key 转成 doc_key
+    """
+    __slots__ = ('keys', 'scores', 'decode_key')
+
+    def __init__(self, keys, scores, decode_key=None):
+        self.keys = keys
+        self.scores = scores
+        self.decode_key = decode_key
+
+    def __len__(self):
+        return len(self.scores)
+
+    def key(self, i):
+        key = self.keys[i]
+        return self.decode_key(key) if self.decode_key else key
+
+    def to_dict(self):
+        keys = self.keys.tolist() if isinstance(self.keys, np.ndarray) else self.keys
+        if self.decode_key:
+            keys = map(self.decode_key, keys)
+        return dict(zip(keys, self.scores.tolist()))
+
+    @classmethod
+    def from_dict(cls, postings):
+        return cls(list(postings), np.fromiter(postings.values(), dtype=np.float64, count=len(postings)))
+
+
+def _legacy_key(col):
+    """旧格式列名 b'p:<rowkey>' -> RowKey"""
+    return col[2:].decode('utf-8')
+
+
+class StorageBackend:
+    """
+    存储后端基类
+    倒排与文档通过 doc_key 关联: 旧格式为 files 表 RowKey，紧凑格式为整数 doc_id
+    get_postings(terms)  -> [{doc_key: score}, ...]  与 terms 一一对应，缺失的词为空字典
+    get_posting_arrays(terms) -> [PostingArrays, ...]  同上，数组形式 (单词查询直接在数组上排序)
+    get_ranking_postings(terms) -> [(doc_keys, tf) 或 PostingArrays, ...]  BM25 检索用，与 terms 一一对应:
+                            只有 TF cell 的词为 (doc_keys, tf)，tf 为 (n, 4) 数组
+                            (titleCount, titleTotal, contentCount, contentTotal)；
+                            索引只存预先算好的分数 (旧格式 / 紧凑格式 / mixed 行) 的词同 get_posting_arrays
+    get_positions(terms, doc_keys) -> [{doc_key: [位置, ...]}, ...]  与 terms 一一对应，只含 doc_keys 中的文档；
+                            没有位置索引时返回 None (短语 / 邻近查询才会调用)
+    get_docs(doc_keys)   -> {doc_key: {'id', 'url', 'title', 'content', 'meta'}}  id 为 RowKey，content 为摘要
+    get_document(rowkey) -> {'id', 'url', 'title', 'content'} 全文，不存在时返回 None
+    corpus_stats()       -> {'doc_count', 'avg_title_tokens', 'avg_content_tokens'}
+    document_frequencies(terms) -> {term: df}
+    term_dictionary(prefix, limit) -> [(term, df), ...]  按词的字典序排列，只含以 prefix 开头的词，最多 limit 个
+    """
+    name = 'base'
+
+    def get_postings(self, terms):
+        raise NotImplementedError
+
+    def get_posting_arrays(self, terms):
+        return [PostingArrays.from_dict(postings) for postings in self.get_postings(terms)]
+
+    def get_ranking_postings(self, terms):
+        return self.get_posting_arrays(terms)
+
+    def get_positions(self, terms, doc_keys):
+        return None
+
+    def get_docs(self, doc_keys):
+        raise NotImplementedError
+
+    def get_document(self, rowkey):
+        raise NotImplementedError
+
+    def corpus_stats(self):
+        raise NotImplementedError
+
+    def document_frequencies(self, terms):
+        raise NotImplementedError
+
+    def term_dictionary(self, prefix='', limit=None):
+        raise NotImplementedError
+
+    def reload(self):
+        """索引重建后调用，默认无需处理"""
+
+    def health_check(self):
+        return True
+
+    def status(self):
+        """就绪状态 (不发起请求，供 /health 使用)"""
+        return {'backend': self.name, 'ready': True}
+
+    def close(self):
+        pass
+
+# =========================================================================
+# 组件 2: HBase 后端 (index / files / stats 三张表)
+# index 表兼容两种格式:
+#   旧格式 (HBaseInvertedIndex.java): 每条倒排一个 cell，p:<rowkey> = 8 字节分数
+#   紧凑格式 (inverted_index.py --format compact): p:_blob，doc_id 经 \x00docmap 行映射为 RowKey
+#   原始词频格式 (--format tf / 导入器 --index): p:t<rowkey> = TF 四元组，IDF 在查询时按 stats 表实时计算
+# 可选的 positions 表 (--positions) 存词位置，只有短语 / 邻近查询才读取
+# =========================================================================
+
+class HBaseStorage(StorageBackend):
+    name = 'hbase'
+    INDEX_TABLE = 'index'
+    FILES_TABLE = 'files'
+    STATS_TABLE = STATS_TABLE
+
+    # 结果页只读取这些小字段；整篇正文 info:content 只在查看全文时按需读取
+    DOC_COLUMNS = [b'info:url', b'info:title', b'info:snippet', b'info:meta']
+    FULL_DOC_COLUMNS = [b'info:url', b'info:title', b'info:content']
+    # 候选文档不多时只读取这些文档的位置列，否则整行读取后再筛选
+    MAX_POSITION_COLUMNS = 2000
+    # 扫描词表时每行只返回一个去掉值的 cell，只传行键，不传倒排
+    TERM_SCAN_FILTER = b'FirstKeyOnlyFilter() AND KeyOnlyFilter()'
+    TERM_SCAN_BATCH = 10000
+
+    def __init__(self, connector):
+        self.connector = connector
+        self._docmap = None  # 紧凑格式的 doc_id -> RowKey 映射，首次用到时加载
+        self._corpus = None  # 语料统计行，首次用到时读取，reload() 后失效
+        self._has_positions = None  # positions 表是否存在，首次短语查询时检查
+
+    def _rowkey_of(self, doc_key):
+        """doc_key -> files 表 RowKey"""
+        if isinstance(doc_key, str):
+            return doc_key
+        if self._docmap is None:
+            with self.connector.table(self.INDEX_TABLE) as index_table:
+                row = index_table.row(posting_codec.DOCMAP_ROW, columns=[posting_codec.DOCMAP_QUALIFIER])
+            self._docmap = row.get(posting_codec.DOCMAP_QUALIFIER, b'')
+        start = doc_key * posting_codec.ROWKEY_LENGTH
+        return self._docmap[start:start + posting_codec.ROWKEY_LENGTH].decode('utf-8')
+
+    @staticmethod
+    def _parse_postings(row):
+        """解析 Index 表的一行: {b'p:<url>': score_bytes} -> {url: score}"""
+        return HBaseStorage._decode_arrays(row).to_dict()
+
+    @staticmethod
+    def _decode_arrays(row):
+        """紧凑格式直接向量化解码 blob，否则把旧格式的 8 字节分数整体转换为数组 (列名留到结果页再解码)"""
+        blob = row.get(posting_codec.BLOB_QUALIFIER)
+        if blob is not None:
+            doc_ids, scores = posting_codec.decode(blob)
+            return PostingArrays(doc_ids, scores, int)
+        cols, scores = posting_codec.decode_legacy_row(row)
+        return PostingArrays(cols, scores, _legacy_key)
+
+    def _index_rows(self, terms):
+        """一次批量请求取回所有检索词的倒排行: {term: row}"""
+        with self.connector.table(self.INDEX_TABLE) as index_table:
+            rows = index_table.rows([t.encode('utf-8') for t in terms])
+        return {key.decode('utf-8'): data for key, data in rows}
+
+    def get_postings(self, terms):
+        """一次批量请求取回所有检索词的倒排行"""
+        return [arrays.to_dict() for arrays in self.get_posting_arrays(terms)]
+
+    def get_posting_arrays(self, terms):
+        if not terms:
+            return []
+        return self._arrays_from_rows(terms, self._index_rows(terms))
+
+    def _arrays_from_rows(self, terms, rows_map):
+        """
+        index 行 -> PostingArrays，兼容三种格式
+        原始词频格式: 用 stats 表中实时的 N 与 df 计算 IDF (同一次查询的所有词一次批量读取)；
+        旧格式 / 紧凑格式的索引上增量导入过的行 (mixed) 同时含已存分数与 TF cell，两者都按 RowKey 合并，
+        同一文档以 TF cell (较新) 为准
+        """
+        postings = [self._decode_arrays(rows_map.get(t, {})) for t in terms]
+        tf_terms = [t for t in terms if posting_codec.row_format(rows_map.get(t, {})) in ('tf', 'mixed')]
+        if tf_terms:
+            with self.connector.table(self.STATS_TABLE) as stats_table:
+                doc_count, dfs = read_term_stats(stats_table, tf_terms)
+            for i, t in enumerate(terms):
+                if t not in dfs:
+                    continue
+                rowkeys, tf = posting_codec.decode_tf_cells(rows_map[t])
+                scores = score_array(tf, idf(doc_count, dfs[t] or len(rowkeys)))
+                stored = postings[i]
+                if not len(stored):
+                    postings[i] = PostingArrays(rowkeys, scores)
+                    continue
+                merged = {self._rowkey_of(stored.key(j)): score for j, score in enumerate(stored.scores.tolist())}
+                merged.update(zip(rowkeys, scores.tolist()))
+                postings[i] = PostingArrays.from_dict(merged)
+        return postings
+
+    def get_ranking_postings(self, terms):
+        """
+        同一批 index 行既解码 TF cell，也解码已存分数，每次查询只读一次 index 表
+        只有 TF cell 的行返回 TF 四元组 (查询时 BM25F 打分)；mixed 行中的已存分数没有 TF，
+        整行按已存分数解码，不丢弃旧倒排
+        """
+        if not terms:
+            return []
+        rows_map = self._index_rows(terms)
+        stored_terms = [t for t in terms if posting_codec.row_format(rows_map.get(t, {})) != 'tf']
+        stored = dict(zip(stored_terms, self._arrays_from_rows(stored_terms, rows_map)))
+        return [stored[t] if t in stored else posting_codec.decode_tf_cells(rows_map[t]) for t in terms]
+
+    def get_positions(self, terms, doc_keys):
+        """一次批量请求读取各词在候选文档中的位置"""
+        if self._has_positions is None:
+            with self.connector.connection() as connection:
+                self._has_positions = posting_codec.POSITIONS_TABLE.encode('utf-8') in connection.tables()
+        if not self._has_positions:
+            return None
+
+        qualifiers = {posting_codec.positions_qualifier(self._rowkey_of(key)): key for key in doc_keys}
+        columns = list(qualifiers) if len(qualifiers) <= self.MAX_POSITION_COLUMNS else None
+        with self.connector.table(posting_codec.POSITIONS_TABLE) as positions_table:
+            rows = dict(positions_table.rows([t.encode('utf-8') for t in terms], columns=columns))
+        result = []
+        for t in terms:
+            row = rows.get(t.encode('utf-8'), {})
+            result.append({qualifiers[col]: posting_codec.decode_positions(val)
+                           for col, val in row.items() if col in qualifiers})
+        return result
+
+    @staticmethod
+    def _make_doc(file_row):
+        """从 files 表的一行中只保留结果页需要的字段"""
+        title_bytes = file_row.get(b'info:title') 
+        title = title_bytes.decode('utf-8') if title_bytes else "无标题"
+
+        # 优先使用导入时预先截取的摘要；旧数据没有 info:snippet 时由调用方补读正文
+        snippet_bytes = file_row.get(b'info:snippet')
+        if snippet_bytes is None:
+            snippet_bytes = file_row.get(b'info:content', b'')[:SNIPPET_LENGTH * 4]
+        content = snippet_bytes.decode('utf-8', errors='ignore')[:SNIPPET_LENGTH] if snippet_bytes else "无内容"
+
+        url_bytes = file_row.get(b'info:url') 
+        url = url_bytes.decode('utf-8') if url_bytes else ""
+
+        meta_bytes = file_row.get(b'info:meta')
+        meta = json.loads(meta_bytes) if meta_bytes else {}
+
+        return {'url': url, 'title': title, 'content': content, 'meta': meta}
+
+    def get_docs(self, doc_keys):
+        """只读取 DOC_COLUMNS，一次批量请求，不传输整篇正文"""
+        if not doc_keys:
+            return {}
+        rowkeys = {self._rowkey_of(key): key for key in doc_keys}
+        with self.connector.table(self.FILES_TABLE) as files_table:
+            rows = dict(files_table.rows([k.encode('utf-8') for k in rowkeys], columns=self.DOC_COLUMNS))
+
+            # 兼容旧版导入的数据 (没有 info:snippet)：只对这些行补读一次正文
+            legacy = [key for key, data in rows.items() if b'info:snippet' not in data]
+            if legacy:
+                for key, data in files_table.rows(legacy, columns=[b'info:content']):
+                    rows[key].update(data)
+
+        docs = {}
+        for key, data in rows.items():
+            rowkey = key.decode('utf-8')
+            doc = self._make_doc(data)
+            doc['id'] = rowkey
+            docs[rowkeys[rowkey]] = doc
+        return docs
+
+    def get_document(self, rowkey):
+        with self.connector.table(self.FILES_TABLE) as files_table:
+            row = files_table.row(rowkey.encode('utf-8'), columns=self.FULL_DOC_COLUMNS)
+        if not row:
+            return None
+        return {
+            'id': rowkey,
+            'url': row.get(b'info:url', b'').decode('utf-8'),
+            'title': row.get(b'info:title', b'').decode('utf-8'),
+            'content': row.get(b'info:content', b'').decode('utf-8'),
+        }
+
+    def corpus_stats(self):
+        """读取 stats 表的 \x00corpus 行 (单次 get)，代替扫描 files 表计数"""
+        if self._corpus is None:
+            with self.connector.table(self.STATS_TABLE) as stats_table:
+                self._corpus = read_corpus_stats(stats_table)
+        return self._corpus
+
+    def document_frequencies(self, terms):
+        with self.connector.table(self.STATS_TABLE) as stats_table:
+            return read_df(stats_table, terms)
+
+    def term_dictionary(self, prefix='', limit=None):
+        """
+        index 表的行键就是按字节序 (即 UTF-8 码位序) 排好的词: 一次 row_prefix 扫描取出词表，
+        再分批从 stats 表读取 df；\x00 开头的元数据行 (紧凑格式的 docmap) 不算作词
+        """
+        with self.connector.table(self.INDEX_TABLE) as index_table:
+            rows = index_table.scan(row_prefix=prefix.encode('utf-8') or None, filter=self.TERM_SCAN_FILTER,
+                                    limit=limit, batch_size=self.TERM_SCAN_BATCH)
+            terms = [key.decode('utf-8') for key, _ in rows if not key.startswith(b'\x00')]
+        dfs = {}
+        with self.connector.table(self.STATS_TABLE) as stats_table:
+            for start in range(0, len(terms), self.TERM_SCAN_BATCH):
+                dfs.update(read_df(stats_table, terms[start:start + self.TERM_SCAN_BATCH]))
+        return [(t, dfs.get(t, 0)) for t in terms]
+
+    def reload(self):
+        """索引重建后 doc_id 可能重新分配，丢弃已加载的映射与语料统计"""
+        self._docmap = None
+        self._corpus = None
+        self._has_positions = None
+
+    def health_check(self):
+        return self.connector.health_check()
+
+    def status(self):
+        return {'backend': self.name, **self.connector.stats()}
+
+    def close(self):
+        self.connector.close()
+
+# =========================================================================
+# 组件 3: 本地后端 (mmap 索引文件，见 src/mapreduce/local_index.py)
+# =========================================================================
+
+class LocalStorage(StorageBackend):
+    name = 'local'
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self.reader = LocalIndexReader(index_dir)
+
+    def get_postings(self, terms):
+        return [self.reader.postings(t) for t in terms]
+
+    def get_posting_arrays(self, terms):
+        return [PostingArrays(*self.reader.posting_arrays(t), int) for t in terms]
+
+    def get_positions(self, terms, doc_keys):
+        result = []
+        for t in terms:
+            positions = self.reader.positions(t, doc_keys)
+            if positions is None:
+                return None
+            result.append(positions)
+        return result
+
+    def get_docs(self, doc_keys):
+        docs = {}
+        for doc_id in doc_keys:
+            summary = self.reader.summary(doc_id)
+            if summary is not None:
+                docs[doc_id] = {
+                    'id': self.reader.rowkeys[doc_id],
+                    'url': summary['url'],
+                    'title': summary['title'] or "无标题",
+                    'content': summary['snippet'] or "无内容",
+                    'meta': summary['meta'],
+                }
+        return docs
+
+    def get_document(self, rowkey):
+        doc_id = self.reader.doc_ids.get(rowkey)
+        if doc_id is None:
+            return None
+        summary = self.reader.summary(doc_id)
+        return {'id': rowkey, 'url': summary['url'], 'title': summary['title'], 'content': self.reader.content(doc_id)}
+
+    def corpus_stats(self):
+        return self.reader.corpus_stats()
+
+    def document_frequencies(self, terms):
+        return {t: self.reader.df(t) for t in terms}
+
+    def term_dictionary(self, prefix='', limit=None):
+        return self.reader.terms(prefix, limit)
+
+    def status(self):
+        return {'backend': self.name, 'ready': True, 'total_docs': self.reader.total_docs}
+
+    def reload(self):
+        """重新打开索引目录 (local_index.py 重建后整体替换了目录)"""
+        old, self.reader = self.reader, LocalIndexReader(self.index_dir)
+        old.close()
+
+    def close(self):
+        self.reader.close()
@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# web 模块之间以顶层模块互相导入 (from cache import LRUCache)，与 app.py 的运行方式一致
+ROOT = Path(__file__).resolve().parent.parent
+for path in (ROOT, ROOT / 'src' / 'web'):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
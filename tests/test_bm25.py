@@ -0,0 +1,71 @@
+import math
+
+import numpy as np
+import pytest
+
+from search_engine import BM25FScorer, SearchEngine
+from storage import PostingArrays
+
+CORPUS = {'doc_count': 10, 'avg_title_tokens': 4.0, 'avg_content_tokens': 20.0}
+
+
+class FakeStorage:
+    """get_ranking_postings 返回预设结果；get_postings 返回已存分数并记录调用"""
+    def __init__(self, ranking, stored):
+        self.ranking, self.stored = ranking, stored
+        self.stored_reads = 0
+
+    def get_ranking_postings(self, terms):
+        return [self.ranking.get(t, PostingArrays.from_dict({})) for t in terms]
+
+    def get_postings(self, terms):
+        self.stored_reads += 1
+        return [self.stored.get(t, {}) for t in terms]
+
+    def corpus_stats(self):
+        return CORPUS
+
+
+def make_engine(storage):
+    engine = SearchEngine.__new__(SearchEngine)  # 不加载分词器
+    engine.storage, engine.ranking, engine.scorer = storage, SearchEngine.RANKING_BM25, BM25FScorer()
+    return engine
+
+
+def test_bm25f_matches_hand_computed_value():
+    # 字段长度等于平均长度: B = 1，tf~ = 5 * 1 + 1 * 2 = 7；df = 1: idf = ln(1 + 9.5 / 1.5)
+    assert BM25FScorer().score([[1, 4, 2, 20]], CORPUS)[0] == pytest.approx(math.log(1 + 9.5 / 1.5) * 7 / 8.2)
+    assert BM25FScorer().score([[1, 4, 2, 20]], CORPUS)[0] == pytest.approx(1.700855, abs=1e-6)
+
+
+def test_bm25f_normalizes_field_lengths():
+    # 标题长度为平均的 2 倍: B = 0.25 + 0.75 * 2 = 1.75；正文为一半: B = 0.25 + 0.75 * 0.5 = 0.625
+    weighted = 5.0 * 1 / 1.75 + 1.0 * 2 / 0.625
+    expected = math.log(1 + 7.5 / 3.5) * weighted / (1.2 + weighted)
+    assert BM25FScorer().score([[1, 8, 2, 10]], CORPUS, df=3)[0] == pytest.approx(expected)
+
+
+def test_bm25f_without_average_lengths_uses_posting_average():
+    # 语料统计缺平均长度时取本条倒排的平均长度，两篇文档的 B 分别为 0.625 与 1.375
+    scores = BM25FScorer(title_weight=0.0).score([[0, 0, 1, 10], [0, 0, 1, 30]], {'doc_count': 10})
+    idf = math.log(1 + 8.5 / 2.5)
+    assert scores.tolist() == pytest.approx([idf * 1.6 / 2.8, idf * (1 / 1.375) / (1.2 + 1 / 1.375)])
+
+
+def test_all_tf_terms_are_scored_with_bm25f():
+    tf = np.array([[1, 4, 2, 20]])
+    storage = FakeStorage({'教学': (['a'], tf), '管理': (['b'], tf)}, {})
+    postings = make_engine(storage).fetch_postings(['教学', '管理', '缺失'])
+    score = BM25FScorer().score(tf, CORPUS)[0]
+    assert postings == [pytest.approx({'a': score}), pytest.approx({'b': score}), {}]
+    assert storage.stored_reads == 0
+
+
+def test_mixed_formats_fall_back_to_stored_scores(capsys):
+    # 一个词有原始词频、另一个只有已存分数: 两种分数不能相加，整个查询改用已存分数
+    stored = {'教学': {'a': 0.3}, '管理': {'a': 0.2, 'b': 0.1}}
+    storage = FakeStorage({'教学': (['a'], np.array([[1, 4, 2, 20]])),
+                           '管理': PostingArrays.from_dict(stored['管理'])}, stored)
+    assert make_engine(storage).fetch_postings(['教学', '管理']) == [stored['教学'], stored['管理']]
+    assert storage.stored_reads == 1
+    assert "['管理']" in capsys.readouterr().out
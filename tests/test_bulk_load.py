@@ -0,0 +1,112 @@
+import json
+
+import pytest
+
+from src.etl.corpus_stats import CORPUS_ROW, DOC_COUNT, decode_long, stats_rows
+from src.etl.jsonl_io import iter_records
+from src.mapreduce import bulk_load
+from src.mapreduce.bulk_load import (compute_split_keys, corpus_delta, file_row_keys, files_rows, read_cells,
+                                     verify_against_put_path, verify_table, write_bulk_output, write_table)
+from src.mapreduce.inverted_index import build_index, compact_rows, legacy_rows, tf_rows
+
+WORDS = ['教学', '管理', '本科', '课程', '计划', '指南', '学院', '通知']
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    path = tmp_path / 'extract_data.jsonl'
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(40):
+            f.write(json.dumps({'url': f'http://example.com/{i % 30}', 'title': f'标题{i}', 'content': f'正文{i}',
+                                'seg_title': [WORDS[i % 8]], 'seg_content': [WORDS[(i * 3) % 8], WORDS[(i + 1) % 8]]},
+                               ensure_ascii=False) + '\n')  # 后 10 条的 URL 与前面重复，以最后一次为准
+    return path
+
+
+def build(corpus, output_dir, index_format, regions=4):
+    """与 bulk_load.py 主程序相同的流程"""
+    postings, docs, term_stats = build_index(list(iter_records(corpus)), workers=1)
+    index_rows = {
+        'compact': lambda: compact_rows(postings, docs),
+        'legacy': lambda: legacy_rows(postings),
+        'tf': lambda: tf_rows(term_stats),
+    }[index_format]
+    delta = corpus_delta(corpus)
+    return write_bulk_output(output_dir, {
+        'files': (list(file_row_keys(corpus)), files_rows(corpus)),
+        'index': ([row_key for row_key, _ in index_rows()], index_rows()),
+        'stats': ([row_key for row_key, _ in stats_rows(delta)], stats_rows(delta)),
+    }, regions)
+
+
+def test_split_keys_are_quantiles():
+    keys = [bytes([i]) for i in range(100)]
+    assert compute_split_keys(keys, 4) == [bytes([25]), bytes([50]), bytes([75])]
+    assert compute_split_keys(keys[:3], 4) == []  # 行键少于分区数时不预分区
+    assert compute_split_keys(keys, 1) == []
+
+
+def test_partitions_are_sorted_and_within_bounds(tmp_path):
+    rows = [(bytes([k]), {b'f:b': b'1', b'f:a': b'2'}) for k in (90, 3, 57, 12, 33, 70, 3)]
+    rows.append((bytes([57]), {b'f:c': b'3'}))  # 同一行键出现多次时按 put 语义合并
+    partitions = write_table(tmp_path / 't', 't', [k for k, _ in rows], rows, regions=3)
+
+    cells = [list(read_cells(tmp_path / 't' / p['file'])) for p in partitions]
+    flat = [(row_key, column) for part in cells for row_key, column, _ in part]
+    assert flat == sorted(flat) and len(flat) == len(set(flat))
+    for part, part_cells in zip(partitions, cells):
+        start = bytes.fromhex(part['start_key'])
+        end = bytes.fromhex(part['end_key']) if part['end_key'] else None
+        assert all(start <= row_key and (end is None or row_key < end) for row_key, _, _ in part_cells)
+    assert sum(p['rows'] for p in partitions) == 6
+    assert {column for row_key, column in flat if row_key == bytes([57])} == {b'f:a', b'f:b', b'f:c'}
+    assert verify_table(tmp_path / 't') == []
+
+
+def test_verify_table_detects_unsorted_partition(tmp_path):
+    rows = [(bytes([k]), {b'f:a': b'x'}) for k in range(10)]
+    partitions = write_table(tmp_path / 't', 't', [k for k, _ in rows], rows, regions=2)
+    path = tmp_path / 't' / partitions[0]['file']
+    cells = list(read_cells(path))
+    with open(path, 'wb') as f:
+        for cell in reversed(cells):
+            bulk_load._write_cell(f, *cell)
+    problems = verify_table(tmp_path / 't')
+    assert any('未严格有序' in p for p in problems) and any('SHA-1' in p for p in problems)
+
+
+@pytest.mark.parametrize('index_format', ['compact', 'legacy', 'tf'])
+def test_output_matches_put_path(tmp_path, corpus, index_format):
+    summary = build(corpus, tmp_path / 'bulk', index_format)
+    assert sum(p['rows'] for p in summary['files']) == 30
+    for table in summary:
+        assert verify_table(tmp_path / 'bulk' / table) == []
+    assert verify_against_put_path(tmp_path / 'bulk', corpus, index_format, sample=0) == []
+
+    stats = dict(read_cells_of(tmp_path / 'bulk' / 'stats'))
+    assert decode_long(stats[(CORPUS_ROW, DOC_COUNT)]) == 30
+
+
+def read_cells_of(table_dir):
+    for part in sorted(table_dir.glob('part-*.cells')):
+        for row_key, column, value in read_cells(part):
+            yield (row_key, column), value
+
+
+def test_verify_detects_stats_that_disagree_with_files(tmp_path, corpus):
+    build(corpus, tmp_path / 'bulk', 'tf')
+    # 用错误的文档数重写 stats 表
+    delta = corpus_delta(corpus)
+    delta.doc_count += 1
+    rows = list(stats_rows(delta))
+    (tmp_path / 'bulk' / 'stats').rename(tmp_path / 'stats.old')
+    write_table(tmp_path / 'bulk' / 'stats', 'stats', [k for k, _ in rows], rows, regions=2)
+    problems = verify_against_put_path(tmp_path / 'bulk', corpus, 'tf', sample=0)
+    assert problems == ["stats: doc_count 31 != files 行数 30"]
+
+
+def test_rewrite_replaces_previous_output(tmp_path, corpus):
+    build(corpus, tmp_path / 'bulk', 'compact', regions=4)
+    build(corpus, tmp_path / 'bulk', 'compact', regions=2)
+    assert len(list((tmp_path / 'bulk' / 'files').glob('part-*.cells'))) == 2
+    assert not (tmp_path / 'bulk.tmp').exists()
@@ -0,0 +1,81 @@
+import pytest
+
+import cache
+from cache import LRUCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache.time, 'monotonic', clock)
+    return clock
+
+
+def test_evicts_least_recently_used():
+    lru = LRUCache(maxsize=2)
+    lru.put('a', 1)
+    lru.put('b', 2)
+    assert lru.get('a') == 1  # a 变为最近使用
+    lru.put('c', 3)
+    assert lru.get('b') is None
+    assert lru.get('a') == 1 and lru.get('c') == 3
+    assert len(lru) == 2
+
+
+def test_put_existing_key_replaces_value():
+    lru = LRUCache(maxsize=2, sizeof=len)
+    lru.put('a', 'xx')
+    lru.put('a', 'yyyy')
+    assert lru.get('a') == 'yyyy'
+    assert len(lru) == 1 and lru.nbytes == 4
+
+
+def test_ttl_expiry(clock):
+    lru = LRUCache(ttl=10)
+    lru.put('a', 1)
+    clock.now += 9
+    assert lru.get('a') == 1
+    clock.now += 2
+    assert lru.get('a', 'missing') == 'missing'
+    assert len(lru) == 0
+
+
+def test_byte_limit(clock):
+    lru = LRUCache(maxsize=100, maxbytes=10, sizeof=len)
+    lru.put('a', 'x' * 6)
+    lru.put('b', 'y' * 4)
+    lru.put('c', 'z' * 3)  # 超出 10 字节，淘汰最久未使用的 a
+    assert lru.get('a') is None
+    assert lru.nbytes == 7
+    lru.put('huge', 'w' * 11)  # 单个条目超过上限，不缓存
+    assert lru.get('huge') is None and lru.get('b') == 'y' * 4
+
+
+def test_get_many_and_stats(clock):
+    lru = LRUCache(ttl=5)
+    lru.put('a', 1)
+    lru.put('b', 2)
+    clock.now += 6
+    lru.put('c', 3)
+    found, missing = lru.get_many(['a', 'c', 'd'])
+    assert found == {'c': 3} and missing == ['a', 'd']
+    stats = lru.stats()
+    assert (stats['hits'], stats['misses']) == (1, 2)
+    assert stats['hit_rate'] == pytest.approx(1 / 3)
+
+
+def test_invalidate_keeps_counters():
+    lru = LRUCache(sizeof=len)
+    lru.put('a', 'xyz')
+    lru.get('a')
+    lru.invalidate()
+    assert len(lru) == 0 and lru.nbytes == 0
+    assert lru.stats()['hits'] == 1
@@ -0,0 +1,119 @@
+import json
+import os
+
+from src.etl.checkpoint import Checkpoint, DoneLog, InputFingerprint
+from src.etl.jsonl_io import JsonlWriter, iter_records, iter_records_from
+
+
+def write_jsonl(path, records):
+    with JsonlWriter(str(path)) as writer:
+        for record in records:
+            writer.write(record)
+        return writer.offset
+
+
+def test_checkpoint_save_load_clear(tmp_path):
+    checkpoint = Checkpoint(tmp_path / 'ckpt' / 'import.json')
+    assert checkpoint.load() is None
+    checkpoint.save({'position': 42, 'failed': []})
+    assert checkpoint.load() == {'position': 42, 'failed': []}
+    assert not os.path.exists(checkpoint.path + '.tmp')
+    checkpoint.clear()
+    assert checkpoint.load() is None
+
+
+def test_corrupt_checkpoint_is_ignored(tmp_path):
+    path = tmp_path / 'import.json'
+    path.write_text('{"position": 4', encoding='utf-8')
+    assert Checkpoint(path).load() is None
+
+
+def test_jsonl_resume_from_offset(tmp_path):
+    path = tmp_path / 'out.jsonl'
+    records = [{'url': f'u{i}', 'title': '标题'} for i in range(5)]
+    write_jsonl(path, records)
+    positions = [position for position, _ in iter_records_from(str(path))]
+    assert positions[-1] == os.path.getsize(path)
+    # 从第 2 条之后的断点继续读
+    assert [r['url'] for _, r in iter_records_from(str(path), positions[1])] == ['u2', 'u3', 'u4']
+
+
+def test_jsonl_writer_truncates_on_resume(tmp_path):
+    path = tmp_path / 'out.jsonl'
+    write_jsonl(path, [{'i': 0}, {'i': 1}])
+    first = next(iter_records_from(str(path)))[0]
+    with JsonlWriter(str(path), resume_offset=first) as writer:
+        writer.write({'i': 2})
+    assert list(iter_records(str(path))) == [{'i': 0}, {'i': 2}]
+
+
+def test_truncated_last_line_is_skipped(tmp_path):
+    path = tmp_path / 'out.jsonl'
+    write_jsonl(path, [{'i': 0}])
+    with open(path, 'ab') as f:
+        f.write(b'{"i": 1')  # 写入途中崩溃
+    assert list(iter_records(str(path))) == [{'i': 0}]
+
+
+def test_legacy_json_array_positions_are_counts(tmp_path):
+    path = tmp_path / 'extract_data.json'
+    path.write_text(json.dumps([{'i': 0}, {'i': 1}, {'i': 2}]), encoding='utf-8')
+    assert list(iter_records_from(str(path), 1)) == [(2, {'i': 1}), (3, {'i': 2})]
+
+
+def test_done_log_resume(tmp_path):
+    log = DoneLog(tmp_path / 'done.jsonl')
+    log.open()
+    log.append({'file': 'a'})
+    log.append({'file': 'b'})
+    checkpoint_offset = log.offset
+    log.append({'file': 'c'})  # 检查点之后写入，恢复时应被丢弃
+    log.close()
+
+    assert log.load(checkpoint_offset) == [{'file': 'a'}, {'file': 'b'}]
+    log.open(resume_offset=checkpoint_offset)
+    log.append({'file': 'd'})
+    log.close()
+    assert log.load(os.path.getsize(log.path)) == [{'file': 'a'}, {'file': 'b'}, {'file': 'd'}]
+
+
+def test_done_log_shorter_than_checkpoint(tmp_path):
+    log = DoneLog(tmp_path / 'done.jsonl')
+    assert log.load(0) is None
+    log.open()
+    log.append({'file': 'a'})
+    log.close()
+    log_size = os.path.getsize(log.path)
+    assert log.load(log_size) == [{'file': 'a'}]
+    assert log.load(log_size + 1) is None
+    log.clear()
+    assert not os.path.exists(log.path)
+
+
+def test_fingerprint_detects_rewritten_prefix(tmp_path):
+    path = tmp_path / 'in.jsonl'
+    write_jsonl(path, [{'i': 0}, {'i': 1}])
+    offset = next(iter_records_from(str(path)))[0]
+    state = InputFingerprint(path).state(offset)
+
+    assert InputFingerprint(path).matches(state)
+    # 断点之后追加内容: 前缀不变，仍可续传
+    with open(path, 'ab') as f:
+        f.write(b'{"i": 2}\n')
+    fingerprint = InputFingerprint(path)
+    assert fingerprint.matches(state) and fingerprint.changed(state)
+
+    # 断点之前的内容被改写: 拒绝续传
+    write_jsonl(path, [{'i': 9}, {'i': 1}])
+    assert not InputFingerprint(path).matches(state)
+    assert not InputFingerprint(tmp_path / 'other.jsonl').matches(state)
+
+
+def test_fingerprint_state_advances_incrementally(tmp_path):
+    path = tmp_path / 'in.jsonl'
+    size = write_jsonl(path, [{'i': i} for i in range(3)])
+    fingerprint = InputFingerprint(path)
+    positions = [position for position, _ in iter_records_from(str(path))]
+    for position in positions:
+        state = fingerprint.state(position)
+    assert state == InputFingerprint(path).state(size)
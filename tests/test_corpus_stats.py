@@ -0,0 +1,74 @@
+from contextlib import contextmanager
+
+from src.etl.corpus_stats import CORPUS_ROW, StatsDelta, apply_delta, read_corpus_stats, read_df, stats_rows
+
+DOCS = [('教学 管理', '教学 计划 教学'), ('本科', '教学 指南'), ('', '课程 计划')]
+
+
+class FakeStatsTable:
+    def __init__(self):
+        self.data = {}
+
+    def rows(self, keys, columns=None):
+        return [(k, dict(self.data[k])) for k in keys if k in self.data]
+
+    def row(self, key, columns=None):
+        return dict(self.data.get(key, {}))
+
+    @contextmanager
+    def batch(self):
+        yield self
+
+    def put(self, key, data):
+        self.data.setdefault(key, {}).update(data)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def delta_of(docs, sign=1):
+    delta = StatsDelta()
+    for doc in docs:
+        delta.add_doc(*doc) if sign > 0 else delta.remove_doc(*doc)
+    return delta
+
+
+def test_delta_counts_each_document_once_per_term():
+    delta = delta_of(DOCS)
+    assert delta.doc_count == 3 and delta.title_tokens == 3 and delta.content_tokens == 7
+    assert delta.df == {'教学': 2, '管理': 1, '计划': 2, '本科': 1, '指南': 1, '课程': 1}
+
+
+def test_remove_undoes_add():
+    table = FakeStatsTable()
+    apply_delta(table, delta_of(DOCS))
+    before = {k: dict(v) for k, v in table.data.items()}
+
+    # 重新导入: 同一批次里先减旧版本再加新版本，内容不变时统计不变
+    reimport = delta_of(DOCS[:2], sign=-1)
+    for doc in DOCS[:2]:
+        reimport.add_doc(*doc)
+    apply_delta(table, reimport)
+    assert table.data == before
+
+    # 删掉全部文档: 计数归零，df 降为 0 的词行被删除
+    apply_delta(table, delta_of(DOCS, sign=-1))
+    assert read_corpus_stats(table) == {'doc_count': 0, 'avg_title_tokens': 0.0, 'avg_content_tokens': 0.0}
+    assert set(table.data) == {CORPUS_ROW}
+
+
+def test_update_changes_only_affected_terms():
+    table = FakeStatsTable()
+    apply_delta(table, delta_of(DOCS))
+    update = delta_of([DOCS[1]], sign=-1)
+    update.add_doc('本科', '课程 指南')  # 正文里的 教学 换成了 课程
+    apply_delta(table, update)
+    assert read_df(table, ['教学', '课程', '本科', '指南']) == {'教学': 1, '课程': 2, '本科': 1, '指南': 1}
+    assert read_corpus_stats(table)['doc_count'] == 3
+
+
+def test_incremental_matches_full_rebuild():
+    table = FakeStatsTable()
+    for doc in DOCS:
+        apply_delta(table, delta_of([doc]))
+    assert table.data == dict(stats_rows(delta_of(DOCS)))
@@ -0,0 +1,182 @@
+import json
+from contextlib import contextmanager
+
+import pytest
+
+from src.etl import hbase_import
+from src.etl.checkpoint import Checkpoint
+from src.etl.corpus_stats import CORPUS_ROW, DF_COLUMN, DOC_COUNT, decode_long
+from src.etl.hbase_import import BulkWriterError, HBaseFileImporter
+
+
+def _key(key):
+    return key.encode('utf-8') if isinstance(key, str) else key
+
+
+class FakeTable:
+    def __init__(self, hbase, name):
+        self.hbase, self.name = hbase, name
+        self.data = hbase.tables.setdefault(name, {})
+
+    def _check(self):
+        if self.name == 'files' and self.hbase.down:
+            raise IOError("HBase unavailable")
+
+    def put(self, key, data):
+        self._check()
+        self.data.setdefault(_key(key), {}).update(data)
+        self.hbase.puts[self.name] += 1
+
+    def delete(self, key, columns=None):
+        row = self.data.get(_key(key), {})
+        for column in columns or list(row):
+            row.pop(column, None)
+        if not row:
+            self.data.pop(_key(key), None)
+
+    def rows(self, keys, columns=None):
+        return [(k, dict(self.data[k])) for k in map(_key, keys) if k in self.data]
+
+    def row(self, key, columns=None):
+        return dict(self.data.get(_key(key), {}))
+
+    @contextmanager
+    def batch(self):
+        pending = []
+        yield FakeBatch(pending)
+        self._check()
+        if self.name == 'files':
+            self.hbase.files_batches += 1
+            if self.hbase.files_batches == self.hbase.fail_at_batch:
+                self.hbase.down = True
+                raise IOError("HBase went away")
+        for op, key, arg in pending:
+            self.put(key, arg) if op == 'put' else self.delete(key, arg)
+
+
+class FakeBatch:
+    def __init__(self, pending):
+        self.pending = pending
+
+    def put(self, key, data):
+        self.pending.append(('put', key, data))
+
+    def delete(self, key, columns=None):
+        self.pending.append(('delete', key, columns))
+
+
+class FakeHBase:
+    """多个连接共享的内存表；files 表第 fail_at_batch 次批量写入时宕机，之后的写入都失败"""
+    def __init__(self, fail_at_batch=None):
+        self.tables = {}
+        self.fail_at_batch = fail_at_batch
+        self.files_batches = 0
+        self.down = False
+        self.puts = {'files': 0, 'stats': 0, 'index': 0, 'positions': 0}
+
+    def connection(self):
+        hbase = self
+
+        class Connection:
+            def table(self, name):
+                return FakeTable(hbase, name)
+
+            def close(self):
+                pass
+
+        return Connection()
+
+
+def make_importer(hbase, monkeypatch):
+    importer = HBaseFileImporter()
+    importer.BATCH_SIZE = 2
+    monkeypatch.setattr(importer, '_new_connection', hbase.connection)
+    monkeypatch.setattr(hbase_import.time, 'sleep', lambda _: None)  # 跳过重试退避
+    return importer
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    path = tmp_path / 'extract_data.jsonl'
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(7):
+            f.write(json.dumps({'url': f'http://example.com/{i}', 'title': f'标题{i}', 'content': '正文',
+                                'seg_title': ['标题'], 'seg_content': ['教学', f'词{i}']}, ensure_ascii=False) + '\n')
+    return path
+
+
+def test_aborted_import_resumes_from_checkpoint(tmp_path, corpus, monkeypatch):
+    checkpoint = Checkpoint(tmp_path / 'checkpoints' / 'import.json')
+    fail_file = tmp_path / 'fail.json'
+
+    # 第 3 批写入时 HBase 宕机: 导入中止，检查点停在前两批之后
+    hbase = FakeHBase(fail_at_batch=3)
+    with pytest.raises(BulkWriterError):
+        make_importer(hbase, monkeypatch).import_data_from_json(corpus, fail_file, checkpoint=checkpoint)
+    state = checkpoint.load()
+    assert state['total'] == 4 and state['success'] == 4
+    assert len(hbase.tables['files']) == 4
+
+    # --resume: 只发送剩下的 3 条，已确认的批次不会重发
+    hbase.down, hbase.fail_at_batch, hbase.puts['files'] = False, None, 0
+    make_importer(hbase, monkeypatch).import_data_from_json(corpus, fail_file, checkpoint=checkpoint, resume=True)
+    assert hbase.puts['files'] == 3
+    assert len(hbase.tables['files']) == 7
+    assert checkpoint.load() is None  # 完成后清除检查点
+    stats = hbase.tables['stats']
+    assert decode_long(stats[CORPUS_ROW][DOC_COUNT]) == 7
+    assert decode_long(stats['教学'.encode('utf-8')][DF_COLUMN]) == 7
+
+
+def test_resume_ignores_checkpoint_of_rewritten_input(tmp_path, corpus, monkeypatch):
+    checkpoint = Checkpoint(tmp_path / 'checkpoints' / 'import.json')
+    hbase = FakeHBase(fail_at_batch=2)
+    with pytest.raises(BulkWriterError):
+        make_importer(hbase, monkeypatch).import_data_from_json(corpus, tmp_path / 'fail.json', checkpoint=checkpoint)
+    assert checkpoint.load()['total'] == 2
+
+    # 提取阶段重写了输入 (断点之前的内容变了): 从头导入
+    lines = corpus.read_text(encoding='utf-8').splitlines(keepends=True)
+    corpus.write_text(''.join(reversed(lines)), encoding='utf-8')
+    hbase.down, hbase.fail_at_batch, hbase.puts['files'] = False, None, 0
+    make_importer(hbase, monkeypatch).import_data_from_json(corpus, tmp_path / 'fail.json', checkpoint=checkpoint,
+                                                            resume=True)
+    assert hbase.puts['files'] == 7
+
+
+def test_resume_after_crash_between_write_and_stats_update(tmp_path, corpus, monkeypatch):
+    checkpoint = Checkpoint(tmp_path / 'checkpoints' / 'import.json')
+    hbase = FakeHBase()
+    update_stats = hbase_import.BulkWriter._update_stats
+    calls = []
+
+    def crash_on_second_batch(writer, conn, latest, existing):
+        calls.append(latest)
+        if len(calls) == 2:
+            raise IOError("killed after the files write")
+        update_stats(writer, conn, latest, existing)
+
+    # 第 2 批的文档已写入 files 表，但统计尚未更新
+    monkeypatch.setattr(hbase_import.BulkWriter, '_update_stats', crash_on_second_batch)
+    with pytest.raises(BulkWriterError):
+        make_importer(hbase, monkeypatch).import_data_from_json(corpus, tmp_path / 'fail.json', checkpoint=checkpoint)
+    assert checkpoint.load()['total'] == 2
+    assert decode_long(hbase.tables['stats'][CORPUS_ROW][DOC_COUNT]) == 2
+
+    # 续传重做第 2 批: 沿用写入前的快照，这两篇文档按新增计数
+    monkeypatch.setattr(hbase_import.BulkWriter, '_update_stats', update_stats)
+    make_importer(hbase, monkeypatch).import_data_from_json(corpus, tmp_path / 'fail.json', checkpoint=checkpoint,
+                                                            resume=True)
+    stats = hbase.tables['stats']
+    assert decode_long(stats[CORPUS_ROW][DOC_COUNT]) == 7
+    assert decode_long(stats['教学'.encode('utf-8')][DF_COLUMN]) == 7
+    assert not (tmp_path / 'checkpoints' / 'import_batches').exists()
+
+
+def test_index_version_is_stamped_at_most_once_per_interval(tmp_path, corpus, monkeypatch):
+    stamps = []
+    monkeypatch.setattr(hbase_import, 'stamp_index_version', lambda: stamps.append(1))
+    monkeypatch.setattr(HBaseFileImporter, 'check_index_format', lambda self: None)
+    importer = make_importer(FakeHBase(), monkeypatch)
+    importer.import_data_from_json(corpus, tmp_path / 'fail.json', update_index=True)
+    assert len(stamps) == 2  # 第一批确认时 + 导入完成时，中间的批次落在同一间隔内
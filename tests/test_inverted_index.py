@@ -0,0 +1,72 @@
+import math
+
+import pytest
+
+from src.etl.hbase_import import HBaseFileImporter
+from src.mapreduce import inverted_index
+from src.mapreduce.inverted_index import build_index, check_parity
+from src.mapreduce.scoring import score
+
+CORPUS = [
+    {'url': 'http://example.com/a', 'seg_title': ['教学', '管理'], 'seg_content': ['教学', '计划', '教学']},
+    {'url': 'http://example.com/b', 'seg_title': ['本科'], 'seg_content': ['教学', '指南']},
+    {'url': 'http://example.com/c', 'seg_title': [], 'seg_content': ['课程', '计划']},
+    {'url': 'http://example.com/d', 'seg_title': ['新闻'], 'seg_content': ['通知']},
+    {'url': '', 'seg_title': ['缺失'], 'seg_content': []},  # 没有 URL 的记录不计入索引
+]
+
+
+def rowkey(i):
+    return HBaseFileImporter.generate_rowkey(CORPUS[i]['url'])
+
+
+def test_scores_match_scoring_formula():
+    postings, docs, stats = build_index(CORPUS, workers=1, shards=2)
+    assert len(docs) == 4 and '缺失' not in postings
+
+    # 教学: a 标题 1/2、正文 2/3，b 正文 1/2；df = 2，N = 4
+    idf = math.log(4 / 3)
+    assert postings['教学'] == pytest.approx({rowkey(0): score(1, 2, 2, 3, idf), rowkey(1): score(0, 1, 1, 2, idf)})
+    assert postings['教学'][rowkey(0)] == pytest.approx((5.0 * 1 / 2 + 2 / 3) * idf)
+    idf = math.log(4 / 2)
+    assert postings['本科'] == pytest.approx({rowkey(1): score(1, 1, 0, 2, idf)})
+    assert postings['课程'][rowkey(2)] == pytest.approx(0.5 * idf)  # 标题为空，只有正文项
+    assert check_parity(postings, stats, len(docs)) == []
+
+
+def test_shards_do_not_change_scores():
+    single, _, _ = build_index(CORPUS, workers=1, shards=1)
+    sharded, _, _ = build_index(CORPUS, workers=1, shards=3)
+    assert sharded == single
+
+
+def test_duplicate_url_keeps_last_version():
+    updated = dict(CORPUS[1], seg_content=['课程'])  # b 重新提取后正文变了
+    postings, docs, _ = build_index(CORPUS + [updated], workers=1)
+    assert len(docs) == 4
+    assert rowkey(1) not in postings['教学'] and rowkey(1) in postings['课程']
+
+
+class FakeConnection:
+    def __init__(self, tables):
+        self._tables = tables
+
+    def tables(self):
+        return list(self._tables)
+
+    def delete_table(self, name, disable=False):
+        del self._tables[name.encode('utf-8')]
+
+    def create_table(self, name, families):
+        self._tables[name.encode('utf-8')] = {'families': families, 'rows': {}}
+
+    def close(self):
+        pass
+
+
+def test_recreate_table_drops_cells_of_previous_build(monkeypatch):
+    legacy = {'教学'.encode('utf-8'): {f'p:{rowkey(0)}'.encode('utf-8'): b'\0' * 8}}
+    tables = {b'index': {'families': {'p': {}}, 'rows': legacy}}
+    monkeypatch.setattr(inverted_index.happybase, 'Connection', lambda *a, **kw: FakeConnection(tables))
+    inverted_index.recreate_table('index', [inverted_index.INDEX_FAMILY])
+    assert tables[b'index'] == {'families': {'p': {}}, 'rows': {}}
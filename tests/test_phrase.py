@@ -0,0 +1,62 @@
+import random
+from bisect import bisect_left
+
+import pytest
+
+from search_engine import PhraseMatcher
+from src.mapreduce.scoring import term_positions
+
+
+def brute_phrase_starts(position_lists):
+    sets = [set(seq) for seq in position_lists]
+    return sorted(p for p in position_lists[0] if all(p + i in s for i, s in enumerate(sets)))
+
+
+@pytest.mark.parametrize('lo', [0, 3, 7])
+def test_gallop_matches_bisect(lo):
+    seq = [1, 2, 4, 8, 9, 15, 16, 23, 42, 50]
+    for target in range(0, 55):
+        assert PhraseMatcher.gallop(seq, target, lo) == max(lo, bisect_left(seq, target))
+
+
+def test_adjacent_positions():
+    # 本科 学习 指南: 起始位置 3 与 20 处连续出现
+    assert PhraseMatcher.phrase_starts([[3, 10, 20], [4, 21, 30], [5, 22]]) == [3, 20]
+
+
+def test_gapped_positions_do_not_match():
+    # 各词都出现，但中间隔了别的词
+    assert PhraseMatcher.phrase_starts([[3, 20], [5, 22], [6, 23]]) == []
+    assert PhraseMatcher.phrase_starts([[0], [2]]) == []
+
+
+def test_driver_in_the_middle_and_long_gallops():
+    # 最短的列表是第二个词，其余列表需要跨过很长一段才能找到候选
+    first = list(range(0, 1000, 2)) + [1001]
+    third = list(range(1, 1000, 2)) + [1003]
+    assert PhraseMatcher.phrase_starts([first, [500, 1002], third]) == [1001]
+
+
+def test_repeated_word():
+    # "教学 教学": 同一位置列表出现两次
+    positions = [1, 2, 3, 7, 9, 10]
+    assert PhraseMatcher.phrase_starts([positions, positions]) == [1, 2, 9]
+
+
+def test_phrase_does_not_cross_fields():
+    # 标题末词与正文首词之间留有 FIELD_GAP 的空档
+    positions = term_positions(['本科', '学习'], ['指南', '本科', '学习'])
+    assert PhraseMatcher.phrase_starts([positions['学习'], positions['指南']]) == []
+    assert PhraseMatcher.phrase_starts([positions['本科'], positions['学习']]) == positions['本科']
+
+
+def test_random_lists_match_brute_force():
+    rng = random.Random(7)
+    for _ in range(200):
+        lists = [sorted(rng.sample(range(60), rng.randint(1, 20))) for _ in range(rng.randint(2, 4))]
+        assert PhraseMatcher.phrase_starts(lists) == brute_phrase_starts(lists)
+
+
+def test_min_span():
+    assert PhraseMatcher.min_span([[1, 10], [12], [14, 30]]) == 4
+    assert PhraseMatcher.min_span([[5], [5]]) == 0
@@ -0,0 +1,67 @@
+import struct
+
+import numpy as np
+import pytest
+
+from src.mapreduce import posting_codec
+
+
+def test_encode_decode_round_trip():
+    doc_ids = [300, 0, 7, 128, 2 ** 20]
+    scores = [0.5, 1.25, -0.01, 3.0, 0.0]
+    ids, decoded = posting_codec.decode(posting_codec.encode(doc_ids, scores))
+    assert ids.tolist() == sorted(doc_ids)
+    expected = dict(zip(doc_ids, scores))
+    # int16 量化: 误差不超过 scale / SCORE_LEVELS 的一半
+    tolerance = max(abs(s) for s in scores) / posting_codec.SCORE_LEVELS
+    for doc_id, score in zip(ids.tolist(), decoded.tolist()):
+        assert score == pytest.approx(expected[doc_id], abs=tolerance)
+
+
+def test_empty_and_zero_postings():
+    ids, scores = posting_codec.decode(posting_codec.encode([], []))
+    assert len(ids) == 0 and len(scores) == 0
+    assert posting_codec.decode_dict(posting_codec.encode([3, 1], [0.0, 0.0])) == {1: 0.0, 3: 0.0}
+
+
+def test_unknown_version_is_rejected():
+    blob = bytearray(posting_codec.encode([1], [1.0]))
+    blob[0] = posting_codec.CODEC_VERSION + 1
+    with pytest.raises(ValueError):
+        posting_codec.decode(bytes(blob))
+
+
+def test_decode_legacy_row_skips_tf_cells():
+    row = {
+        b'p:' + b'a' * 32: struct.pack('>d', 0.75),
+        b'p:' + b'b' * 32: struct.pack('>d', 1.5),
+        posting_codec.tf_qualifier('c' * 32): posting_codec.encode_tf((1, 2, 3, 4)),
+    }
+    cols, scores = posting_codec.decode_legacy_row(row)
+    assert dict(zip(cols, scores.tolist())) == {b'p:' + b'a' * 32: 0.75, b'p:' + b'b' * 32: 1.5}
+
+
+def test_decode_legacy_row_with_string_scores():
+    cols, scores = posting_codec.decode_legacy_row({b'p:x': b'0.5', b'p:y': b'oops'})
+    assert dict(zip(cols, scores.tolist())) == {b'p:x': 0.5, b'p:y': 0.0}
+
+
+def test_tf_cells_round_trip():
+    row = {posting_codec.tf_qualifier(k): posting_codec.encode_tf(v)
+           for k, v in {'a' * 32: (1, 5, 0, 100), 'b' * 32: (0, 3, 2 ** 31, 2 ** 32 - 1)}.items()}
+    rowkeys, tf = posting_codec.decode_tf_cells(row)
+    assert dict(zip(rowkeys, map(tuple, tf.tolist()))) == {'a' * 32: (1, 5, 0, 100), 'b' * 32: (0, 3, 2 ** 31, 2 ** 32 - 1)}
+    assert tf.dtype == np.int64
+
+
+def test_positions_round_trip():
+    positions = [0, 1, 127, 128, 100000]
+    assert posting_codec.decode_positions(posting_codec.encode_positions(positions)) == positions
+    assert posting_codec.decode_positions(b'') == []
+
+
+def test_position_lists_round_trip():
+    lists = {5: [3, 9], 0: [0], 1000: [1, 2, 300]}
+    blob = posting_codec.encode_position_lists(list(lists), list(lists.values()))
+    assert posting_codec.decode_position_lists(blob) == lists
+    assert posting_codec.decode_position_lists(blob, doc_ids=[1000]) == {1000: [1, 2, 300]}
@@ -0,0 +1,59 @@
+import pytest
+
+from search_engine import QueryPlanner
+
+
+class SplitAnalyzer:
+    """按空格切分的分析器，省去加载 jieba 词典"""
+    def analyze_query(self, text):
+        return [t for t in text.lower().split() if len(t) > 1]
+
+
+@pytest.fixture
+def planner():
+    return QueryPlanner(SplitAnalyzer())
+
+
+def test_plan_deduplicates_in_order(planner):
+    assert planner.plan('教学 管理 教学 本科') == ['教学', '管理', '本科']
+
+
+def test_plan_falls_back_to_whitespace_split(planner):
+    # 全部被分析器过滤时退化为按空格切分
+    assert planner.plan('a b') == ['a', 'b']
+
+
+def test_parse_phrase(planner):
+    assert planner.parse_phrase('"本科 学习 指南"') == (['本科', '学习', '指南'], None)
+    assert planner.parse_phrase('"本科 学习"~3') == (['本科', '学习'], 3)
+    assert planner.parse_phrase('"本科 学习"~999')[1] == QueryPlanner.MAX_SLOP
+    assert planner.parse_phrase('本科 学习') == (None, None)
+
+
+def test_merge_and_intersects_and_sums():
+    merged = QueryPlanner.merge([{'a': 1.0, 'b': 2.0, 'c': 0.5}, {'b': 1.0, 'c': 1.0}, {'c': 2.0, 'b': 0.5}])
+    assert merged == {'b': 3.5, 'c': 3.5}
+
+
+def test_merge_and_with_missing_term_is_empty():
+    assert QueryPlanner.merge([{'a': 1.0}, {}]) == {}
+
+
+def test_merge_or_unions_and_sums():
+    merged = QueryPlanner.merge([{'a': 1.0, 'b': 2.0}, {'b': 1.0, 'c': 0.5}, {}], QueryPlanner.OP_OR)
+    assert merged == {'a': 1.0, 'b': 3.0, 'c': 0.5}
+
+
+def test_merge_does_not_modify_inputs():
+    first, second = {'a': 1.0}, {'a': 2.0, 'b': 1.0}
+    QueryPlanner.merge([first, second], QueryPlanner.OP_OR)
+    assert first == {'a': 1.0} and second == {'a': 2.0, 'b': 1.0}
+
+
+def test_merge_empty():
+    assert QueryPlanner.merge([]) == {}
+    assert QueryPlanner.merge([], QueryPlanner.OP_OR) == {}
+
+
+def test_merge_expansions_takes_max():
+    assert QueryPlanner.merge_expansions([{'a': 1.0, 'b': 0.5}, {'a': 0.25, 'c': 2.0}]) == {'a': 1.0, 'b': 0.5, 'c': 2.0}
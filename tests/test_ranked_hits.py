@@ -0,0 +1,31 @@
+import numpy as np
+
+from search_engine import RankedHits, SearchEngine
+from storage import PostingArrays
+
+
+def make_hits(n):
+    return RankedHits(PostingArrays([f'doc{i}' for i in range(n)], np.arange(n, dtype=np.float64)))
+
+
+def test_page_extends_sorted_prefix():
+    hits = make_hits(20)
+    assert [key for key, _ in hits.page(0, 3)] == ['doc19', 'doc18', 'doc17']
+    assert len(hits.order) == 3
+    assert [key for key, _ in hits.page(3, 5)] == ['doc16', 'doc15']
+    assert len(hits.order) == 6  # 成倍扩展
+
+
+def test_page_keeps_longer_prefix_published_meanwhile(monkeypatch):
+    hits = make_hits(20)
+    top_k_indices = SearchEngine.top_k_indices
+    full = top_k_indices(hits.hits.scores, 20)
+
+    def racing_top_k(scores, k):
+        hits.order = full  # 另一个线程在本次扩展期间发布了更长的前缀
+        return top_k_indices(scores, k)
+
+    monkeypatch.setattr(SearchEngine, 'top_k_indices', staticmethod(racing_top_k))
+    page = hits.page(0, 3)
+    assert [key for key, _ in page] == ['doc19', 'doc18', 'doc17']
+    assert hits.order is full  # 较短的扩展结果只用于本次返回，不覆盖已发布的前缀
@@ -0,0 +1,133 @@
+import struct
+from contextlib import contextmanager
+
+import numpy as np
+import pytest
+
+from src.etl.corpus_stats import CORPUS_ROW, DF_COLUMN, DOC_COUNT, encode_long
+from src.mapreduce import posting_codec
+from src.mapreduce.scoring import idf, score_array
+from storage import HBaseStorage, PostingArrays
+
+ROWKEY_A, ROWKEY_B, ROWKEY_C = 'a' * 32, 'b' * 32, 'c' * 32
+
+
+class FakeTable:
+    def __init__(self, rows):
+        self._rows = rows
+        self.requests = 0
+
+    def rows(self, keys, columns=None):
+        self.requests += 1
+        return [(k, self._rows[k]) for k in keys if k in self._rows]
+
+    def row(self, key, columns=None):
+        self.requests += 1
+        return self._rows.get(key, {})
+
+
+class FakeConnector:
+    def __init__(self, tables):
+        self.tables = tables
+
+    @contextmanager
+    def table(self, name):
+        yield self.tables[name]
+
+
+def legacy_cell(rowkey, score):
+    return {b'p:' + rowkey.encode('utf-8'): struct.pack('>d', score)}
+
+
+def tf_cell(rowkey, counts):
+    return {posting_codec.tf_qualifier(rowkey): posting_codec.encode_tf(counts)}
+
+
+def make_storage(index_rows):
+    stats_rows = {CORPUS_ROW: {DOC_COUNT: encode_long(100)}, '教学'.encode('utf-8'): {DF_COLUMN: encode_long(2)}}
+    return HBaseStorage(FakeConnector({'index': FakeTable(index_rows), 'stats': FakeTable(stats_rows)}))
+
+
+def tf_score(counts, df=2):
+    return score_array(np.array([counts]), idf(100, df))[0]
+
+
+def test_row_format():
+    assert posting_codec.row_format({}) is None
+    assert posting_codec.row_format(legacy_cell(ROWKEY_A, 1.0)) == 'legacy'
+    assert posting_codec.row_format({posting_codec.BLOB_QUALIFIER: b''}) == 'compact'
+    assert posting_codec.row_format(tf_cell(ROWKEY_A, (1, 2, 3, 4))) == 'tf'
+    assert posting_codec.row_format({**legacy_cell(ROWKEY_A, 1.0), **tf_cell(ROWKEY_B, (1, 2, 3, 4))}) == 'mixed'
+
+
+def test_mixed_legacy_row_keeps_stored_postings():
+    row = {**legacy_cell(ROWKEY_A, 0.5), **legacy_cell(ROWKEY_B, 0.25), **tf_cell(ROWKEY_B, (1, 4, 2, 10))}
+    storage = make_storage({'教学'.encode('utf-8'): row})
+
+    postings = storage.get_postings(['教学'])[0]
+    assert postings == pytest.approx({ROWKEY_A: 0.5, ROWKEY_B: tf_score((1, 4, 2, 10))})
+    # BM25 模式下 mixed 行没有完整的 TF，按已存分数返回而不是只返回 TF cell
+    ranking, = storage.get_ranking_postings(['教学'])
+    assert isinstance(ranking, PostingArrays)
+    assert ranking.to_dict() == pytest.approx({ROWKEY_A: 0.5, ROWKEY_B: tf_score((1, 4, 2, 10))})
+
+
+def test_mixed_compact_row_maps_doc_ids_to_rowkeys():
+    blob = posting_codec.encode([0, 1], [0.5, 0.25])
+    row = {posting_codec.BLOB_QUALIFIER: blob, **tf_cell(ROWKEY_C, (0, 0, 1, 5))}
+    docmap = {posting_codec.DOCMAP_QUALIFIER: (ROWKEY_A + ROWKEY_B).encode('utf-8')}
+    storage = make_storage({'教学'.encode('utf-8'): row, posting_codec.DOCMAP_ROW: docmap})
+
+    postings = storage.get_postings(['教学'])[0]
+    assert set(postings) == {ROWKEY_A, ROWKEY_B, ROWKEY_C}
+    assert postings[ROWKEY_C] == pytest.approx(tf_score((0, 0, 1, 5)))
+    assert postings[ROWKEY_A] == pytest.approx(0.5, rel=1e-3)
+
+
+def test_tf_only_row():
+    storage = make_storage({'教学'.encode('utf-8'): tf_cell(ROWKEY_A, (1, 2, 3, 4))})
+    (rowkeys, tf), = storage.get_ranking_postings(['教学'])
+    assert rowkeys == [ROWKEY_A]
+    assert tf.tolist() == [[1, 2, 3, 4]]
+    assert storage.get_postings(['教学', '缺失']) == [pytest.approx({ROWKEY_A: tf_score((1, 2, 3, 4))}), {}]
+
+
+def test_ranking_postings_read_index_once():
+    storage = make_storage({
+        '教学'.encode('utf-8'): tf_cell(ROWKEY_A, (1, 2, 3, 4)),
+        '管理'.encode('utf-8'): legacy_cell(ROWKEY_B, 0.75),
+    })
+    (rowkeys, tf), stored, missing = storage.get_ranking_postings(['教学', '管理', '缺失'])
+    assert rowkeys == [ROWKEY_A] and tf.tolist() == [[1, 2, 3, 4]]
+    assert stored.to_dict() == {ROWKEY_B: 0.75}
+    assert len(missing) == 0
+    assert storage.connector.tables['index'].requests == 1
+
+
+def test_posting_arrays_round_trip():
+    postings = {ROWKEY_A: 0.5, ROWKEY_B: 0.25}
+    arrays = PostingArrays.from_dict(postings)
+    assert len(arrays) == 2 and arrays.scores.dtype == np.float64
+    assert arrays.key(1) == ROWKEY_B
+    assert arrays.to_dict() == postings
+    assert len(PostingArrays.from_dict({})) == 0 and PostingArrays.from_dict({}).to_dict() == {}
+
+
+def test_posting_arrays_decode_keys_lazily():
+    decoded = []
+
+    def decode(key):
+        decoded.append(key)
+        return key.decode('utf-8')
+
+    arrays = PostingArrays(np.array([b'x', b'y', b'z']), np.array([3.0, 1.0, 2.0]), decode_key=decode)
+    assert arrays.key(2) == 'z' and decoded == [b'z']  # 只解码取到的条目
+    assert arrays.to_dict() == {'x': 3.0, 'y': 1.0, 'z': 2.0}
+
+
+def test_legacy_row_as_arrays():
+    storage = make_storage({'教学'.encode('utf-8'): {**legacy_cell(ROWKEY_A, 0.5), **legacy_cell(ROWKEY_B, 0.25)}})
+    arrays, missing = storage.get_posting_arrays(['教学', '缺失'])
+    assert sorted(arrays.scores.tolist()) == [0.25, 0.5]
+    assert arrays.to_dict() == {ROWKEY_A: 0.5, ROWKEY_B: 0.25}
+    assert len(missing) == 0
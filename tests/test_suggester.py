@@ -0,0 +1,36 @@
+from search_engine import TermSuggester
+
+
+def make_suggester():
+    return TermSuggester(sorted([
+        ('教学', 50), ('教学楼', 5), ('教学管理', 20), ('教学计划', 20), ('教师', 30),
+        ('学生', 80), ('teach', 3), ('teacher', 9), ('teaching', 9), ('team', 1),
+    ]))
+
+
+def test_suggest_orders_by_df_then_term():
+    suggester = make_suggester()
+    assert suggester.suggest('教学') == [('教学', 50), ('教学管理', 20), ('教学计划', 20), ('教学楼', 5)]
+    assert suggester.suggest('tea') == [('teacher', 9), ('teaching', 9), ('teach', 3), ('team', 1)]
+
+
+def test_suggest_limit_breaks_ties_by_term():
+    suggester = make_suggester()
+    # 超过 limit 时走 np.partition 分支，结果应与全量排序后截断一致
+    assert suggester.suggest('教学', limit=2) == [('教学', 50), ('教学管理', 20)]
+    assert suggester.suggest('tea', limit=1) == [('teacher', 9)]
+    assert suggester.suggest('tea', limit=3) == [('teacher', 9), ('teaching', 9), ('teach', 3)]
+
+
+def test_prefix_span_is_contiguous():
+    suggester = make_suggester()
+    lo, hi = suggester.span('教')
+    assert suggester.terms[lo:hi] == ['教学', '教学楼', '教学管理', '教学计划', '教师']
+
+
+def test_no_match_or_empty_prefix():
+    suggester = make_suggester()
+    assert suggester.suggest('数学') == []
+    assert suggester.suggest('') == []
+    assert suggester.suggest('教', limit=0) == []
+    assert len(TermSuggester([])) == 0 and TermSuggester([]).suggest('a') == []
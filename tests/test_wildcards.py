@@ -0,0 +1,51 @@
+import pytest
+
+from search_engine import QueryPlanner, SearchEngine
+
+
+@pytest.fixture
+def planner():
+    return QueryPlanner(analyzer=None)
+
+
+@pytest.mark.parametrize('query', ['什么是教学管理？', '什么是教学管理?', 'how to apply?', '真的吗！', 'hello.',
+                                   '教学是什么? 管理', 'what? why?', 'teach? 课程', 'te?? 课程', '?'])
+def test_question_is_not_a_wildcard(planner, query):
+    assert planner.parse_wildcards(query) == (query, [])
+
+
+@pytest.mark.parametrize('query, patterns', [
+    ('teach*', ['teach*']),
+    ('教学*', ['教学*']),
+    ('te?ch', ['te?ch']),
+    ('教学＊管理。', ['教学*管理']),
+    ('col?r? 课程', ['col?r']),
+    ('teach*？', ['teach*']),
+    ('教学?* 管理?', ['教学?*']),
+])
+def test_wildcard_patterns(planner, query, patterns):
+    assert planner.parse_wildcards(query)[1] == patterns
+
+
+def test_plain_text_goes_to_analyzer(planner):
+    text, patterns = planner.parse_wildcards('本科 教学* 指南 教学*')
+    assert patterns == ['教学*']
+    assert text.split() == ['本科', '指南']
+
+
+def test_wildcard_prefix_and_regex():
+    assert QueryPlanner.wildcard_prefix('te?ch*') == 'te'
+    assert QueryPlanner.wildcard_prefix('*学') == ''
+    regex = QueryPlanner.wildcard_regex('te?ch*')
+    assert regex.fullmatch('teach') and regex.fullmatch('teachers')
+    assert not regex.fullmatch('tech') and not regex.fullmatch('t.ach')
+
+
+def test_question_mark_matches_exactly_one_character():
+    class Storage:
+        def term_dictionary(self, prefix, limit):
+            return [(t, df) for t, df in [('col', 9), ('colar', 1), ('color', 5), ('colour', 7)] if t.startswith(prefix)]
+
+    engine = SearchEngine.__new__(SearchEngine)  # 不加载分词器
+    engine.storage, engine.planner = Storage(), QueryPlanner(analyzer=None)
+    assert engine.expand_wildcard('col?r') == {'terms': ['color', 'colar'], 'truncated': False}